@@ -0,0 +1,91 @@
+"""
+Ticks per second of tick_entities vs. asteroid count, with and without the asteroid grid.
+
+    python3 -m bench.asteroid_grid [--units 2000] [--ticks 60]
+"""
+import argparse
+import random
+import time
+
+from rts.server import config as cfg
+from rts.server.state import ServerState, Entity, alloc_entity_id
+from rts.server.worldgen import generate_asteroids, resolve_circle_vs_asteroids
+from rts.server.simulation import tick_entities
+
+ASTEROID_COUNTS = [60, 250, 1000, 2500]
+
+def make_world(asteroid_count: int, units: int) -> ServerState:
+    cfg.ASTEROID_COUNT = asteroid_count
+    cfg.ASTEROID_GAP = 40 if asteroid_count > 250 else 250
+    state = ServerState()
+    generate_asteroids(state, cfg.MAP_SEED)
+
+    rng = random.Random(42)
+    for i in range(units):
+        eid = alloc_entity_id(state)
+        e = Entity(id=eid, type="fighter", owner=1 + (i & 1),
+                   x=rng.uniform(0, cfg.MAP_W), y=rng.uniform(0, cfg.MAP_H),
+                   hp_max=80, hp=80)
+        state.entities[eid] = e
+    return state
+
+def retarget(state: ServerState, rng: random.Random):
+    for e in state.entities.values():
+        if e.tx is None:
+            e.tx = rng.uniform(0, cfg.MAP_W)
+            e.ty = rng.uniform(0, cfg.MAP_H)
+            state.activity.wake(state, e.id)
+
+def check_identical(state: ServerState, samples: int = 20000) -> int:
+    rng = random.Random(7)
+    grid = state.asteroid_grid
+    mismatches = 0
+    for _ in range(samples):
+        x = rng.uniform(0, cfg.MAP_W)
+        y = rng.uniform(0, cfg.MAP_H)
+        r = rng.choice([10.0, 95.0])
+        state.asteroid_grid = grid
+        a = resolve_circle_vs_asteroids(state, x, y, r)
+        state.asteroid_grid = None
+        b = resolve_circle_vs_asteroids(state, x, y, r)
+        if a != b:
+            mismatches += 1
+    state.asteroid_grid = grid
+    return mismatches
+
+def run_ticks(state: ServerState, ticks: int) -> float:
+    rng = random.Random(1)
+    retarget(state, rng)
+    t0 = time.perf_counter()
+    for _ in range(ticks):
+        tick_entities(state)
+        retarget(state, rng)
+    return ticks / (time.perf_counter() - t0)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--units", type=int, default=2000)
+    ap.add_argument("--ticks", type=int, default=60)
+    args = ap.parse_args()
+
+    saved = (cfg.ASTEROID_COUNT, cfg.ASTEROID_GAP)
+    print(f"units={args.units} ticks={args.ticks} cell={cfg.ASTEROID_GRID_CELL}")
+    print(f"{'asteroids':>10} {'placed':>7} {'scan tps':>10} {'grid tps':>10} {'speedup':>8} {'mismatch':>9}")
+    try:
+        for n in ASTEROID_COUNTS:
+            state = make_world(n, args.units)
+            placed = len(state.asteroids)
+            mismatches = check_identical(state)
+
+            grid_tps = run_ticks(state, args.ticks)
+
+            state = make_world(n, args.units)
+            state.asteroid_grid = None
+            scan_tps = run_ticks(state, args.ticks)
+
+            print(f"{n:>10} {placed:>7} {scan_tps:>10.1f} {grid_tps:>10.1f} {grid_tps / scan_tps:>7.1f}x {mismatches:>9}")
+    finally:
+        cfg.ASTEROID_COUNT, cfg.ASTEROID_GAP = saved
+
+if __name__ == "__main__":
+    main()
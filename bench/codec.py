@@ -0,0 +1,57 @@
+"""
+Snapshot wire size and encode/decode throughput (k entities/s): JSON vs. the binary codec.
+
+    python3 -m bench.codec [--repeat 20]
+"""
+import argparse
+import random
+import time
+
+from rts.net.transport import encode_payload, decode_payload
+from rts.server import config as cfg
+from rts.server.state import ServerState, Entity, alloc_entity_id
+from rts.server.snapshots import build_snapshot
+
+ENTITY_COUNTS = [100, 1000, 10000]
+
+def make_snapshot(units: int) -> dict:
+    state = ServerState()
+    rng = random.Random(42)
+    types = ["fighter", "fighter", "miner", "station"]
+    for i in range(units):
+        eid = alloc_entity_id(state)
+        t = types[i % len(types)]
+        state.entities[eid] = Entity(
+            id=eid, type=t, owner=1 + (i & 1),
+            x=rng.uniform(0, cfg.MAP_W), y=rng.uniform(0, cfg.MAP_H),
+            angle=rng.uniform(-3.14, 3.14), hp=80, hp_max=80,
+            miner_state="mining" if t == "miner" else "idle",
+            mine_asteroid_id=rng.randrange(1, 60) if t == "miner" else None,
+        )
+    state.credits = {1: 500, 2: 740}
+    return build_snapshot(state, 1234)
+
+def timed(fn, repeat: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t0) / repeat
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=20)
+    args = ap.parse_args()
+
+    print(f"{'entities':>8} {'codec':>6} {'bytes':>10} {'B/ent':>6} {'enc ms':>8} {'dec ms':>8} {'enc k/s':>8} {'dec k/s':>8}")
+    for n in ENTITY_COUNTS:
+        snap = make_snapshot(n)
+        for name, binary in (("json", False), ("bin", True)):
+            payload = encode_payload(snap, binary)
+            enc = timed(lambda: encode_payload(snap, binary), args.repeat)
+            dec = timed(lambda: decode_payload(payload), args.repeat)
+            size = len(payload)
+            print(f"{n:>8} {name:>6} {size:>10} {size / n:>6.1f} {enc * 1e3:>8.2f} {dec * 1e3:>8.2f} "
+                  f"{n / enc / 1e3:>8.0f} {n / dec / 1e3:>8.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Unit separation under crowding (rts/server/separation.py).
+
+Eight players, each with a station, fighters and miners, on the default map.
+Every few seconds every army is ordered to one of a few shared rally points, so
+armies run into each other and pile up there, and miners pile up at their
+drop-off points. Times the whole tick per store, with the separation pass on
+its own, and reports whether the tick fits the 30 Hz budget. The verdict is on
+p95: the ticks that issue orders also build flow fields, and an odd long tick is
+absorbed by sim_loop's catch-up.
+
+    python3 -m bench.crowd [--entities 1000,2000,5000,10000] [--ticks 300]
+"""
+import argparse
+import random
+import time
+
+from rts.server import config as cfg
+from rts.server.state import ServerState, Entity, alloc_entity_id, add_entity
+from rts.server.worldgen import generate_asteroids
+from rts.server.commands import handle_cmd_move, handle_cmd_mine
+from rts.server.simulation import tick_entities
+from rts.server.separation import separate
+from rts.server.soa import EntityStore, np, separate_rows
+
+PLAYERS = 8
+ORDER_EVERY = 90        # ticks between move orders
+RALLY_POINTS = 3
+
+def crowd_world(entities: int, store: str) -> ServerState:
+    state = ServerState()
+    if store == "numpy":
+        state.entities = EntityStore()
+    generate_asteroids(state, cfg.MAP_SEED)
+    rng = random.Random(7)
+    per_player = max(2, entities // PLAYERS)
+    for p in range(1, PLAYERS + 1):
+        bx, by = rng.uniform(1500, cfg.MAP_W - 1500), rng.uniform(1500, cfg.MAP_H - 1500)
+        sid = alloc_entity_id(state)
+        add_entity(state, Entity(id=sid, type="station", owner=p, x=bx, y=by, hp_max=800, hp=800))
+        miners = []
+        for i in range(per_player - 1):
+            eid = alloc_entity_id(state)
+            x, y = bx + rng.uniform(-600, 600), by + rng.uniform(-600, 600)
+            if i % 4 == 0:
+                add_entity(state, Entity(id=eid, type="miner", owner=p, x=x, y=y, hp_max=90, hp=90,
+                                         home_station_id=sid))
+                miners.append(eid)
+            else:
+                add_entity(state, Entity(id=eid, type="fighter", owner=p, x=x, y=y, hp_max=80, hp=80))
+        near = min(state.asteroids.values(), key=lambda a: (a.x - bx) ** 2 + (a.y - by) ** 2)
+        handle_cmd_mine(state, p, {"unit_ids": miners, "asteroid_id": near.id})
+    return state
+
+def order_armies(state: ServerState, rally: list, rng: random.Random):
+    armies = {}
+    for e in state.entities.values():
+        if e.type == "fighter":
+            armies.setdefault(e.owner, []).append(e.id)
+    for p, ids in armies.items():
+        x, y = rng.choice(rally)
+        handle_cmd_move(state, p, {"unit_ids": ids, "x": x, "y": y})
+
+def separation_pass(state: ServerState):
+    if isinstance(state.entities, EntityStore):
+        separate_rows(state, state.entities)
+    else:
+        with state.world_lock:
+            separate(state)
+
+def run(entities: int, store: str, ticks: int):
+    state = crowd_world(entities, store)
+    rng = random.Random(1)
+    rally = [(rng.uniform(3000, cfg.MAP_W - 3000), rng.uniform(2500, cfg.MAP_H - 2500)) for _ in range(RALLY_POINTS)]
+    cell = cfg.SEPARATION_CELL
+    tick_ms, sep_ms = [], []
+    try:
+        for t in range(ticks):
+            if t % ORDER_EVERY == 0:
+                order_armies(state, rally, rng)
+            cfg.SEPARATION_CELL = 0         # time the pass on its own
+            t0 = time.perf_counter()
+            tick_entities(state)
+            t1 = time.perf_counter()
+            cfg.SEPARATION_CELL = cell
+            separation_pass(state)
+            t2 = time.perf_counter()
+            tick_ms.append((t2 - t0) * 1000.0)
+            sep_ms.append((t2 - t1) * 1000.0)
+    finally:
+        cfg.SEPARATION_CELL = cell
+    tick_ms.sort()
+    sep_ms.sort()
+    return tick_ms, sep_ms
+
+def pct(values: list, p: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--entities", default="1000,2000,5000,10000")
+    ap.add_argument("--ticks", type=int, default=300)
+    args = ap.parse_args()
+    if cfg.SEPARATION_CELL <= 0:
+        raise SystemExit("SEPARATION_CELL <= 0: separation is off")
+
+    budget = cfg.DT * 1000.0
+    stores = ["dict"] + (["numpy"] if np is not None else [])
+    print(f"tick budget {budget:.1f} ms, {PLAYERS} players, orders every {ORDER_EVERY} ticks")
+    print(f"{'entities':>9} {'store':>6} {'tick p50':>9} {'tick p95':>9} {'tick max':>9} "
+          f"{'sep p50':>8} {'sep p95':>8}  30 Hz")
+    for n in [int(v) for v in args.entities.split(",")]:
+        for store in stores:
+            tick_ms, sep_ms = run(n, store, args.ticks)
+            p95 = pct(tick_ms, 0.95)
+            print(f"{n:>9} {store:>6} {pct(tick_ms, 0.5):>9.2f} {p95:>9.2f} {tick_ms[-1]:>9.2f} "
+                  f"{pct(sep_ms, 0.5):>8.2f} {pct(sep_ms, 0.95):>8.2f}  {'yes' if p95 < budget else 'NO'}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+tick_entities throughput: Entity dict vs. the columnar NumPy store.
+
+    python3 -m bench.entity_store [--ticks 60]
+"""
+import argparse
+import random
+import time
+
+from rts.server import config as cfg
+from rts.server.state import ServerState, Entity, alloc_entity_id
+from rts.server.worldgen import generate_asteroids
+from rts.server.simulation import tick_entities
+from rts.server.soa import EntityStore
+
+UNIT_COUNTS = [1000, 5000, 10000, 20000]
+
+def make_world(units: int, columnar: bool) -> ServerState:
+    state = ServerState()
+    if columnar:
+        state.entities = EntityStore()
+    generate_asteroids(state, cfg.MAP_SEED)
+    aids = list(state.asteroids)
+
+    rng = random.Random(42)
+    for i in range(units):
+        eid = alloc_entity_id(state)
+        x, y = rng.uniform(0, cfg.MAP_W), rng.uniform(0, cfg.MAP_H)
+        if i % 4 == 0:
+            e = Entity(id=eid, type="miner", owner=1 + (i & 1), x=x, y=y, hp_max=90, hp=90,
+                       miner_state="mining", mine_asteroid_id=rng.choice(aids),
+                       mine_timer=rng.uniform(0, cfg.MINING_TIME))
+        else:
+            e = Entity(id=eid, type="fighter", owner=1 + (i & 1), x=x, y=y, hp_max=80, hp=80,
+                       tx=rng.uniform(0, cfg.MAP_W), ty=rng.uniform(0, cfg.MAP_H))
+        state.entities[eid] = e
+    return state
+
+def run_ticks(state: ServerState, ticks: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(ticks):
+        tick_entities(state)
+    return ticks / (time.perf_counter() - t0)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--ticks", type=int, default=60)
+    args = ap.parse_args()
+
+    print(f"ticks={args.ticks} target={cfg.TICK_HZ:.0f} Hz")
+    print(f"{'units':>7} {'dict tps':>10} {'numpy tps':>10} {'speedup':>8}")
+    for n in UNIT_COUNTS:
+        dict_tps = run_ticks(make_world(n, False), args.ticks)
+        soa_tps = run_ticks(make_world(n, True), args.ticks)
+        print(f"{n:>7} {dict_tps:>10.1f} {soa_tps:>10.1f} {soa_tps / dict_tps:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
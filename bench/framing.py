@@ -0,0 +1,109 @@
+"""
+Framing throughput over a socketpair (rts/net/transport.py): frames/s and MB/s
+for a stream of same-size frames, payloads already encoded so only framing and
+syscalls are timed.
+
+  old     header + payload joined, sendall; recv_exact growing bytes with +=,
+          two recvs per frame (the framing before FrameReader / send_parts)
+  exact   send_msg's path (send_parts); recv_payload, two recv_into per frame
+  stream  send_parts; FrameReader, as many frames per recv_into as have arrived
+  batch   as stream, with the writer gathering 16 frames per sendmsg (run_writer)
+
+    python3 -m bench.framing [--sizes 64,4096,262144,1900000] [--mb 64] [--join-max BYTES]
+
+--join-max overrides transport.JOIN_MAX_BYTES, the size up to which send_parts
+joins its buffers instead of calling sendmsg (0: always sendmsg).
+"""
+import argparse
+import socket
+import threading
+import time
+
+from rts.net import transport
+from rts.net.transport import HEADER, MAX_MSG_BYTES, FrameReader, recv_payload, send_parts
+
+SIZES = [64, 4096, 256 * 1024, 1_900_000]
+BATCH = 16
+
+def _old_recv_exact(sock: socket.socket, n: int) -> bytes:
+    data = b""
+    while len(data) < n:
+        chunk = sock.recv(n - len(data))
+        if not chunk:
+            raise ConnectionError("socket closed")
+        data += chunk
+    return data
+
+def _old_recv(sock: socket.socket):
+    (length,) = HEADER.unpack(_old_recv_exact(sock, 4))
+    return _old_recv_exact(sock, length)
+
+def _old_send(sock: socket.socket, payload: bytes, count: int):
+    for _ in range(count):
+        sock.sendall(memoryview(HEADER.pack(len(payload)) + payload))
+
+def _parts_send(sock: socket.socket, payload: bytes, count: int):
+    header = HEADER.pack(len(payload))
+    for _ in range(count):
+        send_parts(sock, [header, payload])
+
+def _batch_send(sock: socket.socket, payload: bytes, count: int):
+    frame = HEADER.pack(len(payload)) + payload     # SharedMsg frames are pre-framed
+    while count > 0:
+        k = min(BATCH, count)
+        send_parts(sock, [frame] * k)
+        count -= k
+
+MODES = {
+    "old": (_old_send, _old_recv),
+    "exact": (_parts_send, recv_payload),
+    "stream": (_parts_send, None),
+    "batch": (_batch_send, None),
+}
+
+def run(mode: str, size: int, count: int) -> float:
+    """Seconds to move count frames of size bytes from one end to the other."""
+    send, recv = MODES[mode]
+    a, b = socket.socketpair()
+    payload = bytes(size)
+    try:
+        th = threading.Thread(target=send, args=(a, payload, count))
+        t0 = time.perf_counter()
+        th.start()
+        if recv is None:
+            reader = FrameReader(b)
+            for _ in range(count):
+                reader.read()
+        else:
+            for _ in range(count):
+                recv(b)
+        elapsed = time.perf_counter() - t0
+        th.join()
+    finally:
+        a.close()
+        b.close()
+    return elapsed
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default=",".join(str(s) for s in SIZES), help="payload bytes per frame")
+    ap.add_argument("--mb", type=float, default=64.0, help="payload MB moved per run (at least 200 frames)")
+    ap.add_argument("--join-max", type=int, default=None, help="override JOIN_MAX_BYTES for send_parts")
+    args = ap.parse_args()
+    if args.join_max is not None:
+        transport.JOIN_MAX_BYTES = args.join_max
+
+    print(f"{'bytes':>9} {'mode':>7} {'frames':>7} {'frames/s':>10} {'MB/s':>8} {'vs old':>7}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        if size > MAX_MSG_BYTES:
+            print(f"{size:>9} skipped: over MAX_MSG_BYTES")
+            continue
+        count = max(200, int(args.mb * 1e6 / size))
+        base = None
+        for mode in MODES:
+            t = run(mode, size, count)
+            base = base or t
+            print(f"{size:>9} {mode:>7} {count:>7} {count / t:>10.0f} {count * size / t / 1e6:>8.1f} {base / t:>6.2f}x")
+
+if __name__ == "__main__":
+    main()
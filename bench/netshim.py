@@ -0,0 +1,120 @@
+"""
+Loss/latency shim for the UDP transport: a loopback UDP proxy that drops,
+delays and (through jitter) reorders datagrams both ways.
+
+Clients talk to --listen; every client address gets its own upstream socket to
+--to, so the server still sees one address per client. Pair it with a UDP
+server (UDP = True) and UDP bots:
+
+    python3 -m bench.netshim --listen 5101 --to 127.0.0.1:5001 --loss 0.05 --latency 40 --jitter 20
+    python3 -m bench.swarm --udp --port 5101 --players 4
+
+LossyUdpProxy can also be started in-process (start() / close()).
+"""
+import argparse
+import heapq
+import itertools
+import random
+import select
+import socket
+import threading
+import time
+from typing import Dict, List, Tuple
+
+class LossyUdpProxy:
+    def __init__(self, listen: Tuple[str, int], target: Tuple[str, int], loss: float = 0.0,
+                 latency_ms: float = 0.0, jitter_ms: float = 0.0, seed: int = 1):
+        self.target = target
+        self.loss = loss
+        self.latency = latency_ms / 1000.0
+        self.jitter = jitter_ms / 1000.0
+        self.rng = random.Random(seed)
+        self.front = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.front.bind(listen)
+        self.upstream: Dict[Tuple[str, int], socket.socket] = {}   # client addr -> socket to the server
+        self.client_of: Dict[socket.socket, Tuple[str, int]] = {}
+        self.due: List[tuple] = []          # (time, seq, socket, datagram, addr or None)
+        self.seq = itertools.count()
+        self.forwarded = 0
+        self.dropped = 0
+        self.running = False
+
+    def start(self) -> "LossyUdpProxy":
+        self.running = True
+        threading.Thread(target=self.run, daemon=True).start()
+        return self
+
+    def close(self):
+        self.running = False
+
+    def _schedule(self, sock: socket.socket, dgram: bytes, addr):
+        if self.rng.random() < self.loss:
+            self.dropped += 1
+            return
+        at = time.monotonic() + self.latency + self.rng.uniform(0.0, self.jitter)
+        heapq.heappush(self.due, (at, next(self.seq), sock, dgram, addr))
+
+    def run(self):
+        try:
+            while self.running:
+                wait = 0.05
+                if self.due:
+                    wait = max(0.0, min(wait, self.due[0][0] - time.monotonic()))
+                ready, _, _ = select.select([self.front] + list(self.client_of), [], [], wait)
+                for sock in ready:
+                    try:
+                        dgram, addr = sock.recvfrom(65536)
+                    except OSError:
+                        continue
+                    if sock is self.front:
+                        up = self.upstream.get(addr)
+                        if up is None:
+                            up = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                            up.connect(self.target)
+                            self.upstream[addr] = up
+                            self.client_of[up] = addr
+                        self._schedule(up, dgram, None)
+                    else:
+                        self._schedule(self.front, dgram, self.client_of[sock])
+                now = time.monotonic()
+                while self.due and self.due[0][0] <= now:
+                    _, _, sock, dgram, addr = heapq.heappop(self.due)
+                    try:
+                        if addr is None:
+                            sock.send(dgram)
+                        else:
+                            sock.sendto(dgram, addr)
+                        self.forwarded += 1
+                    except OSError:
+                        pass
+        finally:
+            for sock in [self.front] + list(self.client_of):
+                sock.close()
+
+def _addr(s: str) -> Tuple[str, int]:
+    host, _, port = s.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--listen", default="127.0.0.1:5101", help="[host:]port clients send to")
+    ap.add_argument("--to", default="127.0.0.1:5001", help="server host:port")
+    ap.add_argument("--loss", type=float, default=0.05, help="share of datagrams dropped, each way")
+    ap.add_argument("--latency", type=float, default=40.0, help="one-way delay, ms")
+    ap.add_argument("--jitter", type=float, default=20.0, help="extra random delay up to this, ms (reorders)")
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+
+    proxy = LossyUdpProxy(_addr(args.listen), _addr(args.to), args.loss, args.latency, args.jitter, args.seed)
+    print(f"[shim] {args.listen} -> {args.to}: loss={args.loss:.0%} latency={args.latency:.0f}ms "
+          f"jitter={args.jitter:.0f}ms")
+    proxy.start()
+    try:
+        while True:
+            time.sleep(5.0)
+            print(f"[shim] forwarded={proxy.forwarded} dropped={proxy.dropped} in flight={len(proxy.due)}")
+    except KeyboardInterrupt:
+        proxy.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Sharded tick (rts/server/shards.py) vs. the single-process numpy tick.
+
+First checks that a ShardedStore world stays identical to an EntityStore world
+over --check-ticks ticks with retargeting, then times tick_entities per worker
+count. Speedup needs as many free cores as workers; with fewer, the extra
+processes only add pipe round trips.
+
+    python3 -m bench.shards [--entities 20000,50000] [--workers 1,2,4] [--ticks 100]
+"""
+import argparse
+import os
+import random
+import time
+
+from rts.server import config as cfg
+from rts.server.soa import np
+from rts.server.shards import ShardedStore
+from rts.server.simulation import tick_entities
+from rts.server.snapshots import publish_frame
+from bench.suite import make_world, retarget, BASE_ASTEROIDS
+
+def sharded_world(entities: int, asteroids: int, workers: int):
+    state = make_world(entities, asteroids, "numpy")
+    store = ShardedStore()
+    for eid in state.entities.keys():
+        store[eid] = state.entities.to_entity(eid)
+    state.entities = store
+    store.start(state.asteroids, workers)
+    return state
+
+def check(entities: int, workers: int, ticks: int) -> bool:
+    ref = make_world(entities, BASE_ASTEROIDS, "numpy")
+    sharded = sharded_world(entities, BASE_ASTEROIDS, workers)
+    try:
+        rng_a, rng_b = random.Random(3), random.Random(3)
+        for t in range(1, ticks + 1):
+            retarget(ref, rng_a)
+            retarget(sharded, rng_b)
+            tick_entities(ref)
+            tick_entities(sharded)
+        publish_frame(ref, ticks)
+        publish_frame(sharded, ticks)
+        a = {e["id"]: e for e in ref.frame.entities}
+        b = {e["id"]: e for e in sharded.frame.entities}
+        ok = a == b and ref.credits == sharded.credits
+        print(f"check: {entities} entities, {workers} workers, {ticks} ticks -> "
+              f"{'identical' if ok else 'MISMATCH'} ({sharded.entities.pool.handoffs} handoffs)")
+        return ok
+    finally:
+        sharded.entities.close()
+
+def time_ticks(state, ticks: int) -> float:
+    rng = random.Random(1)
+    total = 0.0
+    for _ in range(ticks):
+        retarget(state, rng)
+        t0 = time.perf_counter()
+        tick_entities(state)
+        total += time.perf_counter() - t0
+    return total / ticks * 1000.0
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--entities", default="20000,50000")
+    ap.add_argument("--workers", default="1,2,4")
+    ap.add_argument("--ticks", type=int, default=100)
+    ap.add_argument("--check-ticks", type=int, default=300)
+    args = ap.parse_args()
+    if np is None:
+        raise SystemExit("needs numpy")
+
+    entity_counts = [int(v) for v in args.entities.split(",")]
+    worker_counts = [int(v) for v in args.workers.split(",")]
+    print(f"{os.cpu_count()} cpus, tick budget {cfg.DT * 1000:.1f} ms")
+    if not check(2000, max(worker_counts), args.check_ticks):
+        raise SystemExit(1)
+
+    print(f"\n{'entities':>9} {'store':>12} {'ms/tick':>9} {'speedup':>8}")
+    for n in entity_counts:
+        base = time_ticks(make_world(n, BASE_ASTEROIDS, "numpy"), args.ticks)
+        print(f"{n:>9} {'numpy':>12} {base:>9.2f} {1.0:>7.2f}x")
+        for w in worker_counts:
+            state = sharded_world(n, BASE_ASTEROIDS, w)
+            try:
+                ms = time_ticks(state, args.ticks)
+            finally:
+                state.entities.close()
+            print(f"{n:>9} {f'{w} workers':>12} {ms:>9.2f} {base / ms:>7.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,414 @@
+"""
+Microbenchmark suite for the server and transport hot paths. No display or network.
+
+Sweeps entity counts (100 -> 50k) and asteroid counts (60 -> 5k) over:
+  resolve           resolve_circle_vs_asteroids, per call
+  tick_entities     one tick, dict and (if numpy is installed) numpy stores
+  build_snapshot    publish_frame + build_snapshot, as sim_loop does each tick
+  build_map_init    one map_init
+  map_join          the handshake's map messages (map_init + map_chunks), encoded and decoded, for a
+                    client without the map and one that has it cached
+  generate_asteroids
+  flow_field        one flow field settled across the whole map (a cache miss)
+  idle_tick         one tick with 1 fighter in 20 moving and the rest idle or mining, ENTITY_SLEEP on and off
+  separation        one unit separation pass (spatial hash + pushes), dict and numpy stores
+  transport         send_msg + recv_msg of a snapshot over a socketpair, json and bin
+  commands          handle_cmd_move / handle_cmd_mine for one player's whole army (1k and 10k units per
+                    player, two players) plus a twentieth of the enemy's, which ownership checks drop
+  checkpoint        capture (sim thread, under world_lock), write, and restore of a world checkpoint
+
+Timings are medians over repeated runs with fixed seeds. --out writes them as JSON;
+--compare reads such a file and flags cases that got slower than --threshold
+(exit status 1 if any did).
+
+    python3 -m bench.suite [--quick] [--only tick_entities,transport] [--out now.json]
+    python3 -m bench.suite --compare baseline.json [--threshold 0.1]
+"""
+import argparse
+import json
+import math
+import platform
+import random
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+from rts.net.transport import MAX_MSG_BYTES, encode_payload, decode_payload, send_msg, recv_msg
+from rts.server import config as cfg
+from rts.server.state import ServerState, ClientInfo, Entity, Asteroid, alloc_entity_id, add_entity
+from rts.server.worldgen import generate_asteroids, build_asteroid_grid, resolve_circle_vs_asteroids
+from rts.server.simulation import tick_entities
+from rts.server.snapshots import build_snapshot, build_map_init, publish_frame
+from rts.server.soa import EntityStore, np, separate_rows
+from rts.server.pathing import FlowField
+from rts.server.separation import separate
+from rts.server.checkpoint import capture, write_checkpoint, restore_checkpoint
+from rts.server.commands import handle_cmd_move, handle_cmd_mine
+from rts.server.netserver import client_map_init
+
+ENTITY_COUNTS = [100, 1000, 5000, 10000, 50000]
+ASTEROID_COUNTS = [60, 250, 1000, 5000]
+QUICK_ENTITY_COUNTS = [100, 1000, 5000]
+QUICK_ASTEROID_COUNTS = [60, 250, 1000]
+
+COMMAND_UNITS = [1000, 10000]   # units per player for the commands case
+BASE_ASTEROIDS = 60      # asteroid count for entity sweeps
+BASE_ENTITIES = 1000     # entity count for asteroid sweeps
+
+CASES = ("resolve", "tick_entities", "build_snapshot", "build_map_init", "map_join", "generate_asteroids",
+         "flow_field", "idle_tick", "separation", "transport", "commands", "checkpoint")
+
+def measure(fn: Callable[[], None], min_time: float, before: Optional[Callable[[], None]] = None) -> dict:
+    """Run fn until min_time has passed (at least 3 runs unless a single run is slow)."""
+    times: List[float] = []
+    start = time.perf_counter()
+    while True:
+        if before is not None:
+            before()
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time and (len(times) >= 3 or elapsed >= 3 * min_time):
+            break
+    times.sort()
+    return {
+        "median_ms": times[len(times) // 2] * 1000.0,
+        "min_ms": times[0] * 1000.0,
+        "reps": len(times),
+    }
+
+@contextmanager
+def asteroid_config(count: int):
+    """Worldgen settings that can actually place `count` asteroids on the map."""
+    saved = (cfg.ASTEROID_COUNT, cfg.ASTEROID_GAP, cfg.AST_MIN_R, cfg.AST_MAX_R)
+    cfg.ASTEROID_COUNT = count
+    if count > 250:
+        cfg.ASTEROID_GAP = 40
+    if count > 1000:
+        cfg.AST_MIN_R, cfg.AST_MAX_R = 15, 45
+    try:
+        yield
+    finally:
+        cfg.ASTEROID_COUNT, cfg.ASTEROID_GAP, cfg.AST_MIN_R, cfg.AST_MAX_R = saved
+
+_asteroids: Dict[int, Dict[int, Asteroid]] = {}
+
+def asteroids_for(count: int) -> Dict[int, Asteroid]:
+    if count not in _asteroids:
+        state = ServerState()
+        with asteroid_config(count):
+            generate_asteroids(state, cfg.MAP_SEED)
+        _asteroids[count] = state.asteroids
+    return _asteroids[count]
+
+def make_world(entities: int, asteroids: int, store: str = "dict") -> ServerState:
+    state = ServerState()
+    if store == "numpy":
+        state.entities = EntityStore()
+    state.asteroids = dict(asteroids_for(asteroids))
+    build_asteroid_grid(state)
+    aids = list(state.asteroids)
+
+    rng = random.Random(42)
+    for i in range(entities):
+        eid = alloc_entity_id(state)
+        x, y = rng.uniform(0, cfg.MAP_W), rng.uniform(0, cfg.MAP_H)
+        if i % 4 == 0:
+            e = Entity(id=eid, type="miner", owner=1 + (i & 1), x=x, y=y, hp_max=90, hp=90,
+                       miner_state="mining", mine_asteroid_id=rng.choice(aids),
+                       mine_timer=rng.uniform(0, cfg.MINING_TIME))
+        else:
+            e = Entity(id=eid, type="fighter", owner=1 + (i & 1), x=x, y=y, hp_max=80, hp=80)
+        add_entity(state, e)
+    return state
+
+def retarget(state: ServerState, rng: random.Random):
+    for e in state.entities.values():
+        if e.type == "fighter" and e.tx is None:
+            e.tx = rng.uniform(0, cfg.MAP_W)
+            e.ty = rng.uniform(0, cfg.MAP_H)
+            state.activity.wake(state, e.id)
+
+def stores() -> List[str]:
+    return ["dict", "numpy"] if np is not None else ["dict"]
+
+def bench_resolve(entity_counts, asteroid_counts, min_time):
+    for n in asteroid_counts:
+        state = make_world(0, n)
+        rng = random.Random(7)
+        points = [(rng.uniform(0, cfg.MAP_W), rng.uniform(0, cfg.MAP_H), rng.choice((10.0, 95.0))) for _ in range(2000)]
+
+        def run():
+            for x, y, r in points:
+                resolve_circle_vs_asteroids(state, x, y, r)
+        res = measure(run, min_time)
+        res["median_ms"] /= len(points)
+        res["min_ms"] /= len(points)
+        yield {"asteroids": n}, res, {"placed": len(state.asteroids)}
+
+def bench_tick_entities(entity_counts, asteroid_counts, min_time):
+    sweeps = [(n, BASE_ASTEROIDS) for n in entity_counts] + \
+             [(BASE_ENTITIES, a) for a in asteroid_counts if a != BASE_ASTEROIDS]
+    for entities, asteroids in sweeps:
+        for store in stores():
+            state = make_world(entities, asteroids, store)
+            rng = random.Random(1)
+            res = measure(lambda: tick_entities(state), min_time, before=lambda: retarget(state, rng))
+            yield {"entities": entities, "asteroids": asteroids, "store": store}, res, {}
+
+def bench_idle_tick(entity_counts, asteroid_counts, min_time):
+    saved = cfg.ENTITY_SLEEP
+    try:
+        for entities in entity_counts:
+            for store in stores():
+                for sleep in (True, False):
+                    cfg.ENTITY_SLEEP = sleep
+                    state = make_world(entities, BASE_ASTEROIDS, store)
+                    rng = random.Random(1)
+                    movers = [eid for eid in state.entities if eid % 20 == 0 and state.entities[eid].type == "fighter"]
+
+                    def order():
+                        for eid in movers:
+                            e = state.entities[eid]
+                            if e.tx is None:
+                                e.tx, e.ty = rng.uniform(0, cfg.MAP_W), rng.uniform(0, cfg.MAP_H)
+                                state.activity.wake(state, eid)
+                    for _ in range(30):         # let the initial overlaps push apart and settle
+                        order()
+                        tick_entities(state)
+                    res = measure(lambda: tick_entities(state), min_time, before=order)
+                    yield {"entities": entities, "store": store, "sleep": sleep}, res, \
+                        {"awake": state.activity.awake_count(state)}
+    finally:
+        cfg.ENTITY_SLEEP = saved
+
+def bench_build_snapshot(entity_counts, asteroid_counts, min_time):
+    for entities in entity_counts:
+        for store in stores():
+            state = make_world(entities, BASE_ASTEROIDS, store)
+            tick = [0]
+
+            def run():
+                tick[0] += 1
+                publish_frame(state, tick[0])
+                build_snapshot(state, tick[0])
+            yield {"entities": entities, "store": store}, measure(run, min_time), {}
+
+def bench_build_map_init(entity_counts, asteroid_counts, min_time):
+    for n in asteroid_counts:
+        state = make_world(0, n)
+        yield {"asteroids": n}, measure(lambda: build_map_init(state, 1), min_time), {}
+
+def bench_map_join(entity_counts, asteroid_counts, min_time):
+    for n in asteroid_counts:
+        state = make_world(0, n)
+        info = ClientInfo(1, binary=True)
+        for cached in (False, True):
+            hello = {"map_hashes": [state.map_hash]} if cached else {}
+            sizes = [0, 0]
+
+            def run():
+                payloads = [encode_payload(m, True) for m in client_map_init(state, info, hello)]
+                for p in payloads:
+                    decode_payload(p)
+                sizes[:] = [len(payloads), sum(len(p) for p in payloads)]
+            yield {"asteroids": n, "cached": cached}, measure(run, min_time), {"messages": sizes[0], "bytes": sizes[1]}
+
+def bench_generate_asteroids(entity_counts, asteroid_counts, min_time):
+    for n in asteroid_counts:
+        placed = [0]
+
+        def run():
+            state = ServerState()
+            with asteroid_config(n):
+                generate_asteroids(state, cfg.MAP_SEED)
+            placed[0] = len(state.asteroids)
+        yield {"asteroids": n}, measure(run, min_time), {"placed": placed[0]}
+
+def bench_flow_field(entity_counts, asteroid_counts, min_time):
+    for n in asteroid_counts:
+        state = make_world(0, n)
+        grid = state.nav
+        if grid is None:
+            yield {"asteroids": n}, None, {"skipped": "NAV_CELL <= 0"}
+            continue
+        # the free cell nearest the middle that reaches most of the map (not a pocket),
+        # searched out to the cell furthest from it
+        free = sorted((c for c in range(grid.nx * grid.ny) if not grid.blocked[c]),
+                      key=lambda c: math.hypot(grid.center(c)[0] - cfg.MAP_W / 2, grid.center(c)[1] - cfg.MAP_H / 2))
+        far = free[-1]
+        for goal in free:
+            probe = FlowField(grid, goal)
+            probe.settle(far)
+            if sum(probe.settled) * 2 > len(free):
+                break
+        res = measure(lambda: FlowField(grid, goal).settle(far), min_time)
+        yield {"asteroids": n}, res, {"blocked_cells": sum(grid.blocked), "settled_cells": sum(probe.settled)}
+
+def bench_separation(entity_counts, asteroid_counts, min_time):
+    for entities in entity_counts:
+        for store in stores():
+            state = make_world(entities, BASE_ASTEROIDS, store)
+            state.activity.begin_tick(state)        # everything awake: a full pass
+            if store == "numpy":
+                res = measure(lambda: separate_rows(state, state.entities), min_time)
+            else:
+                res = measure(lambda: separate(state), min_time)
+            yield {"entities": entities, "store": store}, res, {}
+
+def bench_transport(entity_counts, asteroid_counts, min_time):
+    for entities in entity_counts:
+        state = make_world(entities, BASE_ASTEROIDS)
+        snap = build_snapshot(state, 1)
+        for codec in ("json", "bin"):
+            binary = codec == "bin"
+            size = len(encode_payload(snap, binary))
+            if size > MAX_MSG_BYTES:
+                yield {"entities": entities, "codec": codec}, None, {"bytes": size, "skipped": "over MAX_MSG_BYTES"}
+                continue
+            a, b = socket.socketpair()
+            try:
+                res = measure(lambda: _roundtrip(a, b, snap, binary), min_time)
+            finally:
+                a.close()
+                b.close()
+            yield {"entities": entities, "codec": codec}, res, {"bytes": size}
+
+def bench_commands(entity_counts, asteroid_counts, min_time):
+    for per_player in COMMAND_UNITS:
+        for store in stores():
+            state = make_world(2 * per_player, BASE_ASTEROIDS, store)
+            ours = sorted(state.index.owned(1))
+            theirs = sorted(state.index.owned(2))
+            selection = ours + theirs[::20]
+            aid = next(iter(state.asteroids))
+            move = {"type": "cmd_move", "unit_ids": selection, "x": cfg.MAP_W / 2, "y": cfg.MAP_H / 2}
+            mine = {"type": "cmd_mine", "unit_ids": selection, "asteroid_id": aid}
+            params = {"units_per_player": per_player, "store": store}
+            yield {**params, "cmd": "move"}, measure(lambda: handle_cmd_move(state, 1, move), min_time), {}
+            yield {**params, "cmd": "mine"}, measure(lambda: handle_cmd_mine(state, 1, mine), min_time), {}
+
+def bench_checkpoint(entity_counts, asteroid_counts, min_time):
+    fd, path = tempfile.mkstemp(suffix=".ckpt")
+    os.close(fd)
+    try:
+        for entities in entity_counts:
+            for store in stores():
+                state = make_world(entities, BASE_ASTEROIDS, store)
+                copy = capture(state, 1)
+                size = write_checkpoint(path, copy)
+
+                def restore():
+                    fresh = ServerState()
+                    if store == "numpy":
+                        fresh.entities = EntityStore()
+                    restore_checkpoint(fresh, path)
+                yield {"entities": entities, "store": store, "phase": "capture"}, \
+                    measure(lambda: capture(state, 1), min_time), {"bytes": size}
+                yield {"entities": entities, "store": store, "phase": "write"}, \
+                    measure(lambda: write_checkpoint(path, copy), min_time), {"bytes": size}
+                yield {"entities": entities, "store": store, "phase": "restore"}, measure(restore, min_time), {}
+    finally:
+        os.remove(path)
+
+def _roundtrip(a: socket.socket, b: socket.socket, msg: dict, binary: bool):
+    """send_msg on a thread (the frame can exceed the socket buffer), recv_msg here."""
+    th = threading.Thread(target=send_msg, args=(a, msg, binary))
+    th.start()
+    recv_msg(b)
+    th.join()
+
+BENCHES = {
+    "resolve": bench_resolve,
+    "tick_entities": bench_tick_entities,
+    "build_snapshot": bench_build_snapshot,
+    "build_map_init": bench_build_map_init,
+    "map_join": bench_map_join,
+    "generate_asteroids": bench_generate_asteroids,
+    "flow_field": bench_flow_field,
+    "idle_tick": bench_idle_tick,
+    "separation": bench_separation,
+    "transport": bench_transport,
+    "commands": bench_commands,
+    "checkpoint": bench_checkpoint,
+}
+
+def _key(case: str, params: dict) -> str:
+    return case + " " + " ".join(f"{k}={v}" for k, v in sorted(params.items()))
+
+def run_suite(cases: List[str], entity_counts, asteroid_counts, min_time: float) -> dict:
+    results = []
+    print(f"{'case':<52} {'median ms':>11} {'min ms':>11} {'reps':>5}")
+    for case in cases:
+        for params, res, extra in BENCHES[case](entity_counts, asteroid_counts, min_time):
+            row = {"case": case, "params": params, **(res or {}), **extra}
+            results.append(row)
+            if res is None:
+                print(f"{_key(case, params):<52} {'skipped':>11}  ({extra.get('skipped')})")
+            else:
+                print(f"{_key(case, params):<52} {res['median_ms']:>11.4f} {res['min_ms']:>11.4f} {res['reps']:>5}")
+            sys.stdout.flush()
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": np.__version__ if np is not None else None,
+        "time": time.time(),
+        "results": results,
+    }
+
+def compare(baseline: dict, current: dict, threshold: float) -> int:
+    """Print current vs. baseline per case; returns the number of regressions."""
+    base = {_key(r["case"], r["params"]): r for r in baseline["results"] if "median_ms" in r}
+    regressions = 0
+    print(f"\n{'case':<52} {'base ms':>11} {'now ms':>11} {'ratio':>7}")
+    for r in current["results"]:
+        key = _key(r["case"], r["params"])
+        b = base.get(key)
+        if b is None or "median_ms" not in r:
+            continue
+        ratio = r["median_ms"] / b["median_ms"] if b["median_ms"] > 0 else float("inf")
+        flag = ""
+        if ratio > 1.0 + threshold:
+            flag = "  SLOWER"
+            regressions += 1
+        elif ratio < 1.0 - threshold:
+            flag = "  faster"
+        print(f"{key:<52} {b['median_ms']:>11.4f} {r['median_ms']:>11.4f} {ratio:>6.2f}x{flag}")
+    print(f"{regressions} regression(s) beyond {threshold:.0%}")
+    return regressions
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--quick", action="store_true", help="smaller sweeps (up to 5k entities, 1k asteroids)")
+    ap.add_argument("--only", help="comma-separated cases: " + ",".join(CASES))
+    ap.add_argument("--min-time", type=float, default=0.3, help="seconds to spend per measurement")
+    ap.add_argument("--out", help="write results as JSON")
+    ap.add_argument("--compare", help="baseline JSON from an earlier --out")
+    ap.add_argument("--threshold", type=float, default=0.10, help="relative slowdown that counts as a regression")
+    args = ap.parse_args()
+
+    cases = args.only.split(",") if args.only else list(CASES)
+    for c in cases:
+        if c not in BENCHES:
+            ap.error(f"unknown case {c!r}")
+    entity_counts = QUICK_ENTITY_COUNTS if args.quick else ENTITY_COUNTS
+    asteroid_counts = QUICK_ASTEROID_COUNTS if args.quick else ASTEROID_COUNTS
+
+    current = run_suite(cases, entity_counts, asteroid_counts, args.min_time)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(current, f, indent=1)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(baseline, current, args.threshold):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+"""
+Headless load generator: bot players on NetClient + ClientModel, no pygame.
+
+Each bot joins like a real client (hello, map_init, acks) and issues cmd_move,
+cmd_mine and cmd_buy_miner at random (exponential) intervals. Bots record
+snapshot inter-arrival gaps, bytes received, the server tick rate they see
+(snapshot ticks per second) and command-to-effect latency: the time from sending
+an order until a snapshot shows it applied (a probe unit turns toward the move
+target, a miner switches to the new asteroid, or a new miner appears).
+
+With --ramp the player count steps up every --duration seconds (bots from
+earlier stages keep playing), and the report says where the server stops
+holding its tick rate. --procs spreads bots over processes so decoding in the
+bots doesn't become the bottleneck.
+
+--udp connects the bots over the UDP transport; run them through bench/netshim.py
+to add loss and latency.
+
+    python3 -m bench.swarm [--players 8] [--duration 20] [--ramp 4,8,16,32] [--procs 2] [--udp]
+"""
+import argparse
+import math
+import multiprocessing
+import queue
+import random
+import statistics
+import threading
+import time
+from typing import Dict, List, Optional
+
+from rts.client import config as ccfg
+from rts.client.netclient import NetClient
+from rts.client.model import ClientModel
+from rts.net import protocol as P
+from rts.server import config as scfg
+
+PROBE_TIMEOUT = 5.0     # seconds before an unanswered command counts as lost
+MOVE_GROUP = 12         # fighters per move order
+MOVE_TURN = 0.6         # only probe moves that change a unit's heading by this much (rad)
+HEADING_TOL = 0.25      # heading within this of the target bearing counts as applied
+                        # (or a turn of MOVE_TURN / 2 from the old heading: a flow-field detour)
+
+class StageStats:
+    """Raw samples for one stage from one process; merged by the parent."""
+    def __init__(self):
+        self.gaps_ms: List[float] = []
+        self.effect_ms: Dict[str, List[float]] = {"move": [], "mine": [], "buy": []}
+        self.timeouts = 0
+        self.disconnects = 0
+        self.cmds = 0
+        self.bytes = 0
+        self.bot_seconds = 0.0
+        self.tick_rates: List[float] = []
+        self.entities = 0
+
+    def merge(self, other: "StageStats"):
+        self.gaps_ms += other.gaps_ms
+        for k, v in other.effect_ms.items():
+            self.effect_ms[k] += v
+        self.timeouts += other.timeouts
+        self.disconnects += other.disconnects
+        self.cmds += other.cmds
+        self.bytes += other.bytes
+        self.bot_seconds += other.bot_seconds
+        self.tick_rates += other.tick_rates
+        self.entities = max(self.entities, other.entities)
+
+class Bot:
+    def __init__(self, host: str, port: int, rates: dict, seed: int):
+        self.host = host
+        self.port = port
+        self.rates = rates
+        self.rng = random.Random(seed)
+        self.net = NetClient()
+        self.model = ClientModel()
+        self.probes: List[tuple] = []   # (kind, sent_at, check(model) -> bool)
+        self.last_snap: Optional[float] = None
+
+    def run(self, stop: threading.Event, stage_of):
+        """stage_of() -> StageStats to record into right now."""
+        net, model, rng = self.net, self.model, self.rng
+        net.connect(self.host, self.port)
+        next_cmd = {kind: time.perf_counter() + rng.expovariate(hz) for kind, hz in self.rates.items() if hz > 0}
+        stage = stage_of()
+        mark = (time.perf_counter(), net.bytes_recv, None)   # start of this stage for this bot
+
+        while not stop.is_set():
+            try:
+                msg = net.inbox.get(timeout=0.05)
+            except queue.Empty:
+                msg = None
+            got_snap = False
+            while msg is not None:
+                t = msg.get("type")
+                now = time.perf_counter()
+                if t == P.MAP_INIT:
+                    model.apply_map_init(msg)
+                elif t in (P.SNAPSHOT, P.SNAPSHOT_DELTA):
+                    model.apply_snapshot(msg)
+                    got_snap = True
+                    if self.last_snap is not None:
+                        stage.gaps_ms.append((now - self.last_snap) * 1000.0)
+                    self.last_snap = now
+                    if mark[2] is None:
+                        mark = (mark[0], mark[1], (model.tick, now))
+                    self._check_probes(stage, now)
+                elif t == "_disconnect":
+                    stage.disconnects += 1
+                    self._close_stage(stage, mark, now)
+                    return
+                try:
+                    msg = net.inbox.get_nowait()
+                except queue.Empty:
+                    msg = None
+            if got_snap:
+                net.send({"type": P.ACK, "tick": -1 if model.need_full else model.tick})
+
+            now = time.perf_counter()
+            current = stage_of()
+            if current is not stage:
+                self._close_stage(stage, mark, now)
+                stage = current
+                mark = (now, net.bytes_recv, None)
+
+            if model.player_id is None or not model.entities:
+                continue
+            for kind, at in next_cmd.items():
+                if now >= at:
+                    self._command(kind, stage, now)
+                    next_cmd[kind] = now + rng.expovariate(self.rates[kind])
+
+        self._close_stage(stage, mark, time.perf_counter())
+        net.close()
+
+    def _close_stage(self, stage: StageStats, mark: tuple, now: float):
+        t0, b0, first = mark
+        stage.bot_seconds += now - t0
+        stage.bytes += self.net.bytes_recv - b0
+        stage.entities = max(stage.entities, len(self.model.entities))
+        if first is not None and self.model.tick > first[0] and self.last_snap > first[1]:
+            stage.tick_rates.append((self.model.tick - first[0]) / (self.last_snap - first[1]))
+
+    def _check_probes(self, stage: StageStats, now: float):
+        keep = []
+        for kind, sent, check in self.probes:
+            if check(self.model):
+                stage.effect_ms[kind].append((now - sent) * 1000.0)
+            elif now - sent > PROBE_TIMEOUT:
+                stage.timeouts += 1
+            else:
+                keep.append((kind, sent, check))
+        self.probes = keep
+
+    def _command(self, kind: str, stage: StageStats, now: float):
+        model, rng, pid = self.model, self.rng, self.model.player_id
+        mine = [e for e in model.entities.values() if int(e["owner"]) == pid]
+        if kind == "move":
+            fighters = [e for e in mine if e["type"] == "fighter"]
+            if not fighters:
+                return
+            group = rng.sample(fighters, min(MOVE_GROUP, len(fighters)))
+            tx, ty = rng.uniform(0, model.MAP_W), rng.uniform(0, model.MAP_H)
+            self.net.send({"type": P.CMD_MOVE, "unit_ids": [e["id"] for e in group], "x": tx, "y": ty})
+            probe = group[0]
+            if _angle_diff(probe["angle"], _bearing(probe, tx, ty)) > MOVE_TURN:
+                self.probes.append(("move", now, _heading_check(probe["id"], tx, ty, probe["angle"])))
+        elif kind == "mine":
+            miners = [e for e in mine if e["type"] == "miner"]
+            if not miners or not model.asteroids:
+                return
+            probe = rng.choice(miners)
+            aid = rng.choice([a for a in model.asteroids if a != probe.get("mine_asteroid_id")] or list(model.asteroids))
+            self.net.send({"type": P.CMD_MINE, "unit_ids": [probe["id"]], "asteroid_id": aid})
+            self.probes.append(("mine", now, _mine_check(probe["id"], aid)))
+        elif kind == "buy":
+            station = next((e for e in mine if e["type"] == "station"), None)
+            if station is None:
+                return
+            self.net.send({"type": P.CMD_BUY_MINER, "station_id": station["id"]})
+            if model.credits.get(pid, 0) >= scfg.MINER_COST and not any(p[0] == "buy" for p in self.probes):
+                count = sum(1 for e in mine if e["type"] == "miner")
+                self.probes.append(("buy", now, _miner_count_check(pid, count)))
+        stage.cmds += 1
+
+def _bearing(e: dict, tx: float, ty: float) -> float:
+    dx, dy = tx - e["x"], ty - e["y"]
+    return math.atan2(dx, -dy)     # same convention as simulation.move_toward
+
+def _angle_diff(a: float, b: float) -> float:
+    return abs((a - b + math.pi) % (2 * math.pi) - math.pi)
+
+def _heading_check(eid: int, tx: float, ty: float, before: float):
+    def check(model: ClientModel) -> bool:
+        e = model.entities.get(eid)
+        return (e is None or _angle_diff(e["angle"], _bearing(e, tx, ty)) < HEADING_TOL
+                or _angle_diff(e["angle"], before) > MOVE_TURN / 2)
+    return check
+
+def _mine_check(eid: int, aid: int):
+    def check(model: ClientModel) -> bool:
+        e = model.entities.get(eid)
+        return e is None or e.get("mine_asteroid_id") == aid
+    return check
+
+def _miner_count_check(pid: int, count: int):
+    def check(model: ClientModel) -> bool:
+        return sum(1 for e in model.entities.values() if int(e["owner"]) == pid and e["type"] == "miner") > count
+    return check
+
+def run_share(args: dict) -> List[StageStats]:
+    """One process's bots for every stage. Stage s starts at start_at + s * duration."""
+    ccfg.DELTA_SNAPSHOTS = args["delta"]
+    ccfg.BINARY_CODEC = args["binary"]
+    ccfg.TRANSPORT = args["transport"]
+    stages = [StageStats() for _ in args["counts"]]
+    start_at, duration = args["start_at"], args["duration"]
+    stop = threading.Event()
+
+    def stage_of() -> StageStats:
+        i = int((time.time() - start_at) // duration)
+        return stages[max(0, min(i, len(stages) - 1))]
+
+    threads = []
+    for s, count in enumerate(args["counts"]):
+        time.sleep(max(0.0, start_at + s * duration - time.time()))
+        while len(threads) < count:
+            n = len(threads)
+            bot = Bot(args["host"], args["port"], args["rates"], seed=args["seed"] + n * 7919)
+            th = threading.Thread(target=bot.run, args=(stop, stage_of), daemon=True)
+            th.start()
+            threads.append(th)
+    time.sleep(max(0.0, start_at + len(stages) * duration - time.time()))
+    stop.set()
+    for th in threads:
+        th.join(timeout=2.0)
+    return stages
+
+def _pct(vals: List[float], p: int) -> float:
+    if not vals:
+        return float("nan")
+    vals = sorted(vals)
+    return vals[(len(vals) - 1) * p // 100]
+
+def report(counts: List[int], stages: List[StageStats], target_hz: float):
+    print(f"{'players':>7} {'ents':>6} {'tick Hz':>8} {'gap p50':>8} {'gap p99':>8} {'gap max':>8} "
+          f"{'move p50':>9} {'move p99':>9} {'mine p50':>9} {'buy p50':>8} {'KB/s/bot':>9} {'cmds':>6} {'lost':>5} {'disc':>5}")
+    holds: Optional[int] = None
+    failed = False
+    for count, st in zip(counts, stages):
+        hz = statistics.median(st.tick_rates) if st.tick_rates else 0.0
+        kbps = st.bytes / st.bot_seconds / 1024 if st.bot_seconds else 0.0
+        e = st.effect_ms
+        print(f"{count:>7} {st.entities:>6} {hz:>8.1f} {_pct(st.gaps_ms, 50):>8.1f} {_pct(st.gaps_ms, 99):>8.1f} "
+              f"{max(st.gaps_ms, default=float('nan')):>8.1f} {_pct(e['move'], 50):>9.1f} {_pct(e['move'], 99):>9.1f} "
+              f"{_pct(e['mine'], 50):>9.1f} {_pct(e['buy'], 50):>8.1f} {kbps:>9.1f} {st.cmds:>6} {st.timeouts:>5} {st.disconnects:>5}")
+        if hz >= 0.97 * target_hz and st.disconnects == 0:
+            if not failed:
+                holds = count
+        else:
+            failed = True
+    if holds is None:
+        print(f"server did not hold {target_hz:.0f} Hz at {counts[0]} players")
+    else:
+        print(f"server held {target_hz:.0f} Hz up to {holds} players")
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--host", default=ccfg.SERVER_HOST)
+    ap.add_argument("--port", type=int, default=ccfg.SERVER_PORT)
+    ap.add_argument("--players", type=int, default=8)
+    ap.add_argument("--ramp", help="comma-separated player counts, one stage each (overrides --players)")
+    ap.add_argument("--duration", type=float, default=20.0, help="seconds per stage")
+    ap.add_argument("--procs", type=int, default=1)
+    ap.add_argument("--move-hz", type=float, default=1.0, help="move orders per bot per second")
+    ap.add_argument("--mine-hz", type=float, default=0.2)
+    ap.add_argument("--buy-hz", type=float, default=0.5)
+    ap.add_argument("--json", action="store_true", help="don't offer the binary codec")
+    ap.add_argument("--full", action="store_true", help="don't ask for snapshot_delta")
+    ap.add_argument("--udp", action="store_true", help="connect over UDP (server needs UDP = True); see bench/netshim.py")
+    ap.add_argument("--tick-hz", type=float, default=scfg.TICK_HZ, help="rate the server should hold")
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+
+    counts = [int(c) for c in args.ramp.split(",")] if args.ramp else [args.players]
+    rates = {"move": args.move_hz, "mine": args.mine_hz, "buy": args.buy_hz}
+    start_at = time.time() + 1.0
+    shares = []
+    for p in range(args.procs):
+        share_counts = [len(range(p, c, args.procs)) for c in counts]
+        shares.append({
+            "host": args.host, "port": args.port, "counts": share_counts, "rates": rates,
+            "start_at": start_at, "duration": args.duration, "seed": args.seed + p * 104729,
+            "delta": not args.full, "binary": not args.json, "transport": "udp" if args.udp else "tcp",
+        })
+
+    print(f"stages={counts} duration={args.duration:.0f}s procs={args.procs} rates={rates}")
+    if args.procs == 1:
+        results = [run_share(shares[0])]
+    else:
+        with multiprocessing.Pool(args.procs) as pool:
+            results = pool.map(run_share, shares)
+
+    merged = [StageStats() for _ in counts]
+    for stages in results:
+        for m, st in zip(merged, stages):
+            m.merge(st)
+    report(counts, merged, args.tick_hz)
+
+if __name__ == "__main__":
+    main()
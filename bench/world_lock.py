@@ -0,0 +1,85 @@
+"""
+world_lock contention: snapshot/map_init readers on the live world vs. the
+published WorldFrame.
+
+Runs the sim step (apply_commands + tick_entities + snapshot) on the main thread
+while a reader thread keeps building map_init, like clients joining. Reports how
+long world_lock is held per tick and how long the reader waits.
+
+    python3 -m bench.world_lock [--units 5000] [--ticks 100] [--numpy]
+"""
+import argparse
+import statistics
+import threading
+import time
+
+from rts.server.commands import apply_commands
+from rts.server.simulation import tick_entities
+from rts.server.snapshots import build_snapshot, build_map_init, publish_frame
+from .entity_store import make_world
+
+class TimedLock:
+    """Wraps a Lock and adds up how long it was held."""
+    def __init__(self, lock):
+        self.lock = lock
+        self.held = 0.0
+        self.t0 = 0.0
+
+    def __enter__(self):
+        self.lock.acquire()
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.held += time.perf_counter() - self.t0
+        self.lock.release()
+
+def run(units: int, ticks: int, columnar: bool, frames: bool):
+    state = make_world(units, columnar)
+    lock = TimedLock(state.world_lock)
+    state.world_lock = lock
+    if frames:
+        publish_frame(state, 0)
+
+    waits = []
+    done = threading.Event()
+
+    def reader():
+        while not done.is_set():
+            t0 = time.perf_counter()
+            build_map_init(state, 1)
+            waits.append(time.perf_counter() - t0)
+            time.sleep(0.001)
+
+    th = threading.Thread(target=reader, daemon=True)
+    th.start()
+    t0 = time.perf_counter()
+    for tick in range(1, ticks + 1):
+        apply_commands(state)
+        tick_entities(state)
+        if frames:
+            publish_frame(state, tick)
+        build_snapshot(state, tick)
+    elapsed = time.perf_counter() - t0
+    done.set()
+    th.join()
+
+    waits.sort()
+    p99 = waits[int(len(waits) * 0.99) - 1] if waits else 0.0
+    return lock.held / ticks, elapsed / ticks, statistics.median(waits) if waits else 0.0, p99
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--units", type=int, default=5000)
+    ap.add_argument("--ticks", type=int, default=100)
+    ap.add_argument("--numpy", action="store_true", help="use the columnar EntityStore")
+    args = ap.parse_args()
+
+    print(f"units={args.units} ticks={args.ticks} store={'numpy' if args.numpy else 'dict'}")
+    print(f"{'mode':>8} {'lock ms/tick':>13} {'tick ms':>8} {'reader p50 ms':>14} {'reader p99 ms':>14}")
+    for name, frames in (("locked", False), ("frame", True)):
+        held, per_tick, p50, p99 = run(args.units, args.ticks, args.numpy, frames)
+        print(f"{name:>8} {held * 1000:>13.2f} {per_tick * 1000:>8.2f} {p50 * 1000:>14.3f} {p99 * 1000:>14.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
+import os
 import random
 import pygame
-from typing import Dict, Tuple
+from typing import Dict, Optional, Tuple
 
 from . import config as cfg
 
@@ -14,7 +15,24 @@ def init_stars(seed: int, map_w: int, map_h: int):
         out.append((x, y, r))
     return out
 
+def load_map_assets(maps, map_hash: Optional[str], map_seed: int, map_w: int, map_h: int):
+    """
+    Stars for a map, from the map cache (rts/client/mapcache.py) when it has them,
+    and point get_asteroid_tex at the map's cached textures.
+    """
+    global tex_dir
+    tex_dir = maps.dir(map_hash) if maps is not None and map_hash else None
+    if tex_dir is None:
+        return init_stars(map_seed, map_w, map_h)
+    saved = maps.load_json(map_hash, "stars.json")
+    if saved is not None and saved.get("count") == cfg.STAR_COUNT:
+        return [tuple(s) for s in saved["stars"]]
+    stars = init_stars(map_seed, map_w, map_h)
+    maps.save_json(map_hash, "stars.json", {"count": cfg.STAR_COUNT, "stars": stars})
+    return stars
+
 asteroid_tex_cache: Dict[Tuple[int, int, int], pygame.Surface] = {}  # (seed, asteroid_id, radius)->surf
+tex_dir: Optional[str] = None   # the current map's cache directory: textures are read from / baked into it
 
 def make_asteroid_texture(map_seed: int, asteroid_id: int, radius: int) -> pygame.Surface:
     rng = random.Random(map_seed * 1000003 + asteroid_id * 9176 + radius * 31)
@@ -70,6 +88,18 @@ def get_asteroid_tex(map_seed: int, aid: int, r: int) -> pygame.Surface:
     key = (map_seed, aid, r)
     tex = asteroid_tex_cache.get(key)
     if tex is None:
-        tex = make_asteroid_texture(map_seed, aid, r)
+        path = os.path.join(tex_dir, f"ast_{aid}_{r}.png") if tex_dir is not None else None
+        if path is not None and os.path.exists(path):
+            try:
+                tex = pygame.image.load(path).convert_alpha()
+            except pygame.error:
+                tex = None
+        if tex is None:
+            tex = make_asteroid_texture(map_seed, aid, r)
+            if path is not None:
+                try:
+                    pygame.image.save(tex, path)
+                except pygame.error:
+                    pass
         asteroid_tex_cache[key] = tex
     return tex
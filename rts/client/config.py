@@ -1,5 +1,16 @@
+import os
+
 SERVER_HOST = "127.0.0.1"
 SERVER_PORT = 5001
+DELTA_SNAPSHOTS = True  # ask the server for snapshot_delta in hello
+BINARY_CODEC = True     # offer the binary wire codec in hello (JSON if the server declines)
+TRANSPORT = "tcp"       # "udp": unreliable snapshots, reliable commands (rts/net/udp.py); TCP if the server doesn't answer
+UDP_CONNECT_TIMEOUT_S = 2.0
+REPORT_VIEWPORT = True  # tell the server what we see so it can skip detail for the rest
+VIEWPORT_RESEND_PX = 64 # camera movement before the viewport is reported again
+MATCH = None            # match to join on a match-mode server (None: any with room)
+MAP_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "rts-space", "maps")  # None: no map cache
+MAP_CACHE_KEEP = 8      # maps kept in the cache
 
 EDGE_MARGIN = 20
 CAMERA_SPEED = 900
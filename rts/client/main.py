@@ -4,7 +4,7 @@ from rts.net import protocol as P
 from . import config as cfg
 from .model import ClientModel
 from .camera import Camera
-from .assets import init_stars
+from .assets import load_map_assets
 from .netclient import NetClient
 from .render import draw_stars, draw_asteroids, draw_entities, draw_minimap
 from .input import rect_from_points, pick_entity_at, pick_asteroid_at, get_my_station_id, selected_miners
@@ -31,6 +31,7 @@ def main():
     sel_end = pygame.Vector2(0, 0)
 
     centered_once = False
+    sent_viewport = None
     running = True
 
     minimap_rect = pygame.Rect(W - cfg.MINIMAP_W - cfg.MINIMAP_MARGIN, cfg.MINIMAP_MARGIN, cfg.MINIMAP_W, cfg.MINIMAP_H)
@@ -40,6 +41,7 @@ def main():
         dt = clock.tick(RENDER_HZ) / 1000.0
 
         # Drain network inbox on main thread
+        got_snapshot = False
         while True:
             try:
                 msg = net.inbox.get_nowait()
@@ -50,16 +52,29 @@ def main():
             if t == P.MAP_INIT:
                 model.apply_map_init(msg)
                 with model.lock:
-                    stars = init_stars(model.MAP_SEED, model.MAP_W, model.MAP_H)
-                print(f"[client] map_init player_id={model.player_id} asteroids={len(model.asteroids)}")
+                    stars = load_map_assets(net.maps, msg.get("map_hash"), model.MAP_SEED, model.MAP_W, model.MAP_H)
+                print(f"[client] map_init player_id={model.player_id} asteroids={len(model.asteroids)}"
+                      + (" (cached)" if net.map_cached else "")
+                      + (f" match={msg['match']!r}" if "match" in msg else ""))
 
-            elif t == P.SNAPSHOT:
+            elif t in (P.SNAPSHOT, P.SNAPSHOT_DELTA):
                 model.apply_snapshot(msg)
+                got_snapshot = True
+
+            elif t == P.SNAPSHOT_SUMMARY:
+                model.apply_summary(msg)
+
+            elif t == P.ERROR:
+                print("[client] server refused:", msg.get("reason"))
 
             elif t == "_disconnect":
                 print("[client] disconnected:", msg.get("error"))
                 running = False
 
+        if got_snapshot:
+            # -1 asks for a full snapshot when a delta's baseline was missing
+            net.send({"type": P.ACK, "tick": -1 if model.need_full else model.tick})
+
         with model.lock:
             pid = model.player_id
             map_w, map_h, map_seed = model.MAP_W, model.MAP_H, model.MAP_SEED
@@ -68,9 +83,16 @@ def main():
             ents_by_id = dict(model.entities)
             credits = dict(model.credits)
             tick = model.tick
+            summary = model.summary
+            mining_since = model.mining_since
 
         cam.update_from_mouse_edge(dt, W, H, map_w, map_h)
 
+        if cfg.REPORT_VIEWPORT and pid is not None and (
+                sent_viewport is None or sent_viewport.distance_to(cam.pos) >= cfg.VIEWPORT_RESEND_PX):
+            sent_viewport = pygame.Vector2(cam.pos)
+            net.send({"type": P.VIEWPORT, "x": float(cam.pos.x), "y": float(cam.pos.y), "w": float(W), "h": float(H)})
+
         mouse_screen = pygame.Vector2(pygame.mouse.get_pos())
         mouse_world = cam.screen_to_world(mouse_screen)
 
@@ -148,13 +170,13 @@ def main():
         screen.fill((8, 10, 18))
         draw_stars(screen, stars, cam.pos, W, H)
         draw_asteroids(screen, ast_list, cam, W, H, map_seed)
-        draw_entities(screen, ents_list, cam, W, H, pid, selected_ids, small)
+        draw_entities(screen, ents_list, cam, W, H, pid, selected_ids, small, mining_since)
 
         if selecting:
             box = rect_from_points(sel_start, sel_end)
             pygame.draw.rect(screen, (0, 200, 255), box, 2)
 
-        draw_minimap(screen, minimap_rect, map_w, map_h, cam.pos, W, H, ast_list, ents_list, pid)
+        draw_minimap(screen, minimap_rect, map_w, map_h, cam.pos, W, H, ast_list, ents_list, pid, summary)
 
         my_credits = credits.get(pid or -1, 0)
         hud = font.render(f"Credits: {my_credits}    (M) Buy Miner", True, (220, 220, 230))
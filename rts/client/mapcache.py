@@ -0,0 +1,93 @@
+"""
+On-disk map cache, keyed by the server's map_hash (MAP_INIT). Each map is a
+directory under MAP_CACHE_DIR holding map.json (size, seed, asteroids),
+stars.json (init_stars for a STAR_COUNT) and the asteroid textures as PNGs
+(assets.get_asteroid_tex). NetClient lists the cached hashes in HELLO, so a
+reconnect to the same map gets map_init without the asteroid list.
+
+No pygame here: bench bots use NetClient too.
+"""
+import json
+import os
+import shutil
+import string
+import threading
+from typing import List, Optional
+
+_HEX = frozenset(string.hexdigits)
+
+def _valid(map_hash) -> bool:
+    # it names a directory, so only ever a 16-digit hex string from the server
+    return isinstance(map_hash, str) and len(map_hash) == 16 and _HEX.issuperset(map_hash)
+
+class MapCache:
+    def __init__(self, root: str, keep: int = 8):
+        self.root = root
+        self.keep = keep        # maps kept; the least recently used go first
+
+    def dir(self, map_hash: str) -> Optional[str]:
+        if not _valid(map_hash):
+            return None
+        return os.path.join(self.root, map_hash.lower())
+
+    def hashes(self) -> List[str]:
+        """Cached map hashes (up to keep), most recently used first."""
+        return self._listed()[:self.keep]
+
+    def _listed(self) -> List[str]:
+        try:
+            names = [n for n in os.listdir(self.root) if _valid(n)]
+        except OSError:
+            return []
+        found = []
+        for n in names:
+            try:
+                found.append((os.path.getmtime(os.path.join(self.root, n, "map.json")), n))
+            except OSError:
+                pass
+        found.sort(reverse=True)
+        return [n for _, n in found]
+
+    def load(self, map_hash: str) -> Optional[dict]:
+        """The map_init fields saved for map_hash (asteroids included), or None."""
+        m = self.load_json(map_hash, "map.json")
+        if m is not None:
+            try:
+                os.utime(os.path.join(self.dir(map_hash), "map.json"))
+            except OSError:
+                pass
+        return m
+
+    def save(self, init: dict):
+        """Cache a complete map_init (after any map_chunks) and drop the oldest maps past keep."""
+        m = {k: init[k] for k in ("map_w", "map_h", "map_seed", "map_hash", "asteroids")}
+        if not self.save_json(init["map_hash"], "map.json", m):
+            return
+        for old in self._listed()[self.keep:]:
+            shutil.rmtree(os.path.join(self.root, old), ignore_errors=True)
+
+    def load_json(self, map_hash: str, name: str):
+        d = self.dir(map_hash)
+        if d is None:
+            return None
+        try:
+            with open(os.path.join(d, name), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save_json(self, map_hash: str, name: str, obj) -> bool:
+        """Write atomically (temp file + rename), so a crash never leaves half a file."""
+        d = self.dir(map_hash)
+        if d is None:
+            return False
+        try:
+            os.makedirs(d, exist_ok=True)
+            tmp = os.path.join(d, f"{name}.{os.getpid()}.{threading.get_ident()}.tmp")   # bots share a cache
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(obj, f, separators=(",", ":"))
+            os.replace(tmp, os.path.join(d, name))
+        except OSError as e:
+            print(f"[client] map cache write failed: {e}")
+            return False
+        return True
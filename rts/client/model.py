@@ -1,6 +1,11 @@
 import threading
+import time
 from dataclasses import dataclass, field
-from typing import Dict, Optional
+from typing import Dict, List, Optional
+
+from rts.net import protocol as P
+
+SNAP_HISTORY = 64  # received snapshots kept as delta baselines
 
 @dataclass
 class ClientModel:
@@ -14,6 +19,17 @@ class ClientModel:
     credits: Dict[int, int] = field(default_factory=dict)
     tick: int = 0
 
+    # tick -> entities, baselines the server may send snapshot_delta against
+    snap_history: Dict[int, Dict[int, dict]] = field(default_factory=dict)
+    need_full: bool = False  # got a delta whose base we no longer have
+
+    # miner id -> local time it was first seen mining; the server sends a mining
+    # miner's angle frozen and adds its spin when it's done (see entity_angle)
+    mining_since: Dict[int, float] = field(default_factory=dict)
+
+    # [id, owner, x, y] of the entities outside our viewport, low rate
+    summary: List[list] = field(default_factory=list)
+
     lock: threading.Lock = field(default_factory=threading.Lock)
 
     def apply_map_init(self, msg: dict):
@@ -23,12 +39,62 @@ class ClientModel:
             self.MAP_H = int(msg["map_h"])
             self.MAP_SEED = int(msg["map_seed"])
             self.asteroids = {int(a["id"]): a for a in msg["asteroids"]}
+            self.tick = 0               # a new world's ticks start over
+            self.snap_history.clear()
+            self.mining_since = {}
             # entities/credits remain until snapshots arrive
 
     def apply_snapshot(self, msg: dict):
+        """
+        Over UDP full snapshots (reliable) and deltas (unreliable) can arrive out of
+        order, so anything not newer than the current tick is ignored, except the
+        full snapshot a need_full client is waiting for.
+        """
+        tick = int(msg["tick"])
+        if tick <= self.tick and not (self.need_full and msg.get("type") == P.SNAPSHOT):
+            return
         new_credits = {int(k): int(v) for k, v in msg.get("credits", {}).items()}
-        new_entities = {int(e["id"]): e for e in msg.get("entities", [])}
+        if msg.get("type") == P.SNAPSHOT_DELTA:
+            base = self.snap_history.get(int(msg["base"]))
+            if base is None:
+                self.need_full = True
+                return
+            # Records are shared with older snapshots, so copy before changing.
+            new_entities = dict(base)
+            for eid in msg.get("removed", []):
+                new_entities.pop(int(eid), None)
+            for e in msg.get("created", []):
+                new_entities[int(e["id"])] = e
+            for ch in msg.get("changed", []):
+                eid = int(ch["id"])
+                rec = dict(new_entities.get(eid, {}))
+                rec.update(ch)
+                new_entities[eid] = rec
+        else:
+            new_entities = {int(e["id"]): e for e in msg.get("entities", [])}
+
+        self.snap_history[tick] = new_entities
+        while len(self.snap_history) > SNAP_HISTORY:
+            del self.snap_history[next(iter(self.snap_history))]
+        self.need_full = False
+
+        now = time.monotonic()
+        since = self.mining_since
+        mining = {eid: since.get(eid, now) for eid, e in new_entities.items() if e.get("miner_state") == "mining"}
+
         with self.lock:
-            self.tick = int(msg["tick"])
+            self.tick = tick
             self.credits = new_credits
             self.entities = new_entities
+            self.mining_since = mining
+
+    def apply_summary(self, msg: dict):
+        rows = msg.get("entities", [])
+        with self.lock:
+            self.summary = rows
+
+def entity_angle(ent: dict, mining_since: Dict[int, float], now: float) -> float:
+    """Angle to draw: the server's, plus the spin of a miner that has been mining since mining_since."""
+    t0 = mining_since.get(int(ent["id"]))
+    angle = float(ent["angle"])
+    return angle if t0 is None else angle + P.MINER_SPIN * (now - t0)
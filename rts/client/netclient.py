@@ -1,41 +1,177 @@
 import socket
 import threading
+import time
 import queue
+from typing import Optional
 
-from rts.net.transport import recv_msg, send_msg
+from rts.net.transport import FrameReader, decode_payload, encode_payload, send_msg
 from rts.net import protocol as P
+from rts.net import udp
+from . import config as cfg
+from .mapcache import MapCache
 
 class NetClient:
     def __init__(self):
         self.sock: socket.socket | None = None
+        self.chan: Optional[udp.Channel] = None   # set when connected over UDP
         self.inbox: "queue.Queue[dict]" = queue.Queue()
+        self.binary = False  # server picked the binary codec in map_init
+        self.bytes_recv = 0  # wire bytes, headers included
+        self.maps = MapCache(cfg.MAP_CACHE_DIR, cfg.MAP_CACHE_KEEP) if cfg.MAP_CACHE_DIR else None
+        self.map_cached = False             # the last map_init came from the cache
+        self._map: Optional[dict] = None    # map_init still waiting for map_chunks
+        self._chunks_left = 0
 
     def connect(self, host: str, port: int):
+        codecs = [P.CODEC_BIN, P.CODEC_JSON] if cfg.BINARY_CODEC else [P.CODEC_JSON]
+        hello = {"type": P.HELLO, "name": "player", "delta": cfg.DELTA_SNAPSHOTS, "codecs": codecs}
+        if cfg.MATCH is not None:
+            hello["match"] = cfg.MATCH
+        if self.maps is not None:
+            hello["map_hashes"] = self.maps.hashes()
+
+        if cfg.TRANSPORT == "udp" and self._connect_udp(host, port, hello):
+            return
         sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         sock.connect((host, port))
         sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
         self.sock = sock
-
-        send_msg(sock, {"type": P.HELLO, "name": "player"})
+        send_msg(sock, hello)
         threading.Thread(target=self._recv_loop, daemon=True).start()
 
+    def _connect_udp(self, host: str, port: int, hello: dict) -> bool:
+        """
+        Get a cookie, then send HELLO over UDP (rts/net/udp.py). False, with nothing
+        left open, if the server doesn't answer within UDP_CONNECT_TIMEOUT_S: the
+        caller then uses TCP.
+        """
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.settimeout(udp.POLL_S)
+        chan = udp.Channel(sock.send)
+        cookie = b""
+        first = None
+        try:
+            sock.connect((host, port))
+            deadline = time.monotonic() + cfg.UDP_CONNECT_TIMEOUT_S
+            next_connect = 0.0
+            while first is None and time.monotonic() < deadline:
+                now = time.monotonic()
+                if now >= next_connect:
+                    # until the server's channel answers: the echo may have been lost
+                    sock.send(udp.connect_datagram(cookie))
+                    next_connect = now + udp.CONNECT_RESEND_S
+                try:
+                    dgram = sock.recv(65536)
+                except socket.timeout:
+                    if cookie:
+                        chan.poll()
+                    continue
+                got = udp.handshake_cookie(dgram)
+                if got is None:
+                    first = dgram
+                elif not cookie and dgram[0] == udp.COOKIE:
+                    cookie = got
+                    sock.send(udp.connect_datagram(cookie))
+                    next_connect = time.monotonic() + udp.CONNECT_RESEND_S
+                    chan.send_reliable(encode_payload(hello))
+        except OSError:
+            pass    # e.g. ICMP port unreachable: no UDP on the server
+        if first is None:
+            chan.close()
+            sock.close()
+            print(f"[client] no UDP answer from {host}:{port}, using TCP")
+            return False
+        self.sock, self.chan = sock, chan
+        threading.Thread(target=self._udp_loop, args=(first,), daemon=True).start()
+        return True
+
     def _recv_loop(self):
         assert self.sock is not None
+        reader = FrameReader(self.sock)
+        try:
+            while True:
+                payload = reader.read()
+                self.bytes_recv += 4 + len(payload)
+                self._on_payload(payload)
+        except Exception as e:
+            self.inbox.put({"type": "_disconnect", "error": str(e)})
+
+    def _udp_loop(self, first: bytes):
+        sock, chan = self.sock, self.chan
+        dgram = first
+        next_poll = time.monotonic()
         try:
             while True:
-                msg = recv_msg(self.sock)
-                self.inbox.put(msg)
+                if dgram:
+                    self.bytes_recv += len(dgram)
+                    for payload in chan.receive(dgram):
+                        self._on_payload(payload)
+                now = time.monotonic()
+                if now >= next_poll:
+                    next_poll = now + udp.POLL_S
+                    if not chan.poll():
+                        raise ConnectionError("server closed the connection or stopped answering")
+                try:
+                    dgram = sock.recv(65536)
+                except socket.timeout:
+                    dgram = None
         except Exception as e:
             self.inbox.put({"type": "_disconnect", "error": str(e)})
 
+    def _on_payload(self, payload):
+        msg = decode_payload(payload)
+        t = msg.get("type")
+        if t == P.MAP_INIT:
+            self.binary = msg.get("codec") == P.CODEC_BIN
+            msg = self._map_init(msg)
+        elif t == P.MAP_CHUNK:
+            msg = self._map_chunk(msg)
+        if msg is not None:
+            self.inbox.put(msg)
+
+    def _map_init(self, msg: dict) -> Optional[dict]:
+        """Fill a cached map in from disk; hold a split one back until its chunks are in."""
+        self.map_cached = bool(msg.get("cached"))
+        if self.map_cached:
+            saved = self.maps.load(msg["map_hash"]) if self.maps is not None else None
+            if saved is None:
+                raise ConnectionError(f"server sent map {msg['map_hash']} as cached, but it isn't")
+            msg["asteroids"] = saved["asteroids"]
+            return msg
+        if msg.get("chunks"):
+            self._map = msg
+            self._chunks_left = msg["chunks"]
+            return None
+        return self._map_done(msg)
+
+    def _map_chunk(self, msg: dict) -> Optional[dict]:
+        if self._map is None:
+            return None
+        self._map["asteroids"].extend(msg["asteroids"])
+        self._chunks_left -= 1
+        if self._chunks_left > 0:
+            return None
+        init, self._map = self._map, None
+        return self._map_done(init)
+
+    def _map_done(self, init: dict) -> dict:
+        if self.maps is not None and init.get("map_hash"):
+            self.maps.save(init)
+        return init
+
     def send(self, msg: dict):
         if self.sock is None:
             return
-        send_msg(self.sock, msg)
+        if self.chan is not None:
+            self.chan.send(encode_payload(msg, self.binary), msg.get("type"))
+        else:
+            send_msg(self.sock, msg, self.binary)
 
     def close(self):
         if self.sock is None:
             return
+        if self.chan is not None:
+            self.chan.close()
         try:
             self.sock.close()
         except Exception:
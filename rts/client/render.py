@@ -1,8 +1,10 @@
 import math
+import time
 import pygame
 from typing import Dict, List, Optional, Tuple
 
 from .assets import get_asteroid_tex
+from .model import entity_angle
 
 def rotate_point(px, py, angle):
     ca, sa = math.cos(angle), math.sin(angle)
@@ -61,7 +63,9 @@ def draw_asteroids(screen: pygame.Surface, ast_list: List[dict], camera, W: int,
             screen.blit(tex, rect)
 
 def draw_entities(screen: pygame.Surface, ents_list: List[dict], camera, W: int, H: int,
-                  player_id: Optional[int], selected_ids: set[int], small_font: pygame.font.Font):
+                  player_id: Optional[int], selected_ids: set[int], small_font: pygame.font.Font,
+                  mining_since: Optional[Dict[int, float]] = None):
+    now = time.monotonic()
     for ent in ents_list:
         sp = camera.world_to_screen(pygame.Vector2(ent["x"], ent["y"]))
         if not (-200 <= sp.x <= W + 200 and -200 <= sp.y <= H + 200):
@@ -83,7 +87,7 @@ def draw_entities(screen: pygame.Surface, ents_list: List[dict], camera, W: int,
 
         elif ent["type"] == "miner":
             tint = (160, 220, 255) if is_me else (255, 120, 120)
-            draw_ship(screen, (sp.x, sp.y), float(ent["angle"]), scale=0.45, tint=tint)
+            draw_ship(screen, (sp.x, sp.y), entity_angle(ent, mining_since or {}, now), scale=0.45, tint=tint)
             if int(ent["id"]) in selected_ids:
                 draw_health_bar(screen, sp + pygame.Vector2(0, -30), 54, ent["hp"], ent["hp_max"])
                 st = ent.get("miner_state") or "idle"
@@ -92,7 +96,8 @@ def draw_entities(screen: pygame.Surface, ents_list: List[dict], camera, W: int,
 
 def draw_minimap(surface: pygame.Surface, minimap_rect: pygame.Rect,
                  map_w: int, map_h: int, camera_pos: pygame.Vector2, W: int, H: int,
-                 asts: List[dict], ents: List[dict], player_id: Optional[int]):
+                 asts: List[dict], ents: List[dict], player_id: Optional[int],
+                 summary: Optional[List[list]] = None):
     pygame.draw.rect(surface, (10, 12, 18), minimap_rect)
     pygame.draw.rect(surface, (70, 70, 90), minimap_rect, 2)
 
@@ -119,3 +124,16 @@ def draw_minimap(surface: pygame.Surface, minimap_rect: pygame.Rect,
             pygame.draw.circle(surface, color, (int(mp.x), int(mp.y)), 2)
         else:
             pygame.draw.circle(surface, (255, 90, 90), (int(mp.x), int(mp.y)), 2)
+
+    # Coarse [id, owner, x, y] rows for whatever the server isn't sending in full
+    if summary:
+        detailed = {int(e["id"]) for e in ents}
+        for eid, owner, x, y in summary:
+            if eid in detailed:
+                continue
+            mp = world_to_minimap(pygame.Vector2(x, y))
+            if player_id is not None and owner == player_id:
+                color = (0, 255, 120)
+            else:
+                color = (255, 90, 90)
+            pygame.draw.circle(surface, color, (int(mp.x), int(mp.y)), 2)
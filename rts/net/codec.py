@@ -0,0 +1,400 @@
+"""
+Binary message codec, negotiated in HELLO as an alternative to JSON.
+
+A binary payload starts with MAGIC and a message type code, so recv_msg can tell
+it apart from JSON (which always starts with "{"). Entity and asteroid lists are
+fixed-layout records packed with one struct call and decoded with iter_unpack.
+Positions are quantized to a per-message unit (>= POS_UNIT px), angles to 1/65536
+of a turn, and type/miner_state become enum codes.
+
+encode() returns None for anything it cannot represent (unknown message type or
+field, out-of-range values); callers then fall back to JSON.
+"""
+import math
+import struct
+from typing import Dict, List, Optional
+
+from . import protocol as P
+
+MAGIC = 0x00
+
+POS_UNIT = 0.25                 # finest position step, in world px
+ANGLE_STEPS = 65536
+TWO_PI = 2.0 * math.pi
+
+TYPE_CODES = {"station": 0, "fighter": 1, "miner": 2}
+TYPE_NAMES = {v: k for k, v in TYPE_CODES.items()}
+MINER_STATE_CODES = {None: 0, "idle": 1, "to_asteroid": 2, "mining": 3, "returning": 4}
+MINER_STATE_NAMES = {v: k for k, v in MINER_STATE_CODES.items()}
+CODEC_CODES = {P.CODEC_JSON: 0, P.CODEC_BIN: 1}
+CODEC_NAMES = {v: k for k, v in CODEC_CODES.items()}
+
+NO_ID = 0xFFFFFFFF
+
+MSG_CODES = {
+    P.MAP_INIT: 1,
+    P.SNAPSHOT: 2,
+    P.SNAPSHOT_DELTA: 3,
+    P.ACK: 4,
+    P.CMD_MOVE: 5,
+    P.CMD_BUY_MINER: 6,
+    P.CMD_MINE: 7,
+    P.VIEWPORT: 8,
+    P.SNAPSHOT_SUMMARY: 9,
+    P.MAP_CHUNK: 10,
+}
+
+HEAD = struct.Struct("<BB")
+CREDIT = struct.Struct("<Hi")
+
+# id, type, owner, x, y, angle, hp, hp_max, miner_state, mine_asteroid_id
+ENTITY = struct.Struct("<IBHHHHHHBI")
+ENTITY_FIELDS = ("id", "type", "owner", "x", "y", "angle", "hp", "hp_max", "miner_state", "mine_asteroid_id")
+ENTITY_KEYS = frozenset(ENTITY_FIELDS)
+# Delta "changed" entries: field presence mask + the same fixed record.
+CHANGED = struct.Struct("<H" + ENTITY.format[1:])
+ASTEROID = struct.Struct("<Ifff")
+SUMMARY = struct.Struct("<IHHH")            # id, owner, x, y
+
+SNAPSHOT_HEAD = struct.Struct("<IfHI")       # tick, pos unit, credits count, entity count
+DELTA_HEAD = struct.Struct("<iifHIII")       # tick, base, pos unit, credits, created, changed, removed
+MAP_INIT_HEAD = struct.Struct("<IIIqB8sBHIH") # player_id, map_w, map_h, map_seed, codec, map_hash, cached, chunks,
+                                              # asteroid count, match name bytes (utf-8, before the asteroids)
+MAP_CHUNK_HEAD = struct.Struct("<HI")        # index, asteroid count
+CMD_MOVE_HEAD = struct.Struct("<ddI")        # x, y, unit count
+CMD_MINE_HEAD = struct.Struct("<iI")         # asteroid_id, unit count
+CMD_BUY_MINER_BODY = struct.Struct("<i")     # station_id
+ACK_BODY = struct.Struct("<i")               # tick
+VIEWPORT_BODY = struct.Struct("<ffff")       # x, y, w, h
+SUMMARY_HEAD = struct.Struct("<IfI")         # tick, pos unit, count
+
+class _Unencodable(Exception):
+    pass
+
+def is_binary(payload) -> bool:
+    return len(payload) > 0 and payload[0] == MAGIC
+
+# --- quantization ---
+
+def _pos_unit(records: List[dict]) -> float:
+    hi = 0.0
+    for r in records:
+        x = r.get("x", 0.0)
+        y = r.get("y", 0.0)
+        if x < 0 or y < 0:
+            raise _Unencodable("negative position")
+        if x > hi:
+            hi = x
+        if y > hi:
+            hi = y
+    if hi <= POS_UNIT * 65535:
+        return POS_UNIT
+    # a hair over hi/65535 so float32 rounding can't push hi past the uint16 range;
+    # round-tripped through float32 so both ends scale with the same value
+    return struct.unpack("<f", struct.pack("<f", hi / 65535.0 * 1.000001))[0]
+
+def _q_angle(a: float) -> int:
+    return int((a % TWO_PI) * (ANGLE_STEPS / TWO_PI) + 0.5) % ANGLE_STEPS
+
+def _q_hp(v: float) -> int:
+    v = int(round(v))
+    if not 0 <= v <= 0xFFFF:
+        raise _Unencodable("hp out of range")
+    return v
+
+def _entity_values(r: dict, inv_unit: float) -> tuple:
+    mid = r.get("mine_asteroid_id")
+    return (
+        r.get("id", 0),
+        TYPE_CODES[r.get("type", "station")],
+        r.get("owner", 0),
+        int(r.get("x", 0.0) * inv_unit + 0.5),
+        int(r.get("y", 0.0) * inv_unit + 0.5),
+        _q_angle(r.get("angle", 0.0)),
+        _q_hp(r.get("hp", 0)),
+        _q_hp(r.get("hp_max", 0)),
+        MINER_STATE_CODES[r.get("miner_state")],
+        NO_ID if mid is None else mid,
+    )
+
+def _entity_dict(t: tuple, unit: float) -> dict:
+    mid = t[9]
+    return {
+        "id": t[0],
+        "type": TYPE_NAMES[t[1]],
+        "owner": t[2],
+        "x": t[3] * unit,
+        "y": t[4] * unit,
+        "angle": t[5] * TWO_PI / ANGLE_STEPS,
+        "hp": t[6],
+        "hp_max": t[7],
+        "miner_state": MINER_STATE_NAMES[t[8]],
+        "mine_asteroid_id": None if mid == NO_ID else mid,
+    }
+
+def _pack_entities(records: List[dict], inv_unit: float) -> bytes:
+    # Full records only (snapshot entities, delta "created"); inlined for speed.
+    flat = []
+    push = flat.extend
+    keys = ENTITY_KEYS
+    types = TYPE_CODES
+    states = MINER_STATE_CODES
+    ang = ANGLE_STEPS / TWO_PI
+    for r in records:
+        if len(r) != 10 or not keys.issuperset(r):
+            raise _Unencodable("entity record needs exactly the ENTITY_FIELDS")
+        hp = int(round(r["hp"]))
+        hp_max = int(round(r["hp_max"]))
+        if not (0 <= hp <= 0xFFFF and 0 <= hp_max <= 0xFFFF):
+            raise _Unencodable("hp out of range")
+        mid = r["mine_asteroid_id"]
+        push((
+            r["id"],
+            types[r["type"]],
+            r["owner"],
+            int(r["x"] * inv_unit + 0.5),
+            int(r["y"] * inv_unit + 0.5),
+            int((r["angle"] % TWO_PI) * ang + 0.5) % ANGLE_STEPS,
+            hp,
+            hp_max,
+            states[r["miner_state"]],
+            NO_ID if mid is None else mid,
+        ))
+    return struct.pack("<" + ENTITY.format[1:] * len(records), *flat)
+
+def _pack_credits(credits: Dict) -> bytes:
+    flat = []
+    for k, v in credits.items():
+        flat.append(int(k))
+        flat.append(int(v))
+    return struct.pack("<" + CREDIT.format[1:] * len(credits), *flat)
+
+def _unpack_credits(buf, off: int, n: int):
+    end = off + CREDIT.size * n
+    return {pid: c for pid, c in CREDIT.iter_unpack(buf[off:end])}, end
+
+# --- encoders ---
+
+def _enc_snapshot(msg: dict) -> bytes:
+    ents = msg["entities"]
+    credits = msg.get("credits", {})
+    unit = _pos_unit(ents)
+    return b"".join((
+        SNAPSHOT_HEAD.pack(msg["tick"], unit, len(credits), len(ents)),
+        _pack_credits(credits),
+        _pack_entities(ents, 1.0 / unit),
+    ))
+
+def _enc_snapshot_delta(msg: dict) -> bytes:
+    created = msg.get("created", [])
+    changed = msg.get("changed", [])
+    removed = msg.get("removed", [])
+    credits = msg.get("credits", {})
+    unit = _pos_unit(created + changed)
+    inv = 1.0 / unit
+
+    flat = []
+    for ch in changed:
+        mask = 0
+        for bit, name in enumerate(ENTITY_FIELDS):
+            if name in ch:
+                mask |= 1 << bit
+        if not ENTITY_KEYS.issuperset(ch):
+            raise _Unencodable("unknown entity field")
+        flat.append(mask)
+        flat.extend(_entity_values(ch, inv))
+
+    return b"".join((
+        DELTA_HEAD.pack(msg["tick"], msg["base"], unit, len(credits), len(created), len(changed), len(removed)),
+        _pack_credits(credits),
+        _pack_entities(created, inv),
+        struct.pack("<" + CHANGED.format[1:] * len(changed), *flat),
+        struct.pack(f"<{len(removed)}I", *removed),
+    ))
+
+def _pack_asteroids(asts: List[dict]) -> bytes:
+    flat = []
+    for a in asts:
+        flat.extend((a["id"], a["x"], a["y"], a["r"]))
+    return struct.pack("<" + ASTEROID.format[1:] * len(asts), *flat)
+
+def _enc_map_init(msg: dict) -> bytes:
+    asts = msg["asteroids"]
+    map_hash = bytes.fromhex(msg["map_hash"])
+    if len(map_hash) != 8:
+        raise _Unencodable("map_hash is not 8 bytes")
+    match = msg.get("match", "").encode("utf-8")
+    return b"".join((
+        MAP_INIT_HEAD.pack(msg["player_id"], msg["map_w"], msg["map_h"], msg["map_seed"],
+                           CODEC_CODES[msg.get("codec", P.CODEC_JSON)], map_hash,
+                           bool(msg.get("cached")), msg.get("chunks", 0), len(asts), len(match)),
+        match,
+        _pack_asteroids(asts),
+    ))
+
+def _enc_map_chunk(msg: dict) -> bytes:
+    asts = msg["asteroids"]
+    return MAP_CHUNK_HEAD.pack(msg["index"], len(asts)) + _pack_asteroids(asts)
+
+def _enc_cmd_move(msg: dict) -> bytes:
+    ids = [int(u) for u in msg.get("unit_ids", [])]
+    return CMD_MOVE_HEAD.pack(msg.get("x", 0.0), msg.get("y", 0.0), len(ids)) + struct.pack(f"<{len(ids)}I", *ids)
+
+def _enc_cmd_mine(msg: dict) -> bytes:
+    ids = [int(u) for u in msg.get("unit_ids", [])]
+    return CMD_MINE_HEAD.pack(msg.get("asteroid_id", -1), len(ids)) + struct.pack(f"<{len(ids)}I", *ids)
+
+def _enc_cmd_buy_miner(msg: dict) -> bytes:
+    return CMD_BUY_MINER_BODY.pack(msg.get("station_id", -1))
+
+def _enc_ack(msg: dict) -> bytes:
+    return ACK_BODY.pack(msg.get("tick", -1))
+
+def _enc_viewport(msg: dict) -> bytes:
+    return VIEWPORT_BODY.pack(msg["x"], msg["y"], msg["w"], msg["h"])
+
+def _enc_snapshot_summary(msg: dict) -> bytes:
+    rows = msg["entities"]
+    hi = 0.0
+    for _, _, x, y in rows:
+        if x < 0 or y < 0:
+            raise _Unencodable("negative position")
+        hi = max(hi, x, y)
+    unit = _pos_unit([{"x": hi}])
+    inv = 1.0 / unit
+    flat = []
+    for eid, owner, x, y in rows:
+        flat.extend((eid, owner, int(x * inv + 0.5), int(y * inv + 0.5)))
+    return SUMMARY_HEAD.pack(msg["tick"], unit, len(rows)) + struct.pack("<" + SUMMARY.format[1:] * len(rows), *flat)
+
+# message type -> (encoder, top-level keys it carries)
+_ENCODERS = {
+    P.SNAPSHOT: (_enc_snapshot, {"type", "tick", "entities", "credits"}),
+    P.SNAPSHOT_DELTA: (_enc_snapshot_delta, {"type", "tick", "base", "created", "changed", "removed", "credits"}),
+    P.MAP_INIT: (_enc_map_init, {"type", "player_id", "map_w", "map_h", "map_seed", "codec", "map_hash",
+                                 "cached", "chunks", "asteroids", "match"}),
+    P.MAP_CHUNK: (_enc_map_chunk, {"type", "index", "asteroids"}),
+    P.CMD_MOVE: (_enc_cmd_move, {"type", "unit_ids", "x", "y"}),
+    P.CMD_MINE: (_enc_cmd_mine, {"type", "unit_ids", "asteroid_id"}),
+    P.CMD_BUY_MINER: (_enc_cmd_buy_miner, {"type", "station_id"}),
+    P.ACK: (_enc_ack, {"type", "tick"}),
+    P.VIEWPORT: (_enc_viewport, {"type", "x", "y", "w", "h"}),
+    P.SNAPSHOT_SUMMARY: (_enc_snapshot_summary, {"type", "tick", "entities"}),
+}
+
+def encode(msg: dict) -> Optional[bytes]:
+    """Binary payload for msg, or None if it has to go as JSON."""
+    t = msg.get("type")
+    entry = _ENCODERS.get(t)
+    if entry is None:
+        return None
+    enc, keys = entry
+    if not keys.issuperset(msg):
+        return None
+    try:
+        return HEAD.pack(MAGIC, MSG_CODES[t]) + enc(msg)
+    except (_Unencodable, KeyError, TypeError, ValueError, struct.error, OverflowError):
+        return None
+
+# --- decoders ---
+
+def _dec_snapshot(buf) -> dict:
+    tick, unit, n_cred, n_ent = SNAPSHOT_HEAD.unpack_from(buf, 0)
+    credits, off = _unpack_credits(buf, SNAPSHOT_HEAD.size, n_cred)
+    end = off + ENTITY.size * n_ent
+    ents = [_entity_dict(t, unit) for t in ENTITY.iter_unpack(buf[off:end])]
+    return {"type": P.SNAPSHOT, "tick": tick, "entities": ents, "credits": credits}
+
+def _dec_snapshot_delta(buf) -> dict:
+    tick, base, unit, n_cred, n_new, n_ch, n_rm = DELTA_HEAD.unpack_from(buf, 0)
+    credits, off = _unpack_credits(buf, DELTA_HEAD.size, n_cred)
+
+    end = off + ENTITY.size * n_new
+    created = [_entity_dict(t, unit) for t in ENTITY.iter_unpack(buf[off:end])]
+    off = end
+
+    end = off + CHANGED.size * n_ch
+    changed = []
+    for t in CHANGED.iter_unpack(buf[off:end]):
+        mask = t[0]
+        full = _entity_dict(t[1:], unit)
+        changed.append({k: full[k] for bit, k in enumerate(ENTITY_FIELDS) if mask & (1 << bit)})
+    off = end
+
+    removed = list(struct.unpack_from(f"<{n_rm}I", buf, off))
+    return {"type": P.SNAPSHOT_DELTA, "tick": tick, "base": base, "created": created,
+            "changed": changed, "removed": removed, "credits": credits}
+
+def _unpack_asteroids(buf, off: int, n: int) -> List[dict]:
+    return [{"id": i, "x": x, "y": y, "r": r}
+            for i, x, y, r in ASTEROID.iter_unpack(buf[off:off + ASTEROID.size * n])]
+
+def _dec_map_init(buf) -> dict:
+    pid, map_w, map_h, seed, codec, map_hash, cached, chunks, n, n_match = MAP_INIT_HEAD.unpack_from(buf, 0)
+    off = MAP_INIT_HEAD.size + n_match
+    msg = {"type": P.MAP_INIT, "player_id": pid, "map_w": map_w, "map_h": map_h, "map_seed": seed,
+           "codec": CODEC_NAMES[codec], "map_hash": map_hash.hex(),
+           "asteroids": _unpack_asteroids(buf, off, n)}
+    if n_match:
+        msg["match"] = str(buf[MAP_INIT_HEAD.size:off], "utf-8")
+    if cached:
+        msg["cached"] = True
+    if chunks:
+        msg["chunks"] = chunks
+    return msg
+
+def _dec_map_chunk(buf) -> dict:
+    index, n = MAP_CHUNK_HEAD.unpack_from(buf, 0)
+    return {"type": P.MAP_CHUNK, "index": index, "asteroids": _unpack_asteroids(buf, MAP_CHUNK_HEAD.size, n)}
+
+def _dec_cmd_move(buf) -> dict:
+    x, y, n = CMD_MOVE_HEAD.unpack_from(buf, 0)
+    ids = list(struct.unpack_from(f"<{n}I", buf, CMD_MOVE_HEAD.size))
+    return {"type": P.CMD_MOVE, "unit_ids": ids, "x": x, "y": y}
+
+def _dec_cmd_mine(buf) -> dict:
+    aid, n = CMD_MINE_HEAD.unpack_from(buf, 0)
+    ids = list(struct.unpack_from(f"<{n}I", buf, CMD_MINE_HEAD.size))
+    return {"type": P.CMD_MINE, "unit_ids": ids, "asteroid_id": aid}
+
+def _dec_cmd_buy_miner(buf) -> dict:
+    (sid,) = CMD_BUY_MINER_BODY.unpack_from(buf, 0)
+    return {"type": P.CMD_BUY_MINER, "station_id": sid}
+
+def _dec_ack(buf) -> dict:
+    (tick,) = ACK_BODY.unpack_from(buf, 0)
+    return {"type": P.ACK, "tick": tick}
+
+def _dec_viewport(buf) -> dict:
+    x, y, w, h = VIEWPORT_BODY.unpack_from(buf, 0)
+    return {"type": P.VIEWPORT, "x": x, "y": y, "w": w, "h": h}
+
+def _dec_snapshot_summary(buf) -> dict:
+    tick, unit, n = SUMMARY_HEAD.unpack_from(buf, 0)
+    off = SUMMARY_HEAD.size
+    rows = [[eid, owner, x * unit, y * unit]
+            for eid, owner, x, y in SUMMARY.iter_unpack(buf[off:off + SUMMARY.size * n])]
+    return {"type": P.SNAPSHOT_SUMMARY, "tick": tick, "entities": rows}
+
+_DECODERS = {
+    MSG_CODES[P.SNAPSHOT]: _dec_snapshot,
+    MSG_CODES[P.SNAPSHOT_DELTA]: _dec_snapshot_delta,
+    MSG_CODES[P.MAP_INIT]: _dec_map_init,
+    MSG_CODES[P.CMD_MOVE]: _dec_cmd_move,
+    MSG_CODES[P.CMD_MINE]: _dec_cmd_mine,
+    MSG_CODES[P.CMD_BUY_MINER]: _dec_cmd_buy_miner,
+    MSG_CODES[P.ACK]: _dec_ack,
+    MSG_CODES[P.VIEWPORT]: _dec_viewport,
+    MSG_CODES[P.SNAPSHOT_SUMMARY]: _dec_snapshot_summary,
+    MSG_CODES[P.MAP_CHUNK]: _dec_map_chunk,
+}
+
+def decode(payload) -> dict:
+    buf = memoryview(payload)
+    if len(buf) < HEAD.size:
+        raise ValueError("short binary message")
+    magic, code = HEAD.unpack_from(buf, 0)
+    dec = _DECODERS.get(code)
+    if magic != MAGIC or dec is None:
+        raise ValueError(f"unknown binary message code: {code}")
+    return dec(buf[HEAD.size:])
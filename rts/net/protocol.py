@@ -1,10 +1,36 @@
 # Message types
 HELLO = "hello"
 MAP_INIT = "map_init"
+MAP_CHUNK = "map_chunk"             # more of map_init's asteroids, when it was split
 SNAPSHOT = "snapshot"
+SNAPSHOT_DELTA = "snapshot_delta"   # changes relative to an acked snapshot ("base" tick)
+ACK = "ack"                         # client -> server: last snapshot tick received
+VIEWPORT = "viewport"               # client -> server: visible world rect (x, y, w, h)
+SNAPSHOT_SUMMARY = "snapshot_summary"  # low-rate [id, owner, x, y] of the entities outside the client's view, for the minimap
+ERROR = "error"                     # server -> client before closing, e.g. {"reason": "match full"}
+
+# A mining miner turns at MINER_SPIN rad/s. It sleeps while it mines, so the
+# server adds the whole turn when it wakes; clients animate it in between.
+MINER_SPIN = 0.6
+
+# Lobby: with the server in match mode, HELLO "match" names the match to join (or
+# create); without it the server picks any match with room. MAP_INIT "match" says
+# which one it was.
+
+# Map cache: MAP_INIT "map_hash" identifies the map (seed, worldgen config,
+# asteroids). HELLO "map_hashes" lists maps the client has cached; if the server's
+# is among them, MAP_INIT has "cached": true and no asteroids. Otherwise a big map
+# is split: MAP_INIT "chunks" = how many MAP_CHUNK messages follow, each with
+# "index" (1..chunks) and more "asteroids".
 
 CMD_MOVE = "cmd_move"
 CMD_BUY_MINER = "cmd_buy_miner"
 CMD_MINE = "cmd_mine"
 
 SERVER_CMDS = {CMD_MOVE, CMD_BUY_MINER, CMD_MINE}
+
+# Wire codecs. Client lists what it accepts in HELLO "codecs"; server answers with
+# MAP_INIT "codec". HELLO itself is always JSON. See rts/net/codec.py.
+CODEC_JSON = "json"
+CODEC_BIN = "bin"
+
@@ -1,27 +1,182 @@
 import json
 import socket
 import struct
+import threading
+
+from . import codec
 
 MAX_MSG_BYTES = 2_000_000  # sanity cap
 
-def send_msg(sock: socket.socket, obj: dict) -> None:
-    payload = json.dumps(obj, separators=(",", ":")).encode("utf-8")
-    header = struct.pack("!I", len(payload))
-    sock.sendall(header + payload)
+HEADER = struct.Struct("!I")   # payload length
+READ_BUF_BYTES = 64 * 1024     # FrameReader's starting (and resting) buffer size
+MAX_PARTS = 64                 # buffers per sendmsg call, well under IOV_MAX
+JOIN_MAX_BYTES = 16 * 1024     # send_parts joins writes up to this size: the copy is cheaper than the iovec
+                               # (1.8x the frames/s up to 8 KB, even at 16 KB; bench.framing --join-max)
+_HAS_SENDMSG = hasattr(socket.socket, "sendmsg")   # not on Windows
+
+def encode_payload(obj: dict, binary: bool = False) -> bytes:
+    """Binary payload when asked for and the codec can carry obj, JSON otherwise."""
+    if binary:
+        payload = codec.encode(obj)
+        if payload is not None:
+            return payload
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+def decode_payload(payload) -> dict:
+    """payload: bytes, bytearray or a memoryview (as FrameReader hands out)."""
+    if codec.is_binary(payload):
+        return codec.decode(payload)
+    return json.loads(str(payload, "utf-8"))
+
+def encode_frame(obj: dict, binary: bool = False) -> bytes:
+    """Complete wire frame (length header + payload) for obj."""
+    payload = encode_payload(obj, binary)
+    return HEADER.pack(len(payload)) + payload
+
+def send_frame(sock: socket.socket, frame: bytes) -> None:
+    sock.sendall(memoryview(frame))
+
+def send_parts(sock: socket.socket, parts: list) -> int:
+    """
+    Write the buffers in parts back to back: joined into one sendall up to
+    JOIN_MAX_BYTES, past that with sendmsg (scatter/gather) and no copy, picking up
+    after partial writes. Returns the bytes written.
+    """
+    total = sum(map(len, parts))
+    if total <= JOIN_MAX_BYTES or not _HAS_SENDMSG:
+        sock.sendall(b"".join(parts))
+        return total
+    views = [memoryview(p) for p in parts]
+    i = 0
+    while i < len(views):
+        sent = sock.sendmsg(views[i:i + MAX_PARTS])
+        while i < len(views) and sent >= len(views[i]):
+            sent -= len(views[i])
+            i += 1
+        if sent:
+            views[i] = views[i][sent:]
+    return total
+
+def send_msg(sock: socket.socket, obj: dict, binary: bool = False) -> None:
+    payload = encode_payload(obj, binary)
+    send_parts(sock, [HEADER.pack(len(payload)), payload])
+
+class SharedMsg:
+    """
+    A message going to many peers. It is encoded and framed at most once per codec,
+    on first use, and the same immutable frame is then written to every socket.
+    """
+    __slots__ = ("msg", "_frames", "_lock")
+
+    def __init__(self, msg: dict):
+        self.msg = msg
+        self._frames = [None, None]  # [json, binary]
+        self._lock = threading.Lock()
+
+    def frame(self, binary: bool = False) -> bytes:
+        i = 1 if binary else 0
+        f = self._frames[i]
+        if f is None:
+            with self._lock:
+                f = self._frames[i]
+                if f is None:
+                    f = encode_frame(self.msg, binary)
+                    self._frames[i] = f
+        return f
 
-def recv_exact(sock: socket.socket, n: int) -> bytes:
-    data = b""
-    while len(data) < n:
-        chunk = sock.recv(n - len(data))
-        if not chunk:
+def recv_exact(sock: socket.socket, n: int):
+    """n bytes: one recv when small enough to arrive whole, else recv_into one bytearray."""
+    if n <= READ_BUF_BYTES:
+        data = sock.recv(n)
+        if len(data) == n:
+            return data
+        if not data:
             raise ConnectionError("socket closed")
-        data += chunk
+        got = len(data)
+        data = bytearray(data) + bytearray(n - got)
+    else:
+        got = 0
+        data = bytearray(n)
+    view = memoryview(data)
+    while got < n:
+        k = sock.recv_into(view[got:])
+        if not k:
+            raise ConnectionError("socket closed")
+        got += k
     return data
 
-def recv_msg(sock: socket.socket) -> dict:
+def recv_payload(sock: socket.socket):
+    """One frame's payload, undecoded. Reads exactly one frame; see FrameReader for a stream."""
     header = recv_exact(sock, 4)
-    (length,) = struct.unpack("!I", header)
+    (length,) = HEADER.unpack(header)
     if length < 0 or length > MAX_MSG_BYTES:
         raise ValueError(f"bad message length: {length}")
-    payload = recv_exact(sock, length)
-    return json.loads(payload.decode("utf-8"))
+    return recv_exact(sock, length)
+
+def recv_msg(sock: socket.socket) -> dict:
+    return decode_payload(recv_payload(sock))
+
+class FrameReader:
+    """
+    Buffered frame reader for one socket, for a connection's receive loop.
+
+    Each recv_into fills a reusable bytearray with as much as the socket has, and
+    read() then hands out the complete frames in it one by one without another
+    syscall. Payloads are memoryview slices of the buffer: decode (or copy) one
+    before the next read(), which may overwrite it. Don't mix with recv_msg on
+    the same socket, since the buffer may already hold the next frames.
+    """
+    def __init__(self, sock: socket.socket, size: int = READ_BUF_BYTES):
+        self.sock = sock
+        self.size = size
+        self.buf = bytearray(size)
+        self.start = 0      # first byte not handed out yet
+        self.end = 0        # end of the bytes received
+        self.recvs = 0      # recv_into calls
+        self.frames = 0
+
+    def read(self) -> memoryview:
+        """Next frame's payload (header stripped), reading from the socket only when needed."""
+        while True:
+            avail = self.end - self.start
+            need = 4
+            if avail >= 4:
+                (length,) = HEADER.unpack_from(self.buf, self.start)
+                if length > MAX_MSG_BYTES:
+                    raise ValueError(f"bad message length: {length}")
+                need = 4 + length
+                if avail >= need:
+                    s = self.start + 4
+                    self.start = s + length
+                    self.frames += 1
+                    return memoryview(self.buf)[s:s + length]
+            self._fill(need)
+
+    def read_msg(self) -> dict:
+        return decode_payload(self.read())
+
+    def _fill(self, need: int):
+        """recv until the buffer holds `need` bytes from start."""
+        avail = self.end - self.start
+        if avail == 0:
+            self.start = self.end = 0
+            if len(self.buf) > self.size:
+                self.buf = bytearray(self.size)   # done with a big frame: back to the resting size
+        if self.start + need > len(self.buf):
+            if need <= len(self.buf):
+                # move the partial frame to the front (same-size slice assignment, so
+                # views handed out earlier stay valid buffers)
+                self.buf[:avail] = self.buf[self.start:self.end]
+            else:
+                # a new buffer rather than a resize: a caller may still hold a view of the old one
+                grown = bytearray(max(need, 2 * len(self.buf)))
+                grown[:avail] = self.buf[self.start:self.end]
+                self.buf = grown
+            self.start, self.end = 0, avail
+        view = memoryview(self.buf)
+        while self.end - self.start < need:
+            k = self.sock.recv_into(view[self.end:])
+            if not k:
+                raise ConnectionError("socket closed")
+            self.recvs += 1
+            self.end += k
@@ -0,0 +1,181 @@
+"""
+Sleeping units (state.activity): only awake units go through the tick.
+
+A unit falls asleep at the end of a tick in which it has no target: idle
+fighters, parked stations, idle miners and miners working an asteroid. Mining
+is not counted down every tick: a miner that lands is put on a timer wheel at
+the tick its MINING_TIME runs out (rounded up to whole ticks), and the wheel
+wakes it then with its timer at 0 so the tick finishes the job. mine_timer is
+the time left when the miner went to sleep; its spin (MINER_SPIN) is added on
+waking, and clients animate it meanwhile (ClientModel.mining_since).
+
+Wakes: a command giving the unit a target (wake()), a new entity (ids at or
+above the last tick's next_entity_id), a separation push, the wheel. On the
+first tick everything is awake, which after a checkpoint restore puts the
+miners found mining back on the wheel. ENTITY_SLEEP = False wakes everything
+every tick (mining still runs on the wheel).
+
+Dict store: the awake ids are a set, ticked in id order, and sleeping units
+sit in a RestingGrid that separation checks awake units against. numpy store:
+the "awake" column, settled by soa.settle_rows.
+"""
+import math
+from typing import Dict, List, Optional, Set, Tuple
+
+from rts.net import protocol as P
+from . import config as cfg
+
+# (x, y, personal radius, give, id), as in separation
+_Item = Tuple[float, float, float, float, int]
+
+class RestingGrid:
+    """
+    Sleeping dict-store units by separation cell. They do not move until woken,
+    so the grid is kept across ticks instead of rebuilt; cell 0 = not built yet.
+    """
+    def __init__(self):
+        self.cell = 0.0
+        self.cells: Dict[Tuple[int, int], Dict[int, _Item]] = {}
+        self.wide: Dict[int, _Item] = {}        # personal diameter wider than a cell
+        self.where: Dict[int, Optional[Tuple[int, int]]] = {}  # id -> cell, None for wide
+
+    def add(self, e):
+        if self.cell <= 0 or e.hp <= 0 or e.type not in cfg.SEPARATION:
+            return
+        r, give = cfg.SEPARATION[e.type]
+        item = (e.x, e.y, r, give, e.id)
+        if 2 * r <= self.cell:
+            key = (int(e.x // self.cell), int(e.y // self.cell))
+            self.cells.setdefault(key, {})[e.id] = item
+        else:
+            key = None
+            self.wide[e.id] = item
+        self.where[e.id] = key
+
+    def discard(self, eid: int):
+        if eid not in self.where:
+            return
+        key = self.where.pop(eid)
+        if key is None:
+            del self.wide[eid]
+            return
+        members = self.cells[key]
+        del members[eid]
+        if not members:
+            del self.cells[key]
+
+    def rebuild(self, entities: dict, awake: Set[int], cell: float):
+        self.cell = cell
+        self.cells, self.wide, self.where = {}, {}, {}
+        for eid, e in entities.items():
+            if eid not in awake:
+                self.add(e)
+
+class Activity:
+    """Written by the ticking thread and by command handlers, both under world_lock."""
+    def __init__(self):
+        self.primed = False
+        self.tick = 0                           # ticks run; the wheel's clock
+        self.seen_id = 0                        # next_entity_id when the last tick started
+        self.awake: Set[int] = set()            # dict store
+        self.resting = RestingGrid()            # dict store
+        self.wheel: Dict[int, List[int]] = {}   # due tick -> miner ids
+        self.due: Dict[int, int] = {}           # miner id -> its due tick; wheel entries not matching are stale
+        self.fired = 0
+
+    def _mark(self, state, eid: int):
+        ents = state.entities
+        if isinstance(ents, dict):
+            if eid not in self.awake:
+                self.awake.add(eid)
+                self.resting.discard(eid)
+        else:
+            row = ents.rows.get(eid)
+            if row is not None:
+                ents.cols["awake"][row] = True
+
+    def wake(self, state, eid: int):
+        """eid got a new order: tick it from the next tick, dropping any mining wake-up."""
+        self.due.pop(eid, None)
+        self._mark(state, eid)
+
+    def nudge(self, state, eid: int):
+        """eid was pushed: tick it next tick (its wheel entry stands)."""
+        self._mark(state, eid)
+
+    def forget(self, eid: int):
+        """eid was removed from the world."""
+        self.awake.discard(eid)
+        self.resting.discard(eid)
+        self.due.pop(eid, None)
+
+    def schedule(self, eid: int, timer: float):
+        """A miner went to sleep with `timer` seconds of mining left."""
+        due = self.tick + max(1, math.ceil(timer / cfg.DT - 1e-6))
+        self.due[eid] = due
+        self.wheel.setdefault(due, []).append(eid)
+
+    def begin_tick(self, state):
+        """Wake new entities and the miners due this tick; call under world_lock before ticking."""
+        self.tick += 1
+        ents = state.entities
+        if not self.primed or not cfg.ENTITY_SLEEP:
+            self.primed = True
+            if isinstance(ents, dict):
+                self.awake = set(ents)
+                self.resting = RestingGrid()
+            else:
+                ents.cols["awake"][:ents.n] = True
+        else:
+            for eid in range(self.seen_id, state.next_entity_id):
+                self._mark(state, eid)
+        self.seen_id = state.next_entity_id
+
+        for eid in self.wheel.pop(self.tick, ()):
+            if self.due.get(eid) != self.tick:
+                continue
+            del self.due[eid]
+            e = ents.get(eid)
+            if e is None or e.miner_state != "mining":
+                continue
+            e.angle += P.MINER_SPIN * e.mine_timer
+            e.mine_timer = 0.0
+            self._mark(state, eid)
+            self.fired += 1
+
+    def settle(self, state):
+        """Dict store, after the tick's movement: put units without a target to sleep."""
+        ents = state.entities
+        still = set()
+        for eid in self.awake:
+            e = ents.get(eid)
+            if e is None:
+                continue
+            if e.hp > 0 and e.miner_state == "mining":
+                if e.mine_timer <= 0:
+                    still.add(eid)
+                    continue
+                if eid not in self.due:
+                    self.schedule(eid, e.mine_timer)
+            if e.hp > 0 and e.tx is not None:
+                still.add(eid)
+            else:
+                self.resting.add(e)
+        self.awake = still
+
+    def timers_left(self) -> Dict[int, float]:
+        """mine_timer of every sleeping miner as if it had been counted down (checkpoints)."""
+        return {eid: max(0, due - self.tick - 1) * cfg.DT for eid, due in self.due.items()}
+
+    def awake_count(self, state) -> int:
+        ents = state.entities
+        if isinstance(ents, dict):
+            return len(self.awake)
+        return int(ents.cols["awake"][:ents.n].sum())
+
+    def stats(self, state) -> dict:
+        return {
+            "awake": self.awake_count(state),
+            "mining_timers": len(self.due),
+            "woken_by_timer": self.fired,
+        }
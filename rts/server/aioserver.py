@@ -0,0 +1,117 @@
+"""
+asyncio networking mode (NET_MODE = "asyncio"): one event loop holds every
+connection instead of a thread per client. Framing is the same 4-byte length
+prefix as rts.net.transport, so clients don't know the difference.
+
+The sim loop keeps its own thread and timing. Its broadcasts only fill each
+client's Outbox; write_loop tasks on the event loop drain them.
+"""
+import asyncio
+import socket
+import struct
+
+from typing import Optional
+
+from rts.net.transport import MAX_MSG_BYTES, decode_payload, encode_frame
+from rts.net import protocol as P
+from .state import ServerState, ClientInfo
+from .netserver import join_player, client_map_init, handle_client_msg, add_client, remove_client, frame_for
+from .matches import MatchManager, MatchFull
+
+class AsyncConn:
+    """Stands in for a socket in state.clients; close() may be called from any thread."""
+    def __init__(self, loop: asyncio.AbstractEventLoop, writer: asyncio.StreamWriter):
+        self.loop = loop
+        self.writer = writer
+        self.closed = False
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.loop.call_soon_threadsafe(self.writer.close)
+
+async def read_msg(reader: asyncio.StreamReader) -> dict:
+    header = await reader.readexactly(4)
+    (length,) = struct.unpack("!I", header)
+    if length > MAX_MSG_BYTES:
+        raise ValueError(f"bad message length: {length}")
+    return decode_payload(await reader.readexactly(length))
+
+async def write_loop(state: ServerState, conn: AsyncConn, info: ClientInfo):
+    """Drain info.outbox onto the stream; the sim thread wakes us via outbox.notify."""
+    loop = asyncio.get_running_loop()
+    wake = asyncio.Event()
+    info.outbox.notify = lambda: loop.call_soon_threadsafe(wake.set)
+    try:
+        while not info.outbox.closed:
+            wake.clear()
+            while True:
+                item = info.outbox.pop()
+                if item is None:
+                    break
+                frame = frame_for(item, info.binary)
+                conn.writer.write(frame)
+                info.outbox.bytes_sent += len(frame)
+                await conn.writer.drain()
+            await wake.wait()
+    except Exception:
+        pass
+    finally:
+        remove_client(state, conn)
+
+async def handle_client(state: ServerState, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                        matches: Optional[MatchManager] = None):
+    loop = asyncio.get_running_loop()
+    addr = writer.get_extra_info("peername")
+    conn = AsyncConn(loop, writer)
+    writer_task = None
+    match = None
+    try:
+        hello = await read_msg(reader)
+        if matches is not None:
+            match = matches.join(hello)
+            state = match.state
+        info = join_player(state, hello)
+        print(f"[+] {addr} => player_id={info.player_id}" + (f" match={match.name!r}" if match else ""))
+
+        init = client_map_init(state, info, hello)
+        if match is not None:
+            init[0]["match"] = match.name
+        for msg in init:
+            writer.write(encode_frame(msg, info.binary))
+        await writer.drain()
+        add_client(state, conn, info)
+        writer_task = loop.create_task(write_loop(state, conn, info))
+
+        while state.running:
+            handle_client_msg(state, info, await read_msg(reader))
+
+    except MatchFull as e:
+        print(f"[-] client {addr} refused: {e}")
+        writer.write(encode_frame({"type": P.ERROR, "reason": str(e)}))
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+    except (asyncio.IncompleteReadError, ConnectionError) as e:
+        print(f"[-] client {addr} disconnected: {e or 'socket closed'}")
+    except Exception as e:
+        print(f"[-] client {addr} disconnected: {e}")
+    finally:
+        remove_client(state, conn)
+        if writer_task is not None:
+            writer_task.cancel()
+        if match is not None:
+            matches.leave(match)
+
+async def serve(state: ServerState, host: str, port: int, matches: Optional[MatchManager] = None):
+    async def on_connect(reader, writer):
+        sock = writer.get_extra_info("socket")
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        await handle_client(state, reader, writer, matches)
+
+    server = await asyncio.start_server(on_connect, host, port, reuse_address=True)
+    async with server:
+        await server.serve_forever()
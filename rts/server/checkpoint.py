@@ -0,0 +1,280 @@
+"""
+World checkpoints (CHECKPOINT_FILE): periodic binary copies of the world that
+the server restores on startup instead of generating a new map.
+
+Every CHECKPOINT_EVERY_S the sim thread copies the world under world_lock
+(capture: a memcpy per column on the numpy store, one attrgetter tuple per
+entity on the dict store) between ticks, and hands the copy to the checkpoint
+thread, which encodes it and replaces the file atomically. If the previous
+checkpoint is still being written, that round is skipped.
+
+File (little-endian; sections are 8-byte aligned):
+  HEADER         magic, version, tick, counts, id counters, MAP_SEED
+  asteroids      ids (int64), then x, y, r (float64), one array each
+  credits        (player id, credits) int64 pairs
+  entity columns COLUMNS in order, float64 / int64 / int8 (padded), as in
+                 soa.EntityStore (NaN for no target, NO_ID for no id)
+mine_timer of a sleeping miner is saved as the time left on the timer wheel
+(activity.py); the first tick after a restore puts it back on the wheel.
+Restore memory-maps the file and bulk-loads the columns into either store.
+Any change to the column set or layout must bump VERSION.
+"""
+import math
+import mmap
+import operator
+import os
+import struct
+import sys
+import threading
+import time
+from array import array
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from .state import ServerState, Entity, Asteroid
+from . import config as cfg
+from .worldgen import build_asteroid_grid
+from .soa import (EntityStore, np, NO_ID, TYPE_CODES, TYPE_NAMES, MINER_STATE_CODES, MINER_STATE_NAMES,
+                  _FLOAT_COLS, _INT_COLS, _CODE_COLS)
+
+MAGIC = b"RTSCKPT\0"
+VERSION = 1
+
+# magic, version, tick, entities, asteroids, credits, next player/entity/asteroid id, map seed
+HEADER = struct.Struct("<8sIIIIIqqqq4x")
+COLUMNS = _FLOAT_COLS + _INT_COLS + _CODE_COLS
+_TYPECODES = {**{c: "d" for c in _FLOAT_COLS}, **{c: "q" for c in _INT_COLS}, **{c: "b" for c in _CODE_COLS}}
+_DTYPES = {"d": "<f8", "q": "<i8", "b": "i1"}
+_OPT_FLOATS = ("tx", "ty")
+_OPT_INTS = ("mine_asteroid_id", "home_station_id", "nav_goal")
+_entity_row = operator.attrgetter(*COLUMNS)
+_ID, _TIMER = COLUMNS.index("id"), COLUMNS.index("mine_timer")
+
+@dataclass
+class WorldCopy:
+    """What capture() takes under world_lock; encoded later without it."""
+    tick: int
+    n: int
+    cols: Optional[Dict[str, "np.ndarray"]]     # numpy store
+    rows: Optional[List[tuple]]                 # dict store, one _entity_row per entity
+    asteroids: Dict[int, Asteroid]              # replaced wholesale, never mutated
+    credits: List[Tuple[int, int]]
+    counters: Tuple[int, int, int]
+
+def capture(state: ServerState, tick: int) -> WorldCopy:
+    """Consistent copy of the world; call between ticks on the sim thread."""
+    with state.world_lock:
+        ents = state.entities
+        cols = rows = None
+        left = state.activity.timers_left()
+        if isinstance(ents, EntityStore):
+            cols = {name: ents.col(name).copy() for name in COLUMNS}
+            n = ents.n
+            for eid, t in left.items():
+                row = ents.rows.get(eid)
+                if row is not None:
+                    cols["mine_timer"][row] = t
+        else:
+            rows = list(map(_entity_row, ents.values()))
+            n = len(rows)
+            if left:
+                rows = [r if r[_ID] not in left else r[:_TIMER] + (left[r[_ID]],) + r[_TIMER + 1:] for r in rows]
+        copy = WorldCopy(tick, n, cols, rows, state.asteroids, sorted(state.credits.items()),
+                         (state.next_player_id, state.next_entity_id, state.next_asteroid_id))
+    return copy
+
+def _pad(buf: bytes) -> bytes:
+    return buf + b"\0" * (-len(buf) % 8)
+
+def _pack(code: str, values) -> bytes:
+    arr = array(code, values)
+    if sys.byteorder != "little":
+        arr.byteswap()
+    return _pad(arr.tobytes())
+
+def _dict_column(rows: List[tuple], i: int, name: str) -> list:
+    values = [r[i] for r in rows]
+    if name in _OPT_FLOATS:
+        return [math.nan if v is None else v for v in values]
+    if name in _OPT_INTS:
+        return [NO_ID if v is None else v for v in values]
+    if name == "type":
+        return [TYPE_CODES[v] for v in values]
+    if name == "miner_state":
+        return [MINER_STATE_CODES[v] for v in values]
+    return values
+
+def encode(copy: WorldCopy) -> List[bytes]:
+    """The file as a list of chunks."""
+    asts = list(copy.asteroids.values())
+    chunks = [HEADER.pack(MAGIC, VERSION, copy.tick, copy.n, len(asts), len(copy.credits), *copy.counters, cfg.MAP_SEED)]
+    chunks.append(_pack("q", [a.id for a in asts]))
+    for attr in ("x", "y", "r"):
+        chunks.append(_pack("d", [getattr(a, attr) for a in asts]))
+    chunks.append(_pack("q", [v for pair in copy.credits for v in pair]))
+    for i, name in enumerate(COLUMNS):
+        code = _TYPECODES[name]
+        if copy.cols is not None:
+            chunks.append(_pad(copy.cols[name].astype(_DTYPES[code], copy=False).tobytes()))
+        else:
+            chunks.append(_pack(code, _dict_column(copy.rows, i, name)))
+    return chunks
+
+def write_checkpoint(path: str, copy: WorldCopy) -> int:
+    """Encode and atomically replace the file; returns its size."""
+    chunks = encode(copy)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.writelines(chunks)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return sum(len(c) for c in chunks)
+
+def _read(mm, off: int, code: str, count: int) -> Tuple[array, int]:
+    arr = array(code)
+    size = arr.itemsize * count
+    arr.frombytes(mm[off:off + size])
+    if sys.byteorder != "little":
+        arr.byteswap()
+    return arr, off + size + (-size % 8)
+
+def restore_checkpoint(state: ServerState, path: str) -> int:
+    """Load a checkpoint into a fresh state (any store) and rebuild the entity index and the asteroid and nav grids; returns its tick."""
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        magic, version, tick, n, n_ast, n_credits, next_pid, next_eid, next_aid, seed = HEADER.unpack_from(mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path}: not a checkpoint")
+        if version != VERSION:
+            raise ValueError(f"{path}: checkpoint version {version}, this build reads {VERSION}")
+        if seed != cfg.MAP_SEED:
+            print(f"[checkpoint] {path} was taken with MAP_SEED={seed} (config has {cfg.MAP_SEED}); using its map")
+        off = HEADER.size
+        ids, off = _read(mm, off, "q", n_ast)
+        xs, off = _read(mm, off, "d", n_ast)
+        ys, off = _read(mm, off, "d", n_ast)
+        rs, off = _read(mm, off, "d", n_ast)
+        credits, off = _read(mm, off, "q", 2 * n_credits)
+
+        offsets = {}
+        for name in COLUMNS:
+            code = _TYPECODES[name]
+            offsets[name] = off
+            size = array(code).itemsize * n
+            off += size + (-size % 8)
+        if off > len(mm):
+            raise ValueError(f"{path}: truncated ({len(mm)} bytes, header says {off})")
+
+        with state.world_lock:
+            ents = state.entities
+            if isinstance(ents, EntityStore) and n:
+                cols = {name: np.frombuffer(mm, _DTYPES[_TYPECODES[name]], n, offsets[name]) for name in COLUMNS}
+                ents.load(cols, n)
+                del cols        # views into mm; it can't close while they exist
+            else:
+                cols = {name: _read(mm, offsets[name], _TYPECODES[name], n)[0] for name in COLUMNS}
+                for row in range(n):
+                    e = _entity(cols, row)
+                    ents[e.id] = e
+
+            state.index.rebuild(ents)
+            state.asteroids = {aid: Asteroid(aid, x, y, r) for aid, x, y, r in zip(ids, xs, ys, rs)}
+            build_asteroid_grid(state)
+            state.credits = {credits[i]: credits[i + 1] for i in range(0, len(credits), 2)}
+            state.next_entity_id = next_eid
+            state.next_asteroid_id = next_aid
+        with state.clients_lock:
+            state.next_player_id = next_pid
+    return tick
+
+def _entity(cols: Dict[str, array], row: int) -> Entity:
+    c = {name: cols[name][row] for name in COLUMNS}
+    for name in _OPT_FLOATS:
+        if math.isnan(c[name]):
+            c[name] = None
+    for name in _OPT_INTS:
+        if c[name] == NO_ID:
+            c[name] = None
+    c["type"] = TYPE_NAMES[c["type"]]
+    c["miner_state"] = MINER_STATE_NAMES[c["miner_state"]]
+    return Entity(**c)
+
+class Checkpointer:
+    """Captures on the sim thread every CHECKPOINT_EVERY_S; writes on its own thread."""
+    def __init__(self, path: str):
+        self.path = path
+        self.cond = threading.Condition()
+        self.pending: Optional[WorldCopy] = None
+        self.busy = False
+        self.last = time.monotonic()
+
+        self.written = 0
+        self.skipped = 0            # due while the previous one was still being written
+        self.bytes = 0
+        self.tick = -1              # of the last checkpoint written
+        self.capture_ms = 0.0
+        self.write_ms = 0.0
+        threading.Thread(target=self._run, name="checkpoint", daemon=True).start()
+
+    def maybe_capture(self, state: ServerState, tick: int):
+        now = time.monotonic()
+        if now - self.last < cfg.CHECKPOINT_EVERY_S:
+            return
+        self.last = now
+        with self.cond:
+            if self.busy or self.pending is not None:
+                self.skipped += 1
+                return
+        t0 = time.perf_counter()
+        copy = capture(state, tick)
+        self.capture_ms = (time.perf_counter() - t0) * 1000.0
+        with self.cond:
+            self.pending = copy
+            self.cond.notify()
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while self.pending is None:
+                    self.cond.wait()
+                copy, self.pending = self.pending, None
+                self.busy = True
+            try:
+                self._write(copy)
+            finally:
+                with self.cond:
+                    self.busy = False
+                    self.cond.notify_all()
+
+    def _write(self, copy: WorldCopy):
+        t0 = time.perf_counter()
+        try:
+            size = write_checkpoint(self.path, copy)
+        except OSError as e:
+            print(f"[checkpoint] writing {self.path} failed: {e}")
+            return
+        self.write_ms = (time.perf_counter() - t0) * 1000.0
+        if self.written == 0:
+            print(f"[checkpoint] writing {self.path} every {cfg.CHECKPOINT_EVERY_S:g}s "
+                  f"({size} bytes, capture {self.capture_ms:.1f} ms, write {self.write_ms:.1f} ms)")
+        self.written += 1
+        self.bytes = size
+        self.tick = copy.tick
+
+    def close(self, state: ServerState):
+        """Final checkpoint at shutdown, written here once the checkpoint thread is idle."""
+        with self.cond:
+            while self.busy or self.pending is not None:
+                self.cond.wait()
+        frame = state.frame
+        self._write(capture(state, frame.tick if frame is not None else 0))
+
+    def stats(self) -> dict:
+        return {
+            "written": self.written,
+            "skipped": self.skipped,
+            "tick": self.tick,
+            "bytes": self.bytes,
+            "capture_ms": round(self.capture_ms, 2),
+            "write_ms": round(self.write_ms, 2),
+        }
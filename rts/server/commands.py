@@ -1,10 +1,19 @@
 import math
 import random
-import queue
-from typing import List, Optional
+import time
+from typing import Dict, List, Optional, Tuple
 
-from .state import ServerState, Entity, alloc_entity_id
+from .state import ServerState, Entity, alloc_entity_id, add_entity
+from .inbox import CommandInbox
 from . import config as cfg
+from .pathing import nav_goal
+
+# Server-internal command (never on the wire): a player joined; spawn their base
+# on the sim thread so client threads never write the world.
+JOIN = "_join"
+
+# Orders a later order overrides anyway; the only commands load shedding may drop.
+UNIT_ORDERS = frozenset({"cmd_move", "cmd_mine"})
 
 def spawn_station_and_fighters(state: ServerState, player_id: int):
     if player_id == 1:
@@ -20,7 +29,7 @@ def spawn_station_and_fighters(state: ServerState, player_id: int):
     )
 
     with state.world_lock:
-        state.entities[station_id] = station
+        add_entity(state, station)
 
     ring_r = 240.0
     count = 14
@@ -36,15 +45,13 @@ def spawn_station_and_fighters(state: ServerState, player_id: int):
             hp_max=80, hp=80
         )
         with state.world_lock:
-            state.entities[eid] = fighter
+            add_entity(state, fighter)
 
 def spawn_miner(state: ServerState, player_id: int, station_id: int) -> Optional[int]:
     with state.world_lock:
-        if station_id not in state.entities:
+        if station_id not in state.index.owned(player_id, "station"):
             return None
         st = state.entities[station_id]
-        if st.owner != player_id or st.type != "station":
-            return None
 
         rng = random.Random(cfg.MAP_SEED + player_id * 9999 + state.next_entity_id)
         ang = rng.random() * 2 * math.pi
@@ -64,13 +71,13 @@ def spawn_miner(state: ServerState, player_id: int, station_id: int) -> Optional
         home_station_id=station_id,
     )
     with state.world_lock:
-        state.entities[eid] = miner
+        add_entity(state, miner)
     return eid
 
 def handle_cmd_move(state: ServerState, player_id: int, cmd: dict):
-    unit_ids = cmd.get("unit_ids", [])
-    tx = float(cmd.get("x", 0.0))
-    ty = float(cmd.get("y", 0.0))
+    unit_ids = cmd["unit_ids"]
+    tx = cmd["x"]
+    ty = cmd["y"]
 
     n = len(unit_ids)
     if n <= 0:
@@ -82,56 +89,51 @@ def handle_cmd_move(state: ServerState, player_id: int, cmd: dict):
     origin_y = ty - (side - 1) * gap / 2.0
 
     with state.world_lock:
-        owned: List[Entity] = []
-        for uid in unit_ids:
-            e = state.entities.get(int(uid))
-            if e and e.owner == player_id:
-                owned.append(e)
+        owned: List[Entity] = [state.entities[uid] for uid in state.index.filter_owned(player_id, unit_ids)]
 
+        goals: Dict[str, Optional[int]] = {}    # one field for the whole group, per unit type
         for i, e in enumerate(owned):
             ox = (i % side) * gap
             oy = (i // side) * gap
             e.tx = origin_x + ox
             e.ty = origin_y + oy
+            typ = e.type
+            if typ not in goals:
+                goals[typ] = nav_goal(state, typ, tx, ty)
+            e.nav_goal = goals[typ]
 
             if e.type == "miner":
                 e.miner_state = "idle"
                 e.mine_asteroid_id = None
                 e.mine_timer = 0.0
                 e.cargo = 0
+            state.activity.wake(state, e.id)
 
 def handle_cmd_buy_miner(state: ServerState, player_id: int, cmd: dict):
-    station_id = int(cmd.get("station_id", -1))
+    station_id = cmd["station_id"]
     with state.world_lock:
         credits = state.credits.get(player_id, 0)
         if credits < cfg.MINER_COST:
             return
-        st = state.entities.get(station_id)
-        if not st or st.type != "station" or st.owner != player_id:
+        if station_id not in state.index.owned(player_id, "station"):
             return
         state.credits[player_id] = credits - cfg.MINER_COST
 
     spawn_miner(state, player_id, station_id)
 
 def handle_cmd_mine(state: ServerState, player_id: int, cmd: dict):
-    unit_ids = cmd.get("unit_ids", [])
-    asteroid_id = int(cmd.get("asteroid_id", -1))
+    unit_ids = cmd["unit_ids"]
+    asteroid_id = cmd["asteroid_id"]
 
     with state.world_lock:
         if asteroid_id not in state.asteroids:
             return
 
         a = state.asteroids[asteroid_id]
+        goal = nav_goal(state, "miner", a.x, a.y)     # shared by every miner of this asteroid
 
-        for uid in unit_ids:
-            e = state.entities.get(int(uid))
-            if not e:
-                continue
-            if e.owner != player_id:
-                continue
-            if e.type != "miner":
-                continue
-
+        for uid in state.index.filter_owned(player_id, unit_ids, "miner"):
+            e = state.entities[uid]
             e.mine_asteroid_id = asteroid_id
             e.miner_state = "to_asteroid"
             e.mine_timer = 0.0
@@ -148,18 +150,144 @@ def handle_cmd_mine(state: ServerState, player_id: int, cmd: dict):
             land_y = a.y + ny * (a.r + 10.0)
             e.tx = land_x
             e.ty = land_y
+            e.nav_goal = goal
+            state.activity.wake(state, e.id)
 
-def apply_commands(state: ServerState):
-    while True:
-        try:
-            player_id, cmd = state.command_q.get_nowait()
-        except queue.Empty:
-            break
+def handle_join(state: ServerState, player_id: int):
+    with state.world_lock:
+        state.credits[player_id] = cfg.CREDITS_START
+    spawn_station_and_fighters(state, player_id)
 
-        t = cmd.get("type")
+def validate_cmd(msg: dict) -> Optional[dict]:
+    """
+    Parse a client command into the form the handlers expect (int ids without
+    duplicates, finite floats), or None if it is malformed or a no-op. Runs on the
+    connection thread so the sim thread only sees clean commands.
+    """
+    t = msg.get("type")
+    try:
         if t == "cmd_move":
-            handle_cmd_move(state, player_id, cmd)
-        elif t == "cmd_buy_miner":
-            handle_cmd_buy_miner(state, player_id, cmd)
-        elif t == "cmd_mine":
-            handle_cmd_mine(state, player_id, cmd)
+            x, y = float(msg.get("x", 0.0)), float(msg.get("y", 0.0))
+            if not (math.isfinite(x) and math.isfinite(y)):
+                return None
+            unit_ids = _unit_ids(msg)
+            return {"type": t, "unit_ids": unit_ids, "x": x, "y": y} if unit_ids else None
+        if t == "cmd_mine":
+            unit_ids = _unit_ids(msg)
+            return {"type": t, "unit_ids": unit_ids, "asteroid_id": int(msg.get("asteroid_id", -1))} if unit_ids else None
+        if t == "cmd_buy_miner":
+            return {"type": t, "station_id": int(msg.get("station_id", -1))}
+    except (TypeError, ValueError, OverflowError):
+        return None
+    return None
+
+def validate_viewport(msg: dict) -> Optional[Tuple[float, float, float, float]]:
+    """
+    (x, y, w, h) from a viewport message, clamped to the map, or None if any value
+    isn't finite or w/h is negative. Interest queries and half-rate views read it
+    on the sim thread, so it must never hold inf/nan.
+    """
+    try:
+        x, y, w, h = (float(msg[k]) for k in ("x", "y", "w", "h"))
+    except (KeyError, TypeError, ValueError):
+        return None
+    if not all(math.isfinite(v) for v in (x, y, w, h)) or w < 0 or h < 0:
+        return None
+    x = min(max(x, 0.0), float(cfg.MAP_W))
+    y = min(max(y, 0.0), float(cfg.MAP_H))
+    return x, y, min(w, float(cfg.MAP_W)), min(h, float(cfg.MAP_H))
+
+def _unit_ids(msg: dict) -> List[int]:
+    return list(dict.fromkeys(int(u) for u in msg.get("unit_ids") or ()))
+
+def coalesce_cmds(state: ServerState, inbox: CommandInbox):
+    """
+    Drop unit orders that a later order from the same player overrides anyway:
+    a move replaces earlier moves and mines for its units, a mine replaces earlier
+    mines (a mine leaves non-miners alone, so it can't cancel a move). A move is
+    dropped only when all its units are overridden: its formation slots depend on
+    the whole selection, so trimming it would move the rest elsewhere. Mines,
+    which treat each unit on its own, lose just the overridden units. Commands
+    left with no units, and mines on unknown asteroids, are removed.
+    """
+    moved = set()   # units with a later move
+    mined = set()   # units with a later move or mine
+    kept: List[dict] = []
+    for cmd in reversed(inbox.pending):
+        t = cmd["type"]
+        if t == "cmd_move" or t == "cmd_mine":
+            if t == "cmd_mine" and cmd["asteroid_id"] not in state.asteroids:
+                with inbox.lock:
+                    inbox.dropped += 1
+                continue
+            claimed = mined if t == "cmd_mine" else moved
+            ids = cmd["unit_ids"]
+            live = [u for u in ids if u not in claimed]
+            if not live:
+                inbox.coalesced += 1
+                continue
+            if t == "cmd_move":
+                moved.update(live)
+            elif len(live) != len(ids):
+                cmd = dict(cmd, unit_ids=live)
+            mined.update(live)
+        kept.append(cmd)
+    kept.reverse()
+    inbox.pending.clear()
+    inbox.pending.extend(kept)
+
+def apply_cmd(state: ServerState, player_id: int, cmd: dict):
+    t = cmd["type"]
+    if t == "cmd_move":
+        handle_cmd_move(state, player_id, cmd)
+    elif t == "cmd_buy_miner":
+        handle_cmd_buy_miner(state, player_id, cmd)
+    elif t == "cmd_mine":
+        handle_cmd_mine(state, player_id, cmd)
+    elif t == JOIN:
+        handle_join(state, player_id)
+
+def apply_commands(state: ServerState):
+    """
+    Apply queued commands one per player in turn, so a busy client can't starve
+    the others. Stops once CMD_BUDGET_MS of this tick is spent; the rest stays
+    pending for the next tick. At the top load-shedding level the budget is
+    CMD_SHED_BUDGET_MS and each player's oldest unit orders are dropped down to
+    CMD_SHED_MAX_PENDING pending; JOIN and purchases are never shed. Forced
+    commands (JOIN) are applied first, outside the budget.
+    """
+    with state.clients_lock:
+        inboxes: Dict[int, CommandInbox] = dict(state.inboxes)
+
+    recorder = state.recorder
+    for pid, inbox in inboxes.items():
+        for cmd in inbox.take_forced():
+            if recorder is not None:
+                recorder.command(pid, cmd)
+            apply_cmd(state, pid, cmd)
+            inbox.applied += 1
+        new = inbox.take()
+        if new:
+            inbox.pending.extend(new)
+            coalesce_cmds(state, inbox)
+
+    budget_ms = cfg.CMD_BUDGET_MS
+    if state.sched.shed_commands:
+        budget_ms = cfg.CMD_SHED_BUDGET_MS
+        for inbox in inboxes.values():
+            inbox.shed(cfg.CMD_SHED_MAX_PENDING, UNIT_ORDERS)
+
+    deadline = time.perf_counter() + budget_ms / 1000.0
+    active = [(pid, inbox) for pid, inbox in inboxes.items() if inbox.pending]
+    while active:
+        for pid, inbox in active:
+            cmd = inbox.pending.popleft()
+            if recorder is not None:
+                recorder.command(pid, cmd)
+            apply_cmd(state, pid, cmd)
+            inbox.applied += 1
+        active = [(pid, inbox) for pid, inbox in active if inbox.pending]
+        if active and time.perf_counter() >= deadline:
+            for _, inbox in active:
+                inbox.deferred += len(inbox.pending)
+            break
@@ -1,12 +1,69 @@
 # Networking
 HOST = "0.0.0.0"
 PORT = 5001
+NET_MODE = "threads"   # "threads" (one thread per client) or "asyncio" (one event loop for all)
+UDP = False                # also take clients over UDP on PORT: unreliable snapshots, reliable commands (rts/server/udpserver.py)
+UDP_MAX_PENDING = 64       # UDP peers past the cookie check that haven't joined yet; more CONNECTs are ignored
+OUTBOX_MAX_MSGS = 256      # queued non-snapshot messages per client before it is dropped
+CLIENT_MAX_LAG = 5.0       # seconds a client may keep dropping snapshots before it is disconnected
+MATCH_MODE = False         # host many independent matches (rts/server/matches.py) instead of one world
+MATCH_MAX_PLAYERS = 2      # per match; there are two base positions
+MATCH_MAX_MATCHES = 64
+MATCH_WORKERS = 4          # threads ticking matches
+CMD_INBOX_MAX = 64         # pending commands per player; newer ones are dropped past this
+CMD_BUDGET_MS = 4.0        # sim time per tick for applying commands; the rest waits a tick
+MAP_CHUNK_ASTEROIDS = 4096 # asteroids per map_init/map_chunk message, so big maps stay under MAX_MSG_BYTES; 0 = one message
 
 # Timing
 TICK_HZ = 30.0
 DT = 1.0 / TICK_HZ
 SNAPSHOT_HZ = 20.0
 SNAP_EVERY_TICKS = max(1, int(TICK_HZ / SNAPSHOT_HZ))
+TICK_MAX_CATCHUP = 3       # late ticks run back to back before the rest of the backlog is dropped
+TICK_DRIFT_BUDGET = 0.25   # seconds behind schedule past which missed ticks are dropped, not replayed
+
+# Load shedding (rts/server/scheduler.py): step work down under sustained overload, back up after
+LOAD_SHED = True
+LOAD_SHED_HIGH = 0.9       # smoothed tick cost, as a share of DT, that counts as overloaded
+LOAD_SHED_LOW = 0.5        # ... and as calm enough to step back down
+LOAD_SHED_HOLD_S = 1.0     # overloaded this long before stepping up a level
+LOAD_RECOVER_HOLD_S = 5.0  # calm this long before stepping down (doubles when it flaps, up to 8x)
+LOAD_SNAP_FACTOR = (1, 2, 3, 3)   # snapshot interval multiplier per level
+CMD_SHED_BUDGET_MS = 1.0   # CMD_BUDGET_MS at the top level
+CMD_SHED_MAX_PENDING = 8   # pending commands kept per player at the top level (older move/mine orders dropped)
+SNAPSHOT_DELTA = True      # send snapshot_delta to clients that ask for it in hello
+SNAPSHOT_HISTORY = 32      # snapshots kept as delta baselines (~1.6s at 20 Hz)
+BINARY_CODEC = True        # use rts.net.codec with clients that offer "bin" in hello
+
+# Interest management: clients that report a viewport get full detail only inside it
+INTEREST_MANAGEMENT = True
+INTEREST_HALO = 600        # world px around the viewport still sent in full
+INTEREST_CELL = 1000       # bucket size of the per-snapshot entity grid
+SUMMARY_EVERY_SNAPSHOTS = 10   # snapshot_summary rate (every 10th snapshot = 2 Hz)
+
+# Metrics: per-phase tick timings, counts and bytes/s (rts/server/metrics.py)
+METRICS_WINDOW = 600       # ticks kept for percentiles (20 s at 30 Hz)
+METRICS_EVERY_S = 2.0      # how often the report is refreshed
+METRICS_FILE = "server_stats.json"   # rewritten every METRICS_EVERY_S; None to disable
+METRICS_PORT = None        # e.g. 5002 to also serve it at http://127.0.0.1:PORT/metrics
+
+# Command log (rts/server/replay.py); replay one with python3 -m rts.server.replay FILE
+RECORD_FILE = None         # e.g. "match.rtsrec"; in MATCH_MODE match N writes "match-N.rtsrec"
+RECORD_HASH_EVERY = 90     # ticks between state hashes in the log, checked on replay; 0 = none
+
+# World checkpoints (rts/server/checkpoint.py), single-world mode: restored on startup if the file exists
+CHECKPOINT_FILE = None     # e.g. "world.ckpt"
+CHECKPOINT_EVERY_S = 5.0   # a round is skipped while the previous checkpoint is still being written
+
+# Entity storage: "dict" (Entity objects) or "numpy" (columnar store + vectorized tick, needs numpy)
+ENTITY_STORE = "dict"
+# Sleeping units (rts/server/activity.py): units without a target skip the tick and miners sleep
+# through MINING_TIME on a timer wheel; False wakes every unit every tick
+ENTITY_SLEEP = True
+# Split the tick across this many worker processes, one vertical map strip each, with
+# entity columns in shared memory (rts/server/shards.py). 0 = tick in the sim thread.
+# Needs numpy; implies the numpy store; ignored in MATCH_MODE.
+SHARD_WORKERS = 0
 
 # World / Economy config
 MAP_W, MAP_H = 15000, 10000
@@ -24,3 +81,18 @@ ASTEROID_GAP = 250
 AST_MIN_R = 35
 AST_MAX_R = 110
 AST_EDGE_PAD = 600
+ASTEROID_GRID_CELL = 512   # broadphase cell size; <= 0 disables the grid
+
+# Navigation: fighters and miners follow cached flow fields around asteroids (rts/server/pathing.py)
+NAV_CELL = 200             # obstacle grid cell size; <= 0 flies straight lines as before
+NAV_CLEARANCE = 20         # a cell is blocked when any part of it is this close to an asteroid's edge
+NAV_CACHE_FIELDS = 64      # flow fields kept (LRU by destination cell), ~50 KB each at NAV_CELL = 200
+
+# Unit separation (rts/server/separation.py): units closer than the sum of their personal radii are
+# pushed apart; give is the share of the overlap a unit yields per tick (0 = never pushed)
+SEPARATION_CELL = 40       # spatial hash cell, >= the personal diameter of moving types; <= 0 turns separation off
+SEPARATION = {             # type -> (personal radius, give)
+    "station": (85.0, 0.0),    # immovable, keeps units off its hull
+    "fighter": (14.0, 0.8),    # tight: formations at the 42-unit move gap never touch
+    "miner": (20.0, 0.4),      # loose: spreads out piles at the drop-off point
+}
@@ -0,0 +1,99 @@
+import threading
+from collections import deque
+from typing import Collection, Deque, List
+
+class CommandInbox:
+    """
+    Bounded per-player command queue, filled by that player's connection thread
+    (or task) with already-validated commands and drained by the sim thread.
+
+    put() refuses commands once max_cmds are waiting, so a spamming client only
+    loses its own newest orders. pending holds what the sim thread has taken but
+    not yet applied (coalesced, or deferred when the tick's command budget ran out);
+    only the sim thread touches it. Forced commands (the internal JOIN) wait in
+    their own queue, which is never full, coalesced or shed.
+    """
+    def __init__(self, max_cmds: int = 64):
+        self.lock = threading.Lock()
+        self.max_cmds = max_cmds
+        self.cmds: Deque[dict] = deque()
+        self.forced: Deque[dict] = deque()
+        self.pending: Deque[dict] = deque()
+
+        self.received = 0
+        self.applied = 0
+        self.dropped = 0            # refused (inbox full) or invalid
+        self.coalesced = 0          # unit orders superseded within a tick
+        self.deferred = 0           # commands carried over to a later tick
+
+    @property
+    def depth(self) -> int:
+        return len(self.cmds) + len(self.forced) + len(self.pending)
+
+    def put(self, cmd: dict, force: bool = False) -> bool:
+        """
+        Queue a command. False (and counted as dropped) if the inbox is full.
+        force queues it regardless, on the forced queue (see take_forced).
+        """
+        with self.lock:
+            self.received += 1
+            if force:
+                self.forced.append(cmd)
+                return True
+            if len(self.cmds) + len(self.pending) >= self.max_cmds:
+                self.dropped += 1
+                return False
+            self.cmds.append(cmd)
+        return True
+
+    def reject(self):
+        """Count a command that failed validation."""
+        with self.lock:
+            self.received += 1
+            self.dropped += 1
+
+    def take(self) -> List[dict]:
+        """Everything queued since the last take, oldest first."""
+        with self.lock:
+            cmds = list(self.cmds)
+            self.cmds.clear()
+        return cmds
+
+    def take_forced(self) -> List[dict]:
+        """Forced commands queued since the last call, oldest first."""
+        with self.lock:
+            cmds = list(self.forced)
+            self.forced.clear()
+        return cmds
+
+    def shed(self, keep: int, sheddable: Collection[str]) -> int:
+        """
+        Drop the oldest pending commands of a sheddable type until at most `keep`
+        are pending (sim thread); counted as dropped. Other types are never dropped.
+        """
+        excess = len(self.pending) - keep
+        if excess <= 0:
+            return 0
+        kept: List[dict] = []
+        dropped = 0
+        for cmd in self.pending:
+            if dropped < excess and cmd["type"] in sheddable:
+                dropped += 1
+            else:
+                kept.append(cmd)
+        if dropped:
+            self.pending.clear()
+            self.pending.extend(kept)
+            with self.lock:
+                self.dropped += dropped
+        return dropped
+
+    def stats(self) -> dict:
+        return {
+            "cmd_depth": self.depth,
+            "cmd_received": self.received,
+            "cmd_applied": self.applied,
+            "cmd_dropped": self.dropped,
+            "cmd_coalesced": self.coalesced,
+            "cmd_deferred": self.deferred,
+        }
@@ -0,0 +1,51 @@
+"""
+Entity ids by owner and type (state.index), so command validation is set
+membership instead of a lookup per unit.
+
+Entities never change owner or type, so the index only changes when one is
+added or removed: go through state.add_entity / state.remove_entity (spawns,
+benches) or rebuild() after filling the store directly (checkpoint restore).
+Sim thread, under world_lock.
+"""
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+_EMPTY: Set[int] = frozenset()
+
+class EntityIndex:
+    def __init__(self):
+        self.by_owner: Dict[int, Set[int]] = {}
+        self.by_kind: Dict[Tuple[int, str], Set[int]] = {}     # (owner, type)
+        self._kind: Dict[int, Tuple[int, str]] = {}             # id -> (owner, type)
+
+    def add(self, e):
+        owner, typ = e.owner, e.type
+        self._kind[e.id] = (owner, typ)
+        self.by_owner.setdefault(owner, set()).add(e.id)
+        self.by_kind.setdefault((owner, typ), set()).add(e.id)
+
+    def remove(self, eid: int):
+        kind = self._kind.pop(eid, None)
+        if kind is None:
+            return
+        self.by_owner[kind[0]].discard(eid)
+        self.by_kind[kind].discard(eid)
+
+    def rebuild(self, entities):
+        self.__init__()
+        for e in entities.values():
+            self.add(e)
+
+    def owned(self, player_id: int, typ: Optional[str] = None) -> Set[int]:
+        """The player's entity ids (of one type); a live set, don't modify it."""
+        if typ is None:
+            return self.by_owner.get(player_id, _EMPTY)
+        return self.by_kind.get((player_id, typ), _EMPTY)
+
+    def filter_owned(self, player_id: int, ids: Iterable[int], typ: Optional[str] = None) -> list:
+        """ids the player owns (of one type), in their order."""
+        mine = self.owned(player_id, typ)
+        if not isinstance(ids, (list, tuple)):
+            ids = list(ids)
+        if mine.issuperset(ids):
+            return list(ids)
+        return [u for u in ids if u in mine]
@@ -1,67 +1,129 @@
+import asyncio
+import os
+import signal
 import socket
 import threading
 
-from rts.net.transport import recv_msg, send_msg
+from rts.net.transport import FrameReader, send_msg
 from rts.net import protocol as P
 from .state import ServerState
 from . import config as cfg
 from .worldgen import generate_asteroids
-from .commands import spawn_station_and_fighters
-from .snapshots import build_map_init
+from .netserver import join_player, client_map_init, handle_client_msg, add_client, remove_client, run_writer
 from .simulation import sim_loop
+from .metrics import run_metrics, metrics_report
+from .aioserver import serve
+from .soa import EntityStore
+from .shards import ShardedStore
+from .matches import MatchManager, MatchFull
+from .replay import Recorder
+from .checkpoint import Checkpointer, restore_checkpoint
+from .udpserver import serve_udp
 
 state = ServerState()
+start_tick = 0                # a restored checkpoint's tick
+matches: MatchManager = None  # set in MATCH_MODE; then `state` is unused
 
 def handle_client(conn: socket.socket, addr):
     conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
-    player_id = None
+    world = state
+    match = None
     try:
-        hello = recv_msg(conn)
-        if hello.get("type") != P.HELLO:
-            raise ValueError("expected hello")
+        reader = FrameReader(conn)
+        hello = reader.read_msg()
+        if matches is not None:
+            match = matches.join(hello)
+            world = match.state
+        info = join_player(world, hello)
+        print(f"[+] {addr} => player_id={info.player_id}" + (f" match={match.name!r}" if match else ""))
 
-        with state.world_lock:
-            player_id = state.next_player_id
-            state.next_player_id += 1
-            state.credits[player_id] = cfg.CREDITS_START
-
-        with state.clients_lock:
-            state.clients[conn] = player_id
-
-        print(f"[+] {addr} => player_id={player_id}")
+        init = client_map_init(world, info, hello)
+        if match is not None:
+            init[0]["match"] = match.name
+        for msg in init:
+            send_msg(conn, msg, info.binary)
+        add_client(world, conn, info)
+        threading.Thread(target=run_writer, args=(world, conn, info), daemon=True).start()
 
-        spawn_station_and_fighters(state, player_id)
+        while world.running:
+            handle_client_msg(world, info, reader.read_msg())
 
-        send_msg(conn, build_map_init(state, player_id))
-
-        while state.running:
-            msg = recv_msg(conn)
-            t = msg.get("type")
-            if t in P.SERVER_CMDS:
-                state.command_q.put((player_id, msg))
-
-    except Exception as e:
-        print(f"[-] client {addr} disconnected: {e}")
-    finally:
-        with state.clients_lock:
-            if conn in state.clients:
-                pid = state.clients.pop(conn, None)
-                print(f"[-] removed client pid={pid}")
+    except MatchFull as e:
+        print(f"[-] client {addr} refused: {e}")
         try:
-            conn.close()
+            send_msg(conn, {"type": P.ERROR, "reason": str(e)})
         except Exception:
             pass
+    except Exception as e:
+        print(f"[-] client {addr} disconnected: {e}")
+    finally:
+        remove_client(world, conn)
+        if match is not None:
+            matches.leave(match)
+
+def start_sim():
+    """Start ticking: the one world's sim_loop, or the match scheduler in MATCH_MODE."""
+    if matches is not None:
+        threading.Thread(target=matches.run, daemon=True).start()
+        threading.Thread(target=run_metrics, args=(matches.report,), daemon=True).start()
+    else:
+        threading.Thread(target=sim_loop, args=(state, start_tick), daemon=True).start()
+        threading.Thread(target=run_metrics, args=(lambda rates: metrics_report(state, rates),), daemon=True).start()
+
+def stop_world():
+    if state.checkpointer is not None:
+        state.checkpointer.close(state)
+    if state.recorder is not None:
+        state.recorder.close()
+    if isinstance(state.entities, ShardedStore):
+        with state.world_lock:
+            state.entities.close()
+
+def _terminate(signum, frame):
+    raise KeyboardInterrupt     # SIGTERM shuts down like Ctrl-C, so stop_world still runs
 
 def main():
-    generate_asteroids(state, cfg.MAP_SEED)
+    global matches, start_tick
+    signal.signal(signal.SIGTERM, _terminate)
+    if cfg.MATCH_MODE:
+        matches = MatchManager(cfg.MATCH_WORKERS)
+    else:
+        if cfg.SHARD_WORKERS > 0:
+            state.entities = ShardedStore()
+        elif cfg.ENTITY_STORE == "numpy":
+            state.entities = EntityStore()
+        if cfg.CHECKPOINT_FILE and os.path.exists(cfg.CHECKPOINT_FILE):
+            start_tick = restore_checkpoint(state, cfg.CHECKPOINT_FILE)
+            print(f"Restored {cfg.CHECKPOINT_FILE}: tick {start_tick}, {len(state.entities)} entities, "
+                  f"{len(state.asteroids)} asteroids")
+        else:
+            generate_asteroids(state, cfg.MAP_SEED)
+        if cfg.SHARD_WORKERS > 0:
+            state.entities.start(state.asteroids, cfg.SHARD_WORKERS)
+            print(f"Sharded tick: {cfg.SHARD_WORKERS} worker processes")
+        if cfg.RECORD_FILE:
+            if start_tick:
+                print("[record] the world was restored from a checkpoint; replaying the log will not match")
+            state.recorder = Recorder(cfg.RECORD_FILE, state)
+        if cfg.CHECKPOINT_FILE:
+            state.checkpointer = Checkpointer(cfg.CHECKPOINT_FILE)
+
+    if cfg.UDP:
+        serve_udp(state, cfg.HOST, cfg.PORT, matches)
+        print(f"UDP clients on {cfg.HOST}:{cfg.PORT}")
+
+    if cfg.NET_MODE == "asyncio":
+        main_asyncio()
+        return
 
     srv = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     srv.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
     srv.bind((cfg.HOST, cfg.PORT))
     srv.listen()
-    print(f"Server listening on {cfg.HOST}:{cfg.PORT} (tick={cfg.TICK_HZ}Hz, snap={cfg.SNAPSHOT_HZ}Hz)")
+    print(f"Server listening on {cfg.HOST}:{cfg.PORT} (tick={cfg.TICK_HZ}Hz, snap={cfg.SNAPSHOT_HZ}Hz"
+          + (f", up to {cfg.MATCH_MAX_MATCHES} matches" if matches is not None else "") + ")")
 
-    threading.Thread(target=sim_loop, args=(state,), daemon=True).start()
+    start_sim()
 
     try:
         while True:
@@ -71,6 +133,7 @@ def main():
         print("\nShutting down...")
     finally:
         state.running = False
+        stop_world()
         try:
             srv.close()
         except Exception:
@@ -83,3 +146,14 @@ def main():
                 except Exception:
                     pass
             state.clients.clear()
+
+def main_asyncio():
+    print(f"Server listening on {cfg.HOST}:{cfg.PORT} (asyncio, tick={cfg.TICK_HZ}Hz, snap={cfg.SNAPSHOT_HZ}Hz)")
+    start_sim()
+    try:
+        asyncio.run(serve(state, cfg.HOST, cfg.PORT, matches))
+    except KeyboardInterrupt:
+        print("\nShutting down...")
+    finally:
+        state.running = False
+        stop_world()
@@ -0,0 +1,162 @@
+"""
+Multi-match hosting (MATCH_MODE = True): one server process and port, many
+independent worlds.
+
+Every match is a full ServerState. HELLO may carry "match": a name to join or
+create; without one the player lands in the first match with a free slot, or a
+new one. There is no sim_loop thread per world: a scheduler thread keeps every
+match's next tick time in a heap and hands due ticks to a pool of MATCH_WORKERS
+threads. A match is only ever ticked by one worker at a time. When its last
+player leaves, it is dropped from the schedule and torn down.
+"""
+import heapq
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from .state import ServerState, Asteroid
+from . import config as cfg
+from .worldgen import generate_asteroids, build_asteroid_grid
+from .simulation import run_tick
+from .soa import EntityStore
+from .metrics import metrics_report
+from .replay import Recorder
+
+class MatchFull(Exception):
+    pass
+
+class Match:
+    def __init__(self, match_id: int, name: str, asteroids: Dict[int, Asteroid]):
+        self.id = match_id
+        self.name = name
+        self.state = ServerState()
+        if cfg.ENTITY_STORE == "numpy":
+            self.state.entities = EntityStore()
+        # Every match uses MAP_SEED, so share the generated asteroids (never mutated)
+        self.state.asteroids = dict(asteroids)
+        self.state.next_asteroid_id = max(asteroids, default=0) + 1
+        build_asteroid_grid(self.state)
+        if cfg.RECORD_FILE:
+            root, ext = os.path.splitext(cfg.RECORD_FILE)
+            self.state.recorder = Recorder(f"{root}-{match_id}{ext}", self.state, name)
+
+        self.players = 0        # joined and not yet left; guarded by the manager lock
+        self.tick = 0
+        self.state.sched.label = f"match {name!r}"   # the world's tick schedule, in the heap below
+
+class MatchManager:
+    def __init__(self, workers: int = 4):
+        self.lock = threading.Condition()
+        self.matches: Dict[int, Match] = {}
+        self.by_name: Dict[str, Match] = {}
+        self.next_match_id = 1
+        self.heap: List[Tuple[float, int, int]] = []   # (next_time, seq, match_id)
+        self.seq = itertools.count()
+        self.workers = workers
+        self.pool = ThreadPoolExecutor(workers, thread_name_prefix="match")
+
+        template = ServerState()
+        generate_asteroids(template, cfg.MAP_SEED)
+        self.asteroids = template.asteroids
+
+    def join(self, hello: dict) -> Match:
+        """Lobby step of the handshake: pick (or create) the match for a hello."""
+        name = hello.get("match")
+        with self.lock:
+            if name is not None:
+                name = str(name)[:64]
+                match = self.by_name.get(name)
+                if match is not None and match.players >= cfg.MATCH_MAX_PLAYERS:
+                    raise MatchFull(f"match {name!r} is full")
+            else:
+                match = next((m for m in self.matches.values() if m.players < cfg.MATCH_MAX_PLAYERS), None)
+            if match is None:
+                if len(self.matches) >= cfg.MATCH_MAX_MATCHES:
+                    raise MatchFull("server is full")
+                match = self._create(name)
+            match.players += 1
+            return match
+
+    def leave(self, match: Match):
+        with self.lock:
+            match.players -= 1
+            if match.players > 0 or self.matches.get(match.id) is not match:
+                return
+            del self.matches[match.id]
+            del self.by_name[match.name]
+        match.state.running = False
+        if match.state.recorder is not None:
+            match.state.recorder.close()
+        print(f"[match] ended {match.name!r} (id={match.id}) after {match.tick} ticks")
+
+    def _create(self, name: Optional[str]) -> Match:
+        """With the lock held."""
+        match_id = self.next_match_id
+        self.next_match_id += 1
+        name = name or f"match-{match_id}"
+        while name in self.by_name:     # an auto name a player already took
+            name += "+"
+        match = Match(match_id, name, self.asteroids)
+        self.matches[match_id] = match
+        self.by_name[match.name] = match
+        heapq.heappush(self.heap, (match.state.sched.next_time, next(self.seq), match_id))
+        self.lock.notify()
+        print(f"[match] created {match.name!r} (id={match_id}, {len(self.matches)} running)")
+        return match
+
+    def run(self):
+        """Scheduler thread: submit each match's tick to the pool when it is due."""
+        with self.lock:
+            while True:
+                if not self.heap:
+                    self.lock.wait()
+                    continue
+                due, _, match_id = self.heap[0]
+                now = time.perf_counter()
+                if due > now:
+                    self.lock.wait(due - now)
+                    continue
+                heapq.heappop(self.heap)
+                match = self.matches.get(match_id)
+                if match is not None:
+                    self.pool.submit(self._tick, match, match.state.sched.start(now))
+
+    def _tick(self, match: Match, late: float):
+        try:
+            match.tick += 1
+            run_tick(match.state, match.tick, late)
+        except Exception as e:
+            print(f"[match] tick failed in {match.name!r}: {e}")
+        finally:
+            with self.lock:
+                if self.matches.get(match.id) is match:
+                    heapq.heappush(self.heap, (match.state.sched.next_time, next(self.seq), match.id))
+                    self.lock.notify()
+
+    def report(self, rates: dict) -> dict:
+        """Metrics across matches, for run_metrics. rates is keyed by match id."""
+        with self.lock:
+            matches = list(self.matches.values())
+        per_match = {}
+        for m in matches:
+            per_match[m.name] = metrics_report(m.state, rates.setdefault(m.id, {}))
+        for match_id in list(rates):
+            if match_id not in self.matches:
+                del rates[match_id]
+        reports = per_match.values()
+        return {
+            "time": time.time(),
+            "matches": len(per_match),
+            "workers": self.workers,
+            "overruns": sum(r["overruns"] for r in reports),
+            "catchup_ticks": sum(r["catchup_ticks"] for r in reports),
+            "skipped_ticks": sum(r["skipped_ticks"] for r in reports),
+            "load_level_max": max((r["load"]["level"] for r in reports), default=0),
+            "entities": sum(r["entities"] for r in reports),
+            "clients": sum(r["clients"] for r in reports),
+            "bytes_per_s": sum(r["bytes_per_s"] for r in reports),
+            "per_match": per_match,
+        }
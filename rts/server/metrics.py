@@ -0,0 +1,175 @@
+"""
+Tick profiler and live server stats.
+
+The sim thread only drops timings into fixed-size rings (TickMetrics.record_tick);
+percentiles, counts and rates are worked out by run_metrics on its own thread,
+which rewrites METRICS_FILE and optionally serves the same JSON over HTTP.
+"""
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Tuple
+
+from . import config as cfg
+
+PHASES = ("apply_commands", "tick_entities", "publish_frame", "build_snapshot", "broadcast")
+
+class RollingHist:
+    """The last `size` samples (ms), summarized on demand."""
+    def __init__(self, size: int):
+        self.buf: List[float] = [0.0] * size
+        self.n = 0
+
+    def add(self, ms: float):
+        self.buf[self.n % len(self.buf)] = ms
+        self.n += 1
+
+    def summary(self) -> dict:
+        vals = sorted(self.buf[:min(self.n, len(self.buf))])
+        if not vals:
+            return {"n": 0}
+        last = len(vals) - 1
+        return {
+            "n": len(vals),
+            "p50": round(vals[last * 50 // 100], 3),
+            "p95": round(vals[last * 95 // 100], 3),
+            "p99": round(vals[last * 99 // 100], 3),
+            "max": round(vals[last], 3),
+        }
+
+class TickMetrics:
+    """
+    Written by the sim thread only. A tick overruns when it takes longer than DT;
+    it is a catch-up tick when it started a full DT or more behind schedule (the
+    loop is running ticks back to back).
+    """
+    def __init__(self, window: int = 600):
+        self.phases: Dict[str, RollingHist] = {name: RollingHist(window) for name in PHASES}
+        self.tick_ms = RollingHist(window)
+        self.late_ms = RollingHist(window)
+        self.ticks = 0
+        self.overruns = 0
+        self.catchup = 0
+
+    def record_tick(self, late: float, times: Tuple[float, ...]):
+        """times are perf_counter stamps: start, then the end of each phase in PHASES."""
+        t0 = times[0]
+        prev = t0
+        for name, t in zip(PHASES, times[1:]):
+            self.phases[name].add((t - prev) * 1000.0)
+            prev = t
+        total = prev - t0
+        self.tick_ms.add(total * 1000.0)
+        self.late_ms.add(late * 1000.0)
+        self.ticks += 1
+        if total > cfg.DT:
+            self.overruns += 1
+        if late >= cfg.DT:
+            self.catchup += 1
+
+def metrics_report(state, rates: Dict[int, Tuple[float, int]]) -> dict:
+    """
+    One stats document. rates carries (time, bytes_sent) per player between calls
+    and is updated in place to get bytes/s.
+    """
+    from .netserver import client_stats
+    m = state.metrics
+    now = time.monotonic()
+    clients = client_stats(state)
+    total_bps = 0.0
+    seen = set()
+    for c in clients:
+        pid = c["player_id"]
+        seen.add(pid)
+        last_t, last_b = rates.get(pid, (now, c["bytes_sent"]))
+        dt = now - last_t
+        c["bytes_per_s"] = round((c["bytes_sent"] - last_b) / dt) if dt > 0 else 0
+        total_bps += c["bytes_per_s"]
+        rates[pid] = (now, c["bytes_sent"])
+    for pid in list(rates):
+        if pid not in seen:
+            del rates[pid]
+
+    frame = state.frame
+    return {
+        "time": time.time(),
+        "tick": frame.tick if frame is not None else 0,
+        "tick_hz": cfg.TICK_HZ,
+        "ticks": m.ticks,
+        "overruns": m.overruns,
+        "catchup_ticks": m.catchup,
+        "skipped_ticks": state.sched.skipped,
+        "load": state.sched.report(),
+        "tick_ms": m.tick_ms.summary(),
+        "late_ms": m.late_ms.summary(),
+        "phases_ms": {name: h.summary() for name, h in m.phases.items()},
+        "entities": len(frame.entities) if frame is not None else 0,
+        "nav": state.nav.stats() if state.nav is not None else None,
+        "checkpoint": state.checkpointer.stats() if state.checkpointer is not None else None,
+        "activity": state.activity.stats(state),
+        "clients": len(clients),
+        "bytes_per_s": round(total_bps),
+        "per_client": clients,
+    }
+
+def run_metrics(build_report: Callable[[dict], dict]):
+    """
+    Stats thread: refresh the report every METRICS_EVERY_S, write it and/or serve it.
+    build_report(rates) makes one report, e.g. lambda rates: metrics_report(state, rates).
+    """
+    rates: dict = {}
+    latest = {"doc": b"{}"}
+
+    if cfg.METRICS_PORT:
+        _serve_http(latest)
+
+    overruns: Dict[str, int] = {}
+    while True:
+        time.sleep(cfg.METRICS_EVERY_S)
+        report = build_report(rates)
+        doc = json.dumps(report, indent=1).encode()
+        latest["doc"] = doc
+        if cfg.METRICS_FILE:
+            _write_atomic(cfg.METRICS_FILE, doc)
+
+        overruns = _log_overruns(report, overruns)
+
+def _log_overruns(report: dict, seen: Dict[str, int]) -> Dict[str, int]:
+    """A line per world (each match in match mode) with new overruns; returns the counts seen."""
+    worlds = report["per_match"] if "per_match" in report else {"": report}
+    for name, r in worlds.items():
+        new = r["overruns"] - seen.get(name, 0)
+        if new > 0:
+            t = r["tick_ms"]
+            where = f" in match {name!r}" if name else ""
+            print(f"[metrics] {new} tick overruns{where} "
+                  f"(p99={t.get('p99')}ms max={t.get('max')}ms, catch-up={r['catchup_ticks']}, skipped={r['skipped_ticks']})")
+    return {name: r["overruns"] for name, r in worlds.items()}
+
+def _write_atomic(path: str, data: bytes):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+def _serve_http(latest: dict):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = latest["doc"]
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    srv = ThreadingHTTPServer(("127.0.0.1", cfg.METRICS_PORT), Handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    print(f"Metrics on http://127.0.0.1:{cfg.METRICS_PORT}/metrics")
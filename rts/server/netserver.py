@@ -1,26 +1,229 @@
 import socket
-from typing import List
+from typing import Dict, List
 
-from rts.net.transport import send_msg
-from .state import ServerState
+from rts.net.transport import MAX_PARTS, SharedMsg, encode_frame, send_parts
+from rts.net import protocol as P
+from .state import ServerState, ClientInfo
+from .outbox import Outbox
+from .inbox import CommandInbox
+from . import config as cfg
+from .commands import JOIN, validate_cmd, validate_viewport
+from .snapshots import build_map_init, build_snapshot_delta, build_entity_grid, build_interest_view, build_summary, summary_rows
 
-def safe_send(conn: socket.socket, msg: dict) -> bool:
+def join_player(state: ServerState, hello: dict) -> ClientInfo:
+    """
+    Allocate a player for a hello and queue their spawn for the sim thread (the base
+    shows up in the next snapshot). Not yet in state.clients.
+    """
+    if hello.get("type") != P.HELLO:
+        raise ValueError("expected hello")
+
+    inbox = CommandInbox(cfg.CMD_INBOX_MAX)
+    inbox.put({"type": JOIN}, force=True)
+    with state.clients_lock:
+        player_id = state.next_player_id
+        state.next_player_id += 1
+        state.inboxes[player_id] = inbox
+
+    return ClientInfo(
+        player_id,
+        delta=cfg.SNAPSHOT_DELTA and bool(hello.get("delta")),
+        binary=cfg.BINARY_CODEC and P.CODEC_BIN in (hello.get("codecs") or []),
+        outbox=Outbox(cfg.OUTBOX_MAX_MSGS),
+        inbox=inbox,
+    )
+
+def client_map_init(state: ServerState, info: ClientInfo, hello: dict) -> List[dict]:
+    """
+    The handshake's map messages: map_init, then any map_chunks. A client that has
+    the map cached (HELLO "map_hashes") gets map_init without asteroids.
+    """
+    cached = state.map_hash in (hello.get("map_hashes") or ())
+    init = build_map_init(state, info.player_id, asteroids=not cached)
+    init["codec"] = P.CODEC_BIN if info.binary else P.CODEC_JSON
+    if cached:
+        init["cached"] = True
+        return [init]
+
+    asts = init["asteroids"]
+    per = cfg.MAP_CHUNK_ASTEROIDS
+    if per <= 0 or len(asts) <= per:
+        return [init]
+    init["asteroids"] = asts[:per]
+    init["chunks"] = (len(asts) - 1) // per
+    return [init] + [{"type": P.MAP_CHUNK, "index": i, "asteroids": asts[i * per:(i + 1) * per]}
+                     for i in range(1, init["chunks"] + 1)]
+
+def handle_client_msg(state: ServerState, info: ClientInfo, msg: dict):
+    """Route one message from a joined client. Runs on its connection thread/task."""
+    t = msg.get("type")
+    if t in P.SERVER_CMDS:
+        cmd = validate_cmd(msg)
+        if cmd is None:
+            info.inbox.reject()
+        else:
+            info.inbox.put(cmd)
+    elif t == P.ACK:
+        info.acked_tick = int(msg.get("tick", -1))
+    elif t == P.VIEWPORT:
+        view = validate_viewport(msg)
+        if view is not None:
+            info.viewport = view
+
+def add_client(state: ServerState, conn, info: ClientInfo):
+    """Start including conn in broadcasts. Call after map_init has gone out."""
+    with state.clients_lock:
+        state.clients[conn] = info
+
+def remove_client(state: ServerState, conn):
+    with state.clients_lock:
+        if conn in state.clients:
+            info = state.clients.pop(conn, None)
+            info.outbox.close()
+            state.inboxes.pop(info.player_id, None)
+            print(f"[-] removed client pid={info.player_id}")
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+def frame_for(item, binary: bool) -> bytes:
+    """Wire frame for an outbox item: a SharedMsg's cached frame, or a per-client dict."""
+    if isinstance(item, SharedMsg):
+        return item.frame(binary)
+    return encode_frame(item, binary)
+
+def run_writer(state: ServerState, conn: socket.socket, info: ClientInfo):
+    """
+    Writer thread for one client: drains info.outbox onto the socket, everything
+    queued so far (up to MAX_PARTS frames) in one sendmsg.
+    """
     try:
-        send_msg(conn, msg)
-        return True
+        while True:
+            item = info.outbox.wait_pop()
+            if item is None:
+                break
+            frames = [frame_for(item, info.binary)]
+            while len(frames) < MAX_PARTS:
+                item = info.outbox.pop()
+                if item is None:
+                    break
+                frames.append(frame_for(item, info.binary))
+            info.outbox.bytes_sent += send_parts(conn, frames)
     except Exception:
-        return False
+        pass
+    finally:
+        remove_client(state, conn)
+
+def _deliver(info: ClientInfo, msg, snapshot: bool = False) -> bool:
+    """Queue msg for a client. False if it should be dropped as too far behind."""
+    ok = info.outbox.put_snapshot(msg) if snapshot else info.outbox.put(msg)
+    return ok and info.outbox.lag() <= cfg.CLIENT_MAX_LAG
+
+def _drop_dead(state: ServerState, dead: List[socket.socket]):
+    for conn in dead:
+        try:
+            info = state.clients.pop(conn, None)
+            if info is None:
+                continue
+            depth = info.outbox.depth
+            info.outbox.close()
+            state.inboxes.pop(info.player_id, None)
+            conn.close()
+            print(f"[-] dropped lagging client pid={info.player_id} "
+                  f"(queued={depth} dropped_snapshots={info.outbox.dropped})")
+        except Exception:
+            pass
+
+def client_stats(state: ServerState) -> List[dict]:
+    """Per-client send queue and command inbox state, to spot who is lagging or spamming."""
+    with state.clients_lock:
+        infos = list(state.clients.values())
+    return [{
+        "player_id": info.player_id,
+        "queue_depth": info.outbox.depth,
+        "sent": info.outbox.sent,
+        "bytes_sent": info.outbox.bytes_sent,
+        "dropped_snapshots": info.outbox.dropped,
+        "lag_s": round(info.outbox.lag(), 3),
+        **info.inbox.stats(),
+    } for info in infos]
 
 def broadcast(state: ServerState, msg: dict):
+    shared = SharedMsg(msg)
     dead: List[socket.socket] = []
     with state.clients_lock:
-        for conn in list(state.clients.keys()):
-            if not safe_send(conn, msg):
+        for conn, info in list(state.clients.items()):
+            if not _deliver(info, shared):
                 dead.append(conn)
-        for conn in dead:
-            try:
-                pid = state.clients.pop(conn, None)
-                conn.close()
-                print(f"[-] dropped dead client pid={pid}")
-            except Exception:
-                pass
+        _drop_dead(state, dead)
+
+def broadcast_snapshot(state: ServerState, snap: dict):
+    """
+    Queue snap for every client, replacing any snapshot it hasn't sent yet. Shared
+    messages are SharedMsg, so each is encoded once (by the first writer to send
+    it) however many clients get it. Delta
+    clients whose acked tick is still in the history get a snapshot_delta against
+    it; everyone else gets the full snapshot.
+    Clients that reported a viewport get their own filtered view (see _send_view),
+    plus a snapshot_summary of everything outside that view every
+    SUMMARY_EVERY_SNAPSHOTS snapshots sent to that client (counted per client, so
+    the rate follows the snapshots it actually gets when load shedding skips some).
+    """
+    cur = {e["id"]: e for e in snap["entities"]}
+    bases = dict(state.snapshot_history)
+    state.snapshot_history.append((snap["tick"], cur))
+    while len(state.snapshot_history) > cfg.SNAPSHOT_HISTORY:
+        state.snapshot_history.popleft()
+
+    full = SharedMsg(snap)
+    deltas: Dict[int, SharedMsg] = {}  # base tick -> delta, shared by clients on the same baseline
+    interest = None                    # (grid, stations), built on first viewport client
+    rows = None                        # summary rows, built on first client due one
+    dead: List[socket.socket] = []
+    with state.clients_lock:
+        for conn, info in list(state.clients.items()):
+            if cfg.INTEREST_MANAGEMENT and info.viewport is not None:
+                if interest is None:
+                    interest = build_entity_grid(snap["entities"])
+                grid, stations = interest
+                view = build_interest_view(grid, stations, info.player_id, info.viewport)
+                ok = _send_view(info, snap, view)
+                if ok and info.views_sent % cfg.SUMMARY_EVERY_SNAPSHOTS == 0:
+                    if rows is None:
+                        rows = summary_rows(snap)
+                    ok = _deliver(info, build_summary(snap, rows, view))
+                info.views_sent += 1
+                if not ok:
+                    dead.append(conn)
+                continue
+
+            msg = full
+            base = bases.get(info.acked_tick) if info.delta else None
+            if base is not None:
+                msg = deltas.get(info.acked_tick)
+                if msg is None:
+                    msg = SharedMsg(build_snapshot_delta(snap, info.acked_tick, base, cur))
+                    deltas[info.acked_tick] = msg
+            if not _deliver(info, msg, snapshot=True):
+                dead.append(conn)
+        _drop_dead(state, dead)
+
+def _send_view(info: ClientInfo, snap: dict, view: Dict[int, dict]) -> bool:
+    """Viewport-filtered snapshot (or delta against this client's own history)."""
+    history = info.view_history
+    base = None
+    if info.delta:
+        for tick, ents in history:
+            if tick == info.acked_tick:
+                base = ents
+                break
+    history.append((snap["tick"], view))
+    while len(history) > cfg.SNAPSHOT_HISTORY:
+        history.popleft()
+
+    if base is not None:
+        msg = build_snapshot_delta(snap, info.acked_tick, base, view)
+    else:
+        msg = {"type": "snapshot", "tick": snap["tick"], "entities": list(view.values()), "credits": snap["credits"]}
+    return _deliver(info, msg, snapshot=True)
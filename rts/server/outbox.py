@@ -0,0 +1,103 @@
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Optional
+
+class Outbox:
+    """
+    Bounded per-client send queue, filled by the sim thread and drained by that
+    client's writer (a thread, or a task in asyncio mode).
+
+    Ordinary messages are kept in order up to max_msgs. Snapshots go in a single
+    slot instead: a newer snapshot replaces one the writer hasn't taken yet, so a
+    slow client only ever gets the latest. behind_since marks when the client
+    started dropping snapshots and clears once a snapshot goes out unreplaced.
+    """
+    def __init__(self, max_msgs: int = 256):
+        self.cond = threading.Condition()
+        self.max_msgs = max_msgs
+        self.msgs: Deque = deque()
+        self.snapshot = None
+        self.replaced = False       # slot snapshot has superseded an unsent one
+        self.closed = False
+        self.notify: Optional[Callable[[], None]] = None  # extra wakeup for non-thread writers
+
+        self.sent = 0
+        self.bytes_sent = 0         # added by the writer
+        self.dropped = 0            # snapshots superseded before sending
+        self.behind_since: Optional[float] = None
+
+    @property
+    def depth(self) -> int:
+        return len(self.msgs) + (1 if self.snapshot is not None else 0)
+
+    def put(self, msg) -> bool:
+        """Queue an ordered message. False if the queue is full (client too far behind)."""
+        with self.cond:
+            if self.closed or len(self.msgs) >= self.max_msgs:
+                return False
+            self.msgs.append(msg)
+            self.cond.notify()
+        self._wake()
+        return True
+
+    def put_snapshot(self, msg) -> bool:
+        with self.cond:
+            if self.closed:
+                return False
+            if self.snapshot is not None:
+                self.dropped += 1
+                self.replaced = True
+                if self.behind_since is None:
+                    self.behind_since = time.monotonic()
+            self.snapshot = msg
+            self.cond.notify()
+        self._wake()
+        return True
+
+    def lag(self) -> float:
+        """Seconds this client has been dropping snapshots, 0 if keeping up."""
+        since = self.behind_since
+        return 0.0 if since is None else time.monotonic() - since
+
+    def pop(self):
+        """Next message to write, or None if empty. Ordered messages go first."""
+        with self.cond:
+            return self._pop_locked()
+
+    def wait_pop(self):
+        """Blocking pop for writer threads; None once closed."""
+        with self.cond:
+            while True:
+                msg = self._pop_locked()
+                if msg is not None or self.closed:
+                    return msg
+                self.cond.wait()
+
+    def _pop_locked(self):
+        if self.closed:
+            return None
+        if self.msgs:
+            self.sent += 1
+            return self.msgs.popleft()
+        msg = self.snapshot
+        if msg is not None:
+            self.snapshot = None
+            if not self.replaced:
+                self.behind_since = None
+            self.replaced = False
+            self.sent += 1
+        return msg
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.msgs.clear()
+            self.snapshot = None
+            self.cond.notify_all()
+        self._wake()
+
+    def _wake(self):
+        notify = self.notify
+        if notify is not None:
+            notify()
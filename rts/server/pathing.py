@@ -0,0 +1,309 @@
+"""
+Flow-field navigation around asteroids (NAV_CELL > 0).
+
+NavGrid is a static obstacle grid over the map: a cell is blocked when any part
+of it is within NAV_CLEARANCE of an asteroid's edge, so a unit following the
+field through free cells never touches one. Units that travel (fighters
+and miners) carry a nav goal, the grid cell of their destination: for a move
+order the cell of the clicked point, shared by the whole group; for a miner the
+cell of its asteroid's center (the field then leads to the free cells around the
+asteroid, whichever side a miner lands on) or of its drop-off point. Every unit
+with the same goal steers by the same FlowField, a Dijkstra search outward from
+the goal cell. Fields live in an LRU keyed by goal cell, so miners shuttling
+between a station and an asteroid reuse the same two fields trip after trip.
+
+Fields are built lazily: the search only runs until the cells units are actually
+in are settled, and resumes if one turns up further out. Once a unit's cell has
+a clear line to the goal it drops the goal and flies straight, as before.
+"""
+import math
+from array import array
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .state import Asteroid
+
+# (dx, dy, cost, heading back x, heading back y). Costs are 2 straight and 3
+# diagonal, so the search can use a bucket queue instead of a heap. Diagonals may
+# not cut a blocked corner.
+_STEPS = tuple((sx, sy, 3 if sx and sy else 2, -sx / math.hypot(sx, sy), -sy / math.hypot(sx, sy))
+               for sx, sy in ((1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (1, -1), (-1, 1), (-1, -1)))
+_UNREACHED = 1 << 30
+
+UNIT_RADIUS = 10.0      # fighters and miners; stations do not path
+NAV_TYPES = ("fighter", "miner")
+
+class FlowField:
+    """
+    Direction per cell towards one goal cell. A cell is settled once the search
+    has fixed its distance; settled cells with a (0, 0) direction are the goal
+    itself or, for a goal inside an asteroid, that asteroid's blocked patch and
+    the free cells around it.
+    """
+    def __init__(self, grid: "NavGrid", goal: int):
+        self.grid = grid
+        self.goal = goal
+        self.used = grid.tick
+        n = grid.nx * grid.ny
+        self.dist = array("i", [_UNREACHED]) * n
+        self.dir_x = array("f", [0.0]) * n
+        self.dir_y = array("f", [0.0]) * n
+        self.settled = bytearray(n)
+        self.direct = bytearray(n)     # 0 unknown, 1 clear line to the goal, 2 not
+        # buckets[d]: cells queued at distance d; the search has got to buckets[self.d][self.i]
+        self.buckets: List[List[int]] = []
+        self.d = 0
+        self.i = 0
+        for cell, d in self._seeds():
+            self.dist[cell] = d
+            self._queue(cell, d)
+
+    def _queue(self, cell: int, d: int):
+        buckets = self.buckets
+        while len(buckets) <= d:
+            buckets.append([])
+        buckets[d].append(cell)
+
+    def _seeds(self) -> List[Tuple[int, int]]:
+        """
+        The goal, or the free cells bordering the blocked patch it sits in; the
+        patch itself is settled with no direction, like the goal.
+        """
+        g = self.grid
+        if not g.blocked[self.goal]:
+            return [(self.goal, 0)]
+        gx, gy = self.goal % g.nx, self.goal // g.nx
+        self.settled[self.goal] = 1
+        self.dist[self.goal] = 0
+        seen = {self.goal}
+        frontier = [self.goal]
+        seeds = []
+        while frontier and len(seen) < 4096:
+            nxt = []
+            for c in frontier:
+                cx, cy = c % g.nx, c // g.nx
+                for sx, sy, _, _, _ in _STEPS:
+                    x, y = cx + sx, cy + sy
+                    nb = y * g.nx + x
+                    if x < 0 or y < 0 or x >= g.nx or y >= g.ny or nb in seen:
+                        continue
+                    seen.add(nb)
+                    if g.blocked[nb]:
+                        self.settled[nb] = 1
+                        self.dist[nb] = 0
+                        nxt.append(nb)
+                    else:
+                        seeds.append((nb, round(2 * math.hypot(x - gx, y - gy))))
+            frontier = nxt
+        return seeds
+
+    def settle(self, cell: int) -> bool:
+        """Run the search until `cell` is settled (or everything reachable is); True if reachable."""
+        if self.settled[cell]:
+            return True
+        g = self.grid
+        nx, ny = g.nx, g.ny
+        blocked = g.blocked
+        settled, dist, buckets = self.settled, self.dist, self.buckets
+        dir_x, dir_y = self.dir_x, self.dir_y
+        d, i = self.d, self.i
+        while d < len(buckets):
+            bucket = buckets[d]
+            while i < len(bucket):
+                c = bucket[i]
+                i += 1
+                if settled[c]:
+                    continue
+                settled[c] = 1
+                if not blocked[c]:     # a unit in a blocked cell can leave it, nothing routes through
+                    cx, cy = c % nx, c // nx
+                    for sx, sy, cost, hx, hy in _STEPS:
+                        x, y = cx + sx, cy + sy
+                        if x < 0 or y < 0 or x >= nx or y >= ny:
+                            continue
+                        nb = y * nx + x
+                        if sx and sy and (blocked[cy * nx + x] or blocked[nb - sx]):
+                            continue
+                        nd = d + cost
+                        if nd < dist[nb]:
+                            dist[nb] = nd
+                            dir_x[nb] = hx      # a unit in nb steps back towards c
+                            dir_y[nb] = hy
+                            while len(buckets) <= nd:
+                                buckets.append([])
+                            buckets[nd].append(nb)
+                if c == cell:
+                    self.d, self.i = d, i
+                    return True
+            buckets[d] = []
+            d += 1
+            i = 0
+        self.d, self.i = d, i
+        return False
+
+    def is_direct(self, cell: int) -> bool:
+        """Whether the whole of `cell` has a clear line to the goal (worked out once per cell)."""
+        flag = self.direct[cell]
+        if flag == 0:
+            g = self.grid
+            x0, y0 = g.center(cell)
+            x1, y1 = g.center(self.goal)
+            flag = 1 if g.line_clear(x0, y0, x1, y1, UNIT_RADIUS + g.cell * 0.71) else 2
+            self.direct[cell] = flag
+        return flag == 1
+
+    def heading(self, cell: int) -> Optional[Tuple[float, float]]:
+        """
+        Direction for a unit in `cell`, or None when it should fly straight from here.
+        (0, 0) in or next to a blocked goal's patch: make for the target, keeping the goal.
+        """
+        if cell == self.goal or self.is_direct(cell) or not self.settle(cell):
+            return None
+        return self.dir_x[cell], self.dir_y[cell]
+
+class NavGrid:
+    """Obstacle grid of the (static) asteroid field plus the flow-field cache."""
+    def __init__(self, asteroids: Iterable[Asteroid], map_w: float, map_h: float,
+                 cell: float, clearance: float, cache_size: int = 64):
+        self.cell = float(cell)
+        self.clearance = float(clearance)
+        self.nx = max(1, int(math.ceil(map_w / cell)))
+        self.ny = max(1, int(math.ceil(map_h / cell)))
+        self.blocked = bytearray(self.nx * self.ny)
+        # cell -> asteroids whose box, grown by a unit radius plus a cell, touches it
+        self.near: Dict[int, List[Asteroid]] = {}
+        # cell -> asteroids a unit inside the cell can be touching
+        self.touch: Dict[int, List[Asteroid]] = {}
+        self.reach = UNIT_RADIUS + self.cell
+        self.fields: "OrderedDict[int, FlowField]" = OrderedDict()
+        self.cache_size = max(1, cache_size)
+        self.tick = 0   # fields used during the current tick are never evicted
+        self.hits = 0
+        self.misses = 0
+
+        c = self.cell
+        for a in asteroids:
+            grown = a.r + self.reach
+            for cx in range(self._clamp_x(a.x - grown), self._clamp_x(a.x + grown) + 1):
+                for cy in range(self._clamp_y(a.y - grown), self._clamp_y(a.y + grown) + 1):
+                    idx = cy * self.nx + cx
+                    self.near.setdefault(idx, []).append(a)
+                    gap_x = max(cx * c - a.x, 0.0, a.x - (cx + 1) * c)
+                    gap_y = max(cy * c - a.y, 0.0, a.y - (cy + 1) * c)
+                    gap = math.hypot(gap_x, gap_y) - a.r
+                    if gap < self.clearance:
+                        self.blocked[idx] = 1
+                    if gap < UNIT_RADIUS + 2.0:
+                        self.touch.setdefault(idx, []).append(a)
+
+    def _clamp_x(self, x: float) -> int:
+        return min(self.nx - 1, max(0, int(x // self.cell)))
+
+    def _clamp_y(self, y: float) -> int:
+        return min(self.ny - 1, max(0, int(y // self.cell)))
+
+    def cell_of(self, x: float, y: float) -> int:
+        return self._clamp_y(y) * self.nx + self._clamp_x(x)
+
+    def center(self, cell: int) -> Tuple[float, float]:
+        return ((cell % self.nx + 0.5) * self.cell, (cell // self.nx + 0.5) * self.cell)
+
+    def line_clear(self, x0: float, y0: float, x1: float, y1: float, radius: float) -> bool:
+        """Whether a circle of `radius` can slide from (x0, y0) to (x1, y1) without touching an asteroid."""
+        dx, dy = x1 - x0, y1 - y0
+        length = math.hypot(dx, dy)
+        # Samples are half a cell apart, so an asteroid within `radius` of the segment
+        # is listed in a cell at most `pad` cells from some sample.
+        spacing = self.cell * 0.5
+        steps = max(1, int(length / spacing) + 1)
+        pad = max(0, int(math.ceil((radius + spacing / 2 - self.reach) / self.cell)))
+        cells = set()
+        for i in range(steps + 1):
+            t = i / steps
+            cx = self._clamp_x(x0 + dx * t)
+            cy = self._clamp_y(y0 + dy * t)
+            if pad == 0:
+                cells.add(cy * self.nx + cx)
+                continue
+            for ox in range(max(0, cx - pad), min(self.nx, cx + pad + 1)):
+                for oy in range(max(0, cy - pad), min(self.ny, cy + pad + 1)):
+                    cells.add(oy * self.nx + ox)
+        seen = set()
+        for idx in cells:
+            for a in self.near.get(idx, ()):
+                if a.id in seen:
+                    continue
+                seen.add(a.id)
+                if _segment_dist(a.x, a.y, x0, y0, dx, dy, length) < a.r + radius - 0.5:
+                    return False
+        return True
+
+    def slide(self, cell: int, x: float, y: float, hx: float, hy: float) -> Tuple[float, float]:
+        """Turn a heading that presses a unit at (x, y) into an asteroid along that asteroid's edge."""
+        for a in self.touch.get(cell, ()):
+            ox, oy = x - a.x, y - a.y
+            d = math.hypot(ox, oy)
+            if d == 0 or d > a.r + UNIT_RADIUS + 2.0:
+                continue
+            ox, oy = ox / d, oy / d
+            into = hx * ox + hy * oy
+            if into >= 0:
+                continue
+            tx, ty = hx - into * ox, hy - into * oy
+            t = math.hypot(tx, ty)
+            if t < 1e-6:    # head-on: go round either way
+                tx, ty, t = -oy, ox, 1.0
+            hx, hy = tx / t, ty / t
+        return hx, hy
+
+    def next_tick(self):
+        self.tick += 1
+
+    def field(self, goal: int) -> FlowField:
+        f = self.fields.get(goal)
+        if f is not None:
+            self.hits += 1
+            f.used = self.tick
+            self.fields.move_to_end(goal)
+            return f
+        self.misses += 1
+        f = FlowField(self, goal)
+        self.fields[goal] = f
+        # The cap is soft: rebuilding a field still in use every tick would cost far more than keeping it.
+        while len(self.fields) > self.cache_size:
+            oldest = next(iter(self.fields.values()))
+            if oldest.used == self.tick:
+                break
+            self.fields.popitem(last=False)
+        return f
+
+    def stats(self) -> dict:
+        return {"fields": len(self.fields), "hits": self.hits, "misses": self.misses}
+
+def _segment_dist(px: float, py: float, x0: float, y0: float, dx: float, dy: float, length: float) -> float:
+    if length == 0:
+        return math.hypot(px - x0, py - y0)
+    t = max(0.0, min(1.0, ((px - x0) * dx + (py - y0) * dy) / (length * length)))
+    return math.hypot(px - (x0 + dx * t), py - (y0 + dy * t))
+
+def nav_goal(state, etype: str, tx: Optional[float], ty: Optional[float]) -> Optional[int]:
+    """Goal cell for a unit of type `etype` given a target, or None (navigation off, no target, a station)."""
+    if state.nav is None or tx is None or ty is None or etype not in NAV_TYPES:
+        return None
+    return state.nav.cell_of(tx, ty)
+
+def steer(state, goal: int, x: float, y: float, nx: float, ny: float) -> Optional[Tuple[float, float]]:
+    """
+    Heading for a unit at (x, y) with nav goal `goal` whose target lies along (nx, ny);
+    None once it should drop the goal and fly straight.
+    """
+    grid = state.nav
+    cell = grid.cell_of(x, y)
+    heading = grid.field(goal).heading(cell)
+    if heading is None:
+        return None
+    if heading == (0.0, 0.0):
+        heading = (nx, ny)
+    if cell in grid.touch:
+        heading = grid.slide(cell, x, y, *heading)
+    return heading
@@ -0,0 +1,308 @@
+"""
+Command log recording (RECORD_FILE) and headless replay.
+
+A world's tick only changes through the commands apply_commands applies (joins
+included, as the internal JOIN command) and tick_entities, which is
+deterministic for a given store. So a log of the config, and of every applied
+command tagged with its tick, is enough to run the match again. Half-rate
+ticks (scheduler level 2+) also depend on the client viewports, so the log
+carries the view rects whenever they change. Every RECORD_HASH_EVERY ticks the
+log gets a hash of the world, which replay checks.
+
+File: HEADER (magic, version, meta length), JSON meta (config values, store,
+label), then records: HEAD (kind, tick, player id) and a kind-specific body.
+Records are only ever appended; a log cut short by a crash replays up to its
+last complete record.
+
+Replay runs every tick back to back with no sleeps, sockets or snapshots:
+
+    python3 -m rts.server.replay match.rtsrec [--store numpy] [--until TICK] [--no-verify]
+
+Hashes only compare between runs on the same kind of store (dict, or numpy
+and sharded); the stores differ in the last bits of some floats.
+"""
+import argparse
+import hashlib
+import json
+import struct
+import threading
+import time
+from dataclasses import astuple
+from typing import Dict, List, Optional, Tuple
+
+from .state import ServerState
+from . import config as cfg
+from .commands import JOIN, apply_cmd
+from .worldgen import generate_asteroids
+from .simulation import tick_entities
+from .soa import EntityStore, np, _FLOAT_COLS, _INT_COLS, _CODE_COLS
+
+MAGIC = b"RTSREC"
+VERSION = 1
+
+HEADER = struct.Struct("<6sHI")     # magic, version, meta length
+HEAD = struct.Struct("<BII")        # kind, tick, player id
+COUNT = struct.Struct("<I")
+MOVE = struct.Struct("<ddI")        # x, y, unit count; then the unit ids as int64
+MINE = struct.Struct("<qI")         # asteroid id, unit count; then the unit ids
+BUY = struct.Struct("<q")           # station id
+RECT = struct.Struct("<dddd")
+
+K_JOIN, K_MOVE, K_MINE, K_BUY, K_JSON, K_VIEWS, K_FULL_RATE, K_HASH, K_END = range(1, 10)
+COMMAND_KINDS = (K_JOIN, K_MOVE, K_MINE, K_BUY, K_JSON)
+
+_Record = Tuple[int, int, int, object]     # kind, tick, player id, decoded body
+
+def config_values() -> dict:
+    """Every config setting that JSON can carry."""
+    values = {}
+    for name, value in vars(cfg).items():
+        if not name.isupper():
+            continue
+        try:
+            json.dumps(value)
+        except (TypeError, ValueError):
+            continue
+        values[name] = value
+    return values
+
+def apply_config(values: dict):
+    for name, value in values.items():
+        if name.startswith("RECORD_"):
+            continue
+        if isinstance(getattr(cfg, name, None), tuple):
+            value = tuple(value)
+        setattr(cfg, name, value)
+
+def store_kind(state: ServerState) -> str:
+    return "numpy" if isinstance(state.entities, EntityStore) else "dict"
+
+def state_hash(state: ServerState) -> bytes:
+    """8-byte digest of every entity, in id order, and the credits."""
+    h = hashlib.blake2b(digest_size=8)
+    with state.world_lock:
+        ents = state.entities
+        if isinstance(ents, EntityStore):
+            order = np.argsort(ents.col("id"), kind="stable")
+            for name in _FLOAT_COLS + _INT_COLS + _CODE_COLS:
+                h.update(ents.col(name)[order].tobytes())
+        else:
+            for eid in sorted(ents):
+                h.update(repr(astuple(ents[eid])).encode())
+        h.update(repr(sorted(state.credits.items())).encode())
+    return h.digest()
+
+def encode_command(cmd: dict) -> Tuple[int, bytes]:
+    """Record kind and body for an applied command; JSON for anything the fixed layouts can't hold."""
+    t = cmd["type"]
+    try:
+        if t == JOIN:
+            return K_JOIN, b""
+        if t == "cmd_move":
+            ids = cmd["unit_ids"]
+            return K_MOVE, MOVE.pack(cmd["x"], cmd["y"], len(ids)) + struct.pack(f"<{len(ids)}q", *ids)
+        if t == "cmd_mine":
+            ids = cmd["unit_ids"]
+            return K_MINE, MINE.pack(cmd["asteroid_id"], len(ids)) + struct.pack(f"<{len(ids)}q", *ids)
+        if t == "cmd_buy_miner":
+            return K_BUY, BUY.pack(cmd["station_id"])
+    except struct.error:    # an id past int64
+        pass
+    blob = json.dumps(cmd, separators=(",", ":")).encode()
+    return K_JSON, COUNT.pack(len(blob)) + blob
+
+class Recorder:
+    """Appends one world's log. Written by the thread that ticks it; close() may come from another."""
+    def __init__(self, path: str, state: ServerState, label: str = ""):
+        self.path = path
+        self.lock = threading.Lock()
+        self.tick = 0
+        self.views = None
+        meta = {"config": config_values(), "store": store_kind(state), "label": label, "started": time.time()}
+        blob = json.dumps(meta, separators=(",", ":")).encode()
+        self.f = open(path, "wb")
+        self.f.write(HEADER.pack(MAGIC, VERSION, len(blob)) + blob)
+        print(f"[record] writing {path}")
+
+    def _write(self, kind: int, player_id: int = 0, body: bytes = b""):
+        with self.lock:
+            if self.f is not None:
+                self.f.write(HEAD.pack(kind, self.tick, player_id) + body)
+
+    def begin_tick(self, state: ServerState, tick: int):
+        """Before apply_commands: log the view rects when half-rate ticking starts, stops or they move."""
+        self.tick = tick
+        views = state.sched.views
+        if views != self.views:
+            if views is None:
+                self._write(K_FULL_RATE)
+            else:
+                self._write(K_VIEWS, 0, COUNT.pack(len(views)) + b"".join(RECT.pack(*r) for r in views))
+            self.views = views
+
+    def command(self, player_id: int, cmd: dict):
+        kind, body = encode_command(cmd)
+        self._write(kind, player_id, body)
+
+    def end_tick(self, state: ServerState, tick: int):
+        """After tick_entities: a state hash (and a flush) every RECORD_HASH_EVERY ticks."""
+        if cfg.RECORD_HASH_EVERY > 0 and tick % cfg.RECORD_HASH_EVERY == 0:
+            self._write(K_HASH, 0, state_hash(state))
+            with self.lock:
+                if self.f is not None:
+                    self.f.flush()
+
+    def close(self):
+        self._write(K_END)
+        with self.lock:
+            if self.f is not None:
+                self.f.close()
+                self.f = None
+
+def _ids(data: bytes, off: int, n: int) -> Tuple[List[int], int]:
+    end = off + 8 * n
+    return list(struct.unpack_from(f"<{n}q", data, off)), end
+
+def _decode(kind: int, data: bytes, off: int) -> Tuple[object, int]:
+    if kind == K_JOIN:
+        return {"type": JOIN}, off
+    if kind == K_MOVE:
+        x, y, n = MOVE.unpack_from(data, off)
+        ids, off = _ids(data, off + MOVE.size, n)
+        return {"type": "cmd_move", "unit_ids": ids, "x": x, "y": y}, off
+    if kind == K_MINE:
+        aid, n = MINE.unpack_from(data, off)
+        ids, off = _ids(data, off + MINE.size, n)
+        return {"type": "cmd_mine", "unit_ids": ids, "asteroid_id": aid}, off
+    if kind == K_BUY:
+        return {"type": "cmd_buy_miner", "station_id": BUY.unpack_from(data, off)[0]}, off + BUY.size
+    if kind == K_JSON:
+        size, = COUNT.unpack_from(data, off)
+        off += COUNT.size
+        if off + size > len(data):
+            raise struct.error("truncated")
+        return json.loads(data[off:off + size]), off + size
+    if kind == K_VIEWS:
+        n, = COUNT.unpack_from(data, off)
+        off += COUNT.size
+        rects = [RECT.unpack_from(data, off + i * RECT.size) for i in range(n)]
+        return rects, off + n * RECT.size
+    if kind == K_HASH:
+        if off + 8 > len(data):
+            raise struct.error("truncated")
+        return data[off:off + 8], off + 8
+    if kind in (K_FULL_RATE, K_END):
+        return None, off
+    raise ValueError(f"unknown record kind {kind}")
+
+def read_log(path: str) -> Tuple[dict, List[_Record]]:
+    with open(path, "rb") as f:
+        data = f.read()
+    magic, version, size = HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError(f"{path}: not a command log")
+    if version != VERSION:
+        raise ValueError(f"{path}: log version {version}, this build reads {VERSION}")
+    off = HEADER.size
+    meta = json.loads(data[off:off + size])
+    off += size
+
+    records: List[_Record] = []
+    while off < len(data):
+        try:
+            kind, tick, player_id = HEAD.unpack_from(data, off)
+            body, end = _decode(kind, data, off + HEAD.size)
+        except struct.error:
+            print(f"[replay] {path}: log ends mid-record at byte {off}, replaying what came before")
+            break
+        records.append((kind, tick, player_id, body))
+        off = end
+    return meta, records
+
+def replay(path: str, store: Optional[str] = None, verify: bool = True, until: Optional[int] = None) -> dict:
+    """Run a logged match headlessly at full speed. Returns timings and the hash check result."""
+    meta, records = read_log(path)
+    apply_config(meta["config"])
+    store = store or meta["store"]
+    if store != meta["store"] and verify:
+        print(f"[replay] recorded on the {meta['store']} store, replaying on {store}: not checking hashes")
+        verify = False
+
+    state = ServerState()
+    if store == "numpy":
+        state.entities = EntityStore()
+    generate_asteroids(state, cfg.MAP_SEED)
+
+    by_tick: Dict[int, List[_Record]] = {}
+    for rec in records:
+        by_tick.setdefault(rec[1], []).append(rec)
+    last = max(by_tick, default=0)
+    if until is not None:
+        last = min(last, until)
+
+    sched = state.sched
+    tick_s: List[float] = []
+    commands = checked = 0
+    mismatch = None
+    start = time.perf_counter()
+    for tick in range(1, last + 1):
+        sched.ticks = tick - 1      # half-rate parity, as in the recorded run
+        expect = None
+        for kind, _, player_id, body in by_tick.get(tick, ()):
+            if kind in COMMAND_KINDS:
+                apply_cmd(state, player_id, body)
+                commands += 1
+            elif kind == K_VIEWS:
+                sched.views = body
+            elif kind == K_FULL_RATE:
+                sched.views = None
+            elif kind == K_HASH:
+                expect = body
+        t0 = time.perf_counter()
+        tick_entities(state)
+        tick_s.append(time.perf_counter() - t0)
+        if verify and expect is not None:
+            checked += 1
+            got = state_hash(state)
+            if got != expect:
+                mismatch = {"tick": tick, "expected": expect.hex(), "got": got.hex()}
+                break
+    wall = time.perf_counter() - start
+
+    tick_s.sort()
+    ran = len(tick_s)
+    return {
+        "ticks": ran,
+        "commands": commands,
+        "entities": len(state.entities),
+        "store": store,
+        "wall_s": wall,
+        "ticks_per_s": ran / wall if wall > 0 else 0.0,
+        "tick_entities_per_s": ran / sum(tick_s) if ran and sum(tick_s) > 0 else 0.0,
+        "tick_ms_p50": tick_s[ran // 2] * 1000.0 if ran else 0.0,
+        "tick_ms_p99": tick_s[min(ran - 1, int(ran * 0.99))] * 1000.0 if ran else 0.0,
+        "hashes_checked": checked,
+        "mismatch": mismatch,
+    }
+
+def main():
+    ap = argparse.ArgumentParser(description="Replay a command log headlessly at full speed.")
+    ap.add_argument("log")
+    ap.add_argument("--store", choices=("dict", "numpy"), help="entity store (default: the recorded one)")
+    ap.add_argument("--until", type=int, help="stop after this tick")
+    ap.add_argument("--no-verify", action="store_true", help="skip the state hash checks")
+    args = ap.parse_args()
+
+    r = replay(args.log, args.store, not args.no_verify, args.until)
+    print(f"replayed {r['ticks']} ticks ({r['commands']} commands, {r['entities']} entities at the end, "
+          f"{r['store']} store) in {r['wall_s']:.2f}s")
+    print(f"  {r['ticks_per_s']:.0f} ticks/s overall, tick_entities {r['tick_entities_per_s']:.0f} ticks/s "
+          f"(p50 {r['tick_ms_p50']:.2f} ms, p99 {r['tick_ms_p99']:.2f} ms)")
+    if r["mismatch"]:
+        m = r["mismatch"]
+        print(f"  state hash MISMATCH at tick {m['tick']}: log {m['expected']}, replay {m['got']}")
+        raise SystemExit(1)
+    print(f"  {r['hashes_checked']} state hashes checked, all match")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Tick pacing and load shedding for one world (state.sched).
+
+Pacing: a tick that starts a full DT or more behind schedule runs straight
+away (catch-up), but only TICK_MAX_CATCHUP of them back to back, and never
+more than TICK_DRIFT_BUDGET behind: past either limit the missed ticks are
+dropped and the schedule moves up. A pause costs some game time instead of a
+burst of ticks and snapshots.
+
+Shedding (LOAD_SHED): the tick cost, smoothed, as a share of DT picks a level.
+Overloaded (above LOAD_SHED_HIGH) for LOAD_SHED_HOLD_S steps one level up;
+calm (below LOAD_SHED_LOW) for the recover hold steps one down. The recover
+hold doubles when a level is needed again soon after it was left, so a load
+right on the edge does not flap. Each level keeps what the one below it does:
+  1 snapshots    snapshots every LOAD_SNAP_FACTOR[level] * SNAP_EVERY_TICKS
+  2 half_rate    awake units outside every client's view (+ INTEREST_HALO)
+                 tick every other tick with a double step (idle and mining
+                 units are asleep anyway, activity.py)
+  3 shed_cmds    commands get CMD_SHED_BUDGET_MS, and each player's oldest
+                 move/mine orders are dropped down to CMD_SHED_MAX_PENDING
+                 waiting (joins and purchases are never dropped)
+"""
+import time
+from typing import List, Tuple
+
+from . import config as cfg
+
+LEVEL_NAMES = ("normal", "snapshots", "half_rate", "shed_cmds")
+
+class TickScheduler:
+    """Written by whichever thread ticks the world; the stats thread only reads report()."""
+    def __init__(self, label: str = ""):
+        self.label = label              # e.g. the match name, for log lines
+        self.next_time = time.perf_counter()
+        self.burst = 0                  # catch-up ticks run back to back
+        self.skipped = 0
+        self.unlogged = 0
+        self.logged_at = 0.0
+
+        self.level = 0
+        self.views = None               # this tick's visible_rects on half-rate ticks, else None
+        self.transitions = 0
+        self.ticks = 0
+        self.load = 0.0                 # smoothed tick cost / DT
+        self.held = 0                   # ticks the load has been past the threshold for the next step
+        self.recover_hold = cfg.LOAD_RECOVER_HOLD_S
+        self.left_at = -1               # tick the level last stepped down
+
+    def _tag(self) -> str:
+        return f" {self.label}" if self.label else ""
+
+    def start(self, now: float) -> float:
+        """A tick is starting at `now` (>= next_time): schedule the next one. Returns how late this one is."""
+        late = now - self.next_time
+        self.burst = self.burst + 1 if late >= cfg.DT else 0
+        if late > cfg.TICK_DRIFT_BUDGET or self.burst > cfg.TICK_MAX_CATCHUP:
+            dropped = int(late / cfg.DT)
+            self.next_time += dropped * cfg.DT
+            self.skipped += dropped
+            self.unlogged += dropped
+            self.burst = 0
+        if self.unlogged and now - self.logged_at >= 1.0:
+            print(f"[sched]{self._tag()} dropped {self.unlogged} ticks to stay on schedule")
+            self.unlogged = 0
+            self.logged_at = now
+        self.next_time += cfg.DT
+        return late
+
+    def finish(self, cost: float):
+        """A tick took `cost` seconds: update the load and maybe the level."""
+        self.ticks += 1
+        if not cfg.LOAD_SHED:
+            return
+        self.load += (cost / cfg.DT - self.load) * 0.1
+        hold_up = max(1, int(cfg.LOAD_SHED_HOLD_S * cfg.TICK_HZ))
+        hold_down = max(1, int(self.recover_hold * cfg.TICK_HZ))
+        if self.load > cfg.LOAD_SHED_HIGH and self.level < len(LEVEL_NAMES) - 1:
+            self.held = self.held + 1 if self.held > 0 else 1
+            if self.held >= hold_up:
+                if self.left_at >= 0 and self.ticks - self.left_at < 2 * hold_down:
+                    self.recover_hold = min(self.recover_hold * 2, 8 * cfg.LOAD_RECOVER_HOLD_S)
+                self._set_level(self.level + 1)
+        elif self.load < cfg.LOAD_SHED_LOW and self.level > 0:
+            self.held = self.held - 1 if self.held < 0 else -1
+            if -self.held >= hold_down:
+                self.left_at = self.ticks
+                self._set_level(self.level - 1)
+                if self.level == 0:
+                    self.recover_hold = cfg.LOAD_RECOVER_HOLD_S
+        else:
+            self.held = 0
+
+    def _set_level(self, level: int):
+        print(f"[load]{self._tag()} level {self.level} -> {level} ({LEVEL_NAMES[level]}), "
+              f"tick cost {self.load * 100:.0f}% of {cfg.DT * 1000:.1f} ms")
+        self.level = level
+        self.held = 0
+        self.transitions += 1
+
+    @property
+    def snap_every(self) -> int:
+        return cfg.SNAP_EVERY_TICKS * cfg.LOAD_SNAP_FACTOR[self.level]
+
+    @property
+    def half_rate(self) -> bool:
+        return self.level >= 2
+
+    @property
+    def shed_commands(self) -> bool:
+        return self.level >= 3
+
+    @property
+    def phase(self) -> int:
+        """0 or 1, alternating per tick: which id parity takes its double step this tick."""
+        return self.ticks & 1
+
+    def report(self) -> dict:
+        return {
+            "level": self.level,
+            "level_name": LEVEL_NAMES[self.level],
+            "load": round(self.load, 3),
+            "transitions": self.transitions,
+            "skipped_ticks": self.skipped,
+        }
+
+def visible_rects(state) -> List[Tuple[float, float, float, float]]:
+    """(x0, y0, x1, y1) of every client's reported viewport grown by INTEREST_HALO."""
+    halo = cfg.INTEREST_HALO
+    with state.clients_lock:
+        views = [info.viewport for info in state.clients.values() if info.viewport is not None]
+    return [(x - halo, y - halo, x + w + halo, y + h + halo) for x, y, w, h in views]
+
+def half_rate_step(e, views: list, phase: int) -> float:
+    """A dict-store entity's step on a half-rate tick: DT, 2 * DT on its turn, or 0 (skip)."""
+    background = e.tx is None or (bool(views) and not any(
+        x0 <= e.x <= x1 and y0 <= e.y <= y1 for x0, y0, x1, y1 in views))
+    if not background:
+        return cfg.DT
+    return 2 * cfg.DT if (e.id + phase) & 1 == 0 else 0.0
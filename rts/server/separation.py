@@ -0,0 +1,164 @@
+"""
+Unit-unit separation (SEPARATION_CELL > 0).
+
+Each entity type has a personal radius and a give (cfg.SEPARATION). Two units
+closer than the sum of their radii are pushed apart along the line between
+them: each yields its give times half the overlap per tick, or times all of it
+when the other unit gives nothing (a station). Pushes are gathered from the
+positions at the start of the pass and applied together, so the result does not
+depend on entity order; a pushed unit is then resolved against the asteroids.
+
+Only pairs with an awake unit (activity.py) are checked: a unit is pushed awake
+for the next tick, so two sleeping units were not pushing each other when the
+later one fell asleep, and neither has moved since.
+
+Neighbours come from a spatial hash of the awake units rebuilt every tick, and
+the sleeping units' RestingGrid kept across ticks. A unit whose personal
+diameter fits in a cell is listed in the cell its center is in; two such units
+can only touch if their cells are adjacent, so each awake cell is checked
+against itself and the four FORWARD neighbours, which finds every awake pair
+once, and the cells of whichever side is smaller, awake or resting, against
+the nine cells AROUND them on the other. Wider units (stations) are few: each
+scans the cells it can reach, and the others like it. Cost is O(awake units +
+their neighbours within a cell or so).
+
+This is the dict-store pass; soa.separate_rows is the vectorized one.
+"""
+import math
+from typing import Dict, List, Tuple
+
+from .state import ServerState
+from . import config as cfg
+from .worldgen import resolve_circle_vs_asteroids
+
+# Half of the 3x3 neighbourhood: checking these from every cell covers each adjacent pair of cells once.
+FORWARD = ((1, 0), (-1, 1), (0, 1), (1, 1))
+AROUND = tuple((ox, oy) for ox in (-1, 0, 1) for oy in (-1, 0, 1))
+
+# Angle step for units stacked on exactly the same point, so a pile fans out
+# instead of sliding along one line.
+GOLDEN_ANGLE = math.pi * (3.0 - math.sqrt(5.0))
+
+BODY_RADIUS = {"station": 95.0, "fighter": 10.0, "miner": 10.0}
+
+# (x, y, personal radius, give, id)
+_Item = Tuple[float, float, float, float, int]
+
+def stacked_direction(lo: int, hi: int) -> Tuple[float, float]:
+    """Direction from unit `lo` to unit `hi` (ids, lo < hi) when they share a point."""
+    ang = ((lo + hi) * GOLDEN_ANGLE) % (2.0 * math.pi)
+    return math.cos(ang), math.sin(ang)
+
+def _push_apart(a: _Item, b: _Item, push: Dict[int, List[float]]):
+    lo, hi = (a, b) if a[4] < b[4] else (b, a)
+    dx = hi[0] - lo[0]
+    dy = hi[1] - lo[1]
+    dist = math.hypot(dx, dy)
+    overlap = lo[2] + hi[2] - dist
+    if overlap <= 0:
+        return
+    if dist > 0:
+        nx, ny = dx / dist, dy / dist
+    else:
+        nx, ny = stacked_direction(lo[4], hi[4])
+    share_lo = overlap * lo[3] * (0.5 if hi[3] > 0 else 1.0)
+    share_hi = overlap * hi[3] * (0.5 if lo[3] > 0 else 1.0)
+    if share_lo > 0:
+        p = push.setdefault(lo[4], [0.0, 0.0])
+        p[0] -= nx * share_lo
+        p[1] -= ny * share_lo
+    if share_hi > 0:
+        p = push.setdefault(hi[4], [0.0, 0.0])
+        p[0] += nx * share_hi
+        p[1] += ny * share_hi
+
+def _check(a: _Item, others: List[_Item], push: Dict[int, List[float]]):
+    ax, ay, ar, ag, _ = a
+    for b in others:
+        dx = b[0] - ax
+        dy = b[1] - ay
+        lim = ar + b[2]
+        if dx * dx + dy * dy < lim * lim and (ag > 0 or b[3] > 0):
+            _push_apart(a, b, push)
+
+def _reach_cells(a: _Item, reach: float, cell: float):
+    for cx in range(int((a[0] - reach) // cell), int((a[0] + reach) // cell) + 1):
+        for cy in range(int((a[1] - reach) // cell), int((a[1] + reach) // cell) + 1):
+            yield cx, cy
+
+def separate(state: ServerState):
+    """One separation pass over a dict store; call with world_lock held."""
+    cell = float(cfg.SEPARATION_CELL)
+    if cell <= 0:
+        return
+    spec = cfg.SEPARATION
+    act = state.activity
+    resting = act.resting
+    if resting.cell != cell:
+        resting.rebuild(state.entities, act.awake, cell)
+
+    grid: Dict[Tuple[int, int], List[_Item]] = {}
+    wide: List[_Item] = []
+    for eid in sorted(act.awake):
+        e = state.entities.get(eid)
+        if e is None or e.hp <= 0 or e.type not in spec:
+            continue
+        r, give = spec[e.type]
+        item = (e.x, e.y, r, give, e.id)
+        if 2 * r <= cell:
+            grid.setdefault((int(e.x // cell), int(e.y // cell)), []).append(item)
+        else:
+            wide.append(item)
+    small_r = max([r for r, _ in spec.values() if 2 * r <= cell], default=0.0)
+
+    push: Dict[int, List[float]] = {}
+    rest = resting.cells
+    for (cx, cy), members in grid.items():
+        for i in range(len(members) - 1):
+            _check(members[i], members[i + 1:], push)
+        for ox, oy in FORWARD:
+            other = grid.get((cx + ox, cy + oy))
+            if other:
+                for a in members:
+                    _check(a, other, push)
+    # Awake with resting: the cells around whichever side has fewer.
+    if len(rest) < len(grid):
+        for (cx, cy), members in rest.items():
+            members = list(members.values())
+            for ox, oy in AROUND:
+                other = grid.get((cx + ox, cy + oy))
+                if other:
+                    for a in members:
+                        _check(a, other, push)
+    else:
+        for (cx, cy), members in grid.items():
+            for ox, oy in AROUND:
+                other = rest.get((cx + ox, cy + oy))
+                if other:
+                    other = list(other.values())
+                    for a in members:
+                        _check(a, other, push)
+
+    rest_wide = list(resting.wide.values())
+    for i, a in enumerate(wide):
+        _check(a, wide[i + 1:], push)
+        _check(a, rest_wide, push)
+        for key in _reach_cells(a, a[2] + small_r, cell):
+            other = grid.get(key)
+            if other:
+                _check(a, other, push)
+            other = rest.get(key)
+            if other:
+                _check(a, list(other.values()), push)
+    for a in rest_wide:
+        for key in _reach_cells(a, a[2] + small_r, cell):
+            other = grid.get(key)
+            if other:
+                _check(a, other, push)
+
+    for eid, (px, py) in push.items():
+        e = state.entities[eid]
+        e.x, e.y, _ = resolve_circle_vs_asteroids(state, e.x + px, e.y + py, BODY_RADIUS.get(e.type, 10.0))
+        e.x = max(0, min(cfg.MAP_W, e.x))
+        e.y = max(0, min(cfg.MAP_H, e.y))
+        act.nudge(state, eid)
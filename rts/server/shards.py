@@ -0,0 +1,297 @@
+"""
+Optional region-sharded tick (SHARD_WORKERS > 0, needs numpy).
+
+The map is cut into SHARD_WORKERS vertical strips, each ticked by its own worker
+process. ShardedStore is an EntityStore whose columns live in shared memory, so
+no entity is ever pickled: per tick the coordinator sends each worker the row
+count and gets back a handful of row numbers.
+
+Before each tick the coordinator stamps every row with the strip its x is in
+(the shared "region" column); a unit that crossed an edge last tick is thereby
+handed off to the neighbour. A worker runs the row-local part of the tick
+(soa.tick_rows) on its rows against its own copy of the asteroids a unit in
+the strip can reach this tick. Rows are disjoint between workers, so they
+write the shared columns without locking. Each worker also lists its live rows
+in its slot of the shared "frag" buffer: its snapshot fragment.
+
+The coordinator then does what needs the whole world (soa.finish_tick: miners
+reading their station, credits, the map clamp) and snapshot_dicts merges the
+fragments. State matches tick_entities_soa exactly; snapshots list entities by
+strip, then row. Workers tick only the rows the shared "awake" column marks
+(activity.py); on half-rate ticks (scheduler level 2+) the coordinator also
+fills the shared "step" column and workers skip the rows without a step.
+"""
+import atexit
+import math
+import multiprocessing
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+
+from .state import ServerState, Asteroid
+from . import config as cfg
+from .worldgen import build_asteroid_grid, build_nav_grid
+from .soa import EntityStore, np, tick_rows, finish_tick, half_rate_steps, RADII, SPEEDS, _AsteroidTable, _FLOAT_COLS, _INT_COLS, _CODE_COLS
+
+_DTYPES = {name: "float64" for name in _FLOAT_COLS}
+_DTYPES.update({name: "int64" for name in _INT_COLS})
+_DTYPES.update({name: "int8" for name in _CODE_COLS})
+_DTYPES["region"] = "int8"      # strip that ticks the row, -1 when new
+_DTYPES["step"] = "float64"     # per-row step on half-rate ticks, 0 = skipped this tick
+_DTYPES["awake"] = "bool"       # activity.py: rows that tick at all
+
+class ShardedStore(EntityStore):
+    """EntityStore with its columns, and the fragment buffer, in shared memory."""
+    def __init__(self, capacity: int = 16384):
+        if np is None:
+            raise RuntimeError("SHARD_WORKERS requires numpy (pip install numpy)")
+        self.n = 0
+        self.rows: Dict[int, int] = {}
+        self._ast_table = None
+        self.cols: Dict[str, "np.ndarray"] = {}
+        self.blocks: Dict[str, shared_memory.SharedMemory] = {}
+        self.retired: List[shared_memory.SharedMemory] = []  # still mapped somewhere
+        self.generation = 0     # bumped whenever the blocks are replaced
+        self.slots = 1          # fragment slots (one per worker), each `capacity` rows
+        self.frag = None
+        self.frag_counts: Optional[List[int]] = None  # rows per slot; None when stale
+        self.pool: Optional["ShardPool"] = None
+        self._alloc(capacity)
+        # A normal shutdown calls close(); this covers SIGTERM and a dead sim thread,
+        # which would otherwise leave the blocks in /dev/shm.
+        atexit.register(self.unlink)
+
+    def _alloc(self, capacity: int):
+        old = self.blocks
+        self.blocks = {}
+        cols = {}
+        for name, dtype in _DTYPES.items():
+            arr = self._block(name, capacity, dtype)
+            arr[:] = -1 if name == "region" else 0
+            if name in self.cols:
+                arr[:self.n] = self.cols[name][:self.n]
+            cols[name] = arr
+        self.cols = cols
+        self.frag = self._block("frag", capacity * self.slots, "int64")
+        self.frag_counts = None
+        for shm in old.values():
+            _unlink(shm)
+            self.retired.append(shm)
+        self._release_retired()
+        self.generation += 1
+
+    def _block(self, name: str, length: int, dtype: str) -> "np.ndarray":
+        shm = shared_memory.SharedMemory(create=True, size=max(1, length * np.dtype(dtype).itemsize))
+        self.blocks[name] = shm
+        return np.ndarray((length,), dtype=dtype, buffer=shm.buf)
+
+    def _release_retired(self):
+        keep = []
+        for shm in self.retired:
+            try:
+                shm.close()
+            except BufferError:     # an array still points into it
+                keep.append(shm)
+        self.retired = keep
+
+    def _grow(self):
+        self._alloc(max(16, len(self.cols["x"]) * 2))
+
+    def start(self, asteroids: Dict[int, Asteroid], workers: int):
+        """Size the fragment buffer for `workers` strips and start their processes."""
+        self.slots = workers
+        self._alloc(len(self.cols["x"]))
+        self.pool = ShardPool(self, list(asteroids.values()), workers)
+
+    def __setitem__(self, eid: int, e):
+        new = eid not in self.rows
+        super().__setitem__(eid, e)
+        if new:
+            self.cols["region"][self.rows[eid]] = -1
+            self.frag_counts = None
+
+    def __delitem__(self, eid: int):
+        super().__delitem__(eid)
+        self.frag_counts = None
+
+    def load(self, cols: Dict[str, "np.ndarray"], n: int):
+        super().load(cols, n)
+        self.cols["region"][:n] = -1
+        self.frag_counts = None
+
+    def snapshot_dicts(self) -> List[dict]:
+        """Records from the last tick's fragments; the plain row scan if anything was added or removed since."""
+        counts = self.frag_counts
+        if counts is None:
+            return super().snapshot_dicts()
+        cap = len(self.cols["x"])
+        rows = np.concatenate([self.frag[i * cap:i * cap + c] for i, c in enumerate(counts)])
+        rows = rows[self.cols["hp"][rows] > 0]
+        view = EntityStore.__new__(EntityStore)
+        view.n = len(rows)
+        view.cols = {name: arr[rows] for name, arr in self.cols.items()}
+        return EntityStore.snapshot_dicts(view)
+
+    def unlink(self):
+        """Remove the blocks from /dev/shm; mappings stay valid until closed. Safe to repeat."""
+        for shm in self.blocks.values():
+            _unlink(shm)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
+        self.n = 0
+        self.rows = {}
+        self.cols = {}
+        self.frag = None
+        self.unlink()
+        self.retired.extend(self.blocks.values())
+        self.blocks = {}
+        self._release_retired()
+
+def _unlink(shm: shared_memory.SharedMemory):
+    try:
+        shm.unlink()
+    except FileNotFoundError:
+        pass
+
+def strips(workers: int) -> List[Tuple[float, float]]:
+    """x range per worker; the outer strips are open-ended so clamped units still belong somewhere."""
+    w = cfg.MAP_W / workers
+    return [(-math.inf if i == 0 else i * w, math.inf if i == workers - 1 else (i + 1) * w)
+            for i in range(workers)]
+
+def local_asteroids(asteroids: List[Asteroid], x0: float, x1: float) -> List[Asteroid]:
+    """
+    The asteroids a unit starting in [x0, x1) can touch this tick, in their original
+    order (push-out resolves in scan order). Margin: a step, then a chain of pushes.
+    """
+    margin = 2 * (max(RADII) + cfg.AST_MAX_R) + max(SPEEDS) * cfg.DT + 6.0
+    return [a for a in asteroids if a.x + a.r >= x0 - margin and a.x - a.r <= x1 + margin]
+
+class ShardPool:
+    """One worker process per strip, driven over pipes."""
+    def __init__(self, store: ShardedStore, asteroids: List[Asteroid], workers: int):
+        ctx = multiprocessing.get_context("spawn")
+        self.store = store
+        self.regions = strips(workers)
+        self.conns = []
+        self.procs = []
+        self.edges = np.array([x1 for _, x1 in self.regions[:-1]])
+        self.handoffs = 0
+        self.sent_generation = -1
+        settings = {k: getattr(cfg, k) for k in ("DT", "MAP_W", "MAP_H", "MINING_TIME", "ASTEROID_GRID_CELL",
+                                                 "NAV_CELL", "NAV_CLEARANCE", "NAV_CACHE_FIELDS")}
+        everything = [(a.id, a.x, a.y, a.r) for a in asteroids]
+        for i, (x0, x1) in enumerate(self.regions):
+            subset = [(a.id, a.x, a.y, a.r) for a in local_asteroids(asteroids, x0, x1)]
+            parent, child = ctx.Pipe()
+            p = ctx.Process(target=_worker, args=(child, i, subset, everything, settings),
+                            name=f"shard-{i}", daemon=True)
+            p.start()
+            child.close()
+            self.conns.append(parent)
+            self.procs.append(p)
+
+    def tick(self, half_rate: bool = False) -> Tuple["np.ndarray", "np.ndarray"]:
+        """Tick every strip, by the "step" column if half_rate; returns the done-mining and home rows in row order."""
+        s = self.store
+        blocks = None
+        if self.sent_generation != s.generation:
+            blocks = {name: shm.name for name, shm in s.blocks.items()}
+            self.sent_generation = s.generation
+        region = s.col("region")
+        strip = np.searchsorted(self.edges, s.col("x"), side="right")
+        self.handoffs += int(np.count_nonzero((region >= 0) & (region != strip)))
+        region[:] = strip
+
+        msg = (s.n, len(s.cols["x"]), blocks, half_rate)
+        done, home, counts = [], [], []
+        try:
+            for conn in self.conns:
+                conn.send(msg)
+            for conn in self.conns:
+                d, h, count = conn.recv()
+                done.append(d)
+                home.append(h)
+                counts.append(count)
+        except (OSError, EOFError) as e:
+            # a worker died and nothing can tick this world any more; the columns
+            # stay mapped for readers until stop_world closes the store
+            print(f"[shards] worker failed ({e!r}), unlinking shared memory")
+            self.close()
+            s.pool = None
+            s.unlink()
+            raise
+        s.frag_counts = counts
+        return np.sort(np.concatenate(done)), np.sort(np.concatenate(home))
+
+    def close(self):
+        for conn in self.conns:
+            try:
+                conn.send(None)
+            except OSError:
+                pass
+        for p in self.procs:
+            p.join(timeout=2.0)
+            if p.is_alive():
+                p.terminate()
+        self.conns = []
+        self.procs = []
+
+def tick_entities_sharded(state: ServerState):
+    """tick_entities for a ShardedStore with a running pool."""
+    with state.world_lock:
+        s: ShardedStore = state.entities
+        if s.n == 0:
+            return
+        state.activity.begin_tick(state)
+        half = state.sched.views is not None
+        if half:
+            s.col("step")[:] = half_rate_steps(s.cols, s.n, state.sched.views, state.sched.phase)
+        done_mining, home = s.pool.tick(half)
+        finish_tick(state, s, done_mining, home)
+
+def _worker(conn, index: int, asteroids: list, everything: list, settings: dict):
+    for k, v in settings.items():
+        setattr(cfg, k, v)
+    local = ServerState()
+    local.asteroids = {aid: Asteroid(aid, x, y, r) for aid, x, y, r in asteroids}
+    build_asteroid_grid(local)
+    # Flow fields route across the whole map, so the nav grid needs every asteroid.
+    local.nav = build_nav_grid([Asteroid(aid, x, y, r) for aid, x, y, r in everything])
+    cell = cfg.ASTEROID_GRID_CELL if cfg.ASTEROID_GRID_CELL > 0 else 512
+    table = _AsteroidTable(local, cell) if local.asteroids else None
+
+    blocks: List[shared_memory.SharedMemory] = []
+    cols: Dict[str, "np.ndarray"] = {}
+    frag = None
+    while True:
+        msg = conn.recv()
+        if msg is None:
+            break
+        n, capacity, names, half = msg
+        if names is not None:
+            cols, frag = {}, None
+            for shm in blocks:
+                shm.close()
+            blocks = []
+            for name, shm_name in names.items():
+                shm = shared_memory.SharedMemory(name=shm_name)
+                blocks.append(shm)
+                if name == "frag":
+                    frag = np.ndarray((shm.size // 8,), dtype=np.int64, buffer=shm.buf)
+                else:
+                    cols[name] = np.ndarray((capacity,), dtype=_DTYPES[name], buffer=shm.buf)
+
+        mine = cols["region"][:n] == index
+        awake = mine & cols["awake"][:n]
+        if half:
+            step = cols["step"][:n]
+            done, home = tick_rows(local, cols, n, table, awake & (step > 0), step)
+        else:
+            done, home = tick_rows(local, cols, n, table, awake)
+
+        rows = np.flatnonzero(mine & (cols["hp"][:n] > 0))
+        frag[index * capacity:index * capacity + len(rows)] = rows
+        conn.send((done, home, len(rows)))
@@ -5,10 +5,16 @@ from .state import ServerState, Entity
 from . import config as cfg
 from .commands import apply_commands
 from .worldgen import resolve_circle_vs_asteroids
-from .snapshots import build_snapshot
-from .netserver import broadcast
-
-def move_toward(e: Entity, speed: float):
+from .pathing import nav_goal, steer
+from .separation import separate
+from .scheduler import visible_rects, half_rate_step
+from .snapshots import build_snapshot, publish_frame
+from .soa import EntityStore, tick_entities_soa
+from .shards import ShardedStore, tick_entities_sharded
+from .netserver import broadcast_snapshot
+
+def move_toward(e: Entity, speed: float, state: ServerState = None, dt: float = None):
+    """Step towards (tx, ty); along the flow field while the unit has a nav goal. dt: half-rate step."""
     if e.tx is None or e.ty is None:
         return
 
@@ -16,40 +22,65 @@ def move_toward(e: Entity, speed: float):
     dy = e.ty - e.y
     dist = math.hypot(dx, dy)
 
-    if dist < 6.0:
+    if dist < (6.0 if dt is None else 6.0 / cfg.DT * dt):
         e.x = e.tx
         e.y = e.ty
         e.tx = None
         e.ty = None
         e.vx = 0.0
         e.vy = 0.0
+        e.nav_goal = None
         return
 
     nx = dx / dist
     ny = dy / dist
+    if e.nav_goal is not None:
+        heading = steer(state, e.nav_goal, e.x, e.y, nx, ny)
+        if heading is None:
+            e.nav_goal = None
+        else:
+            nx, ny = heading
 
     e.vx = nx * speed
     e.vy = ny * speed
-    e.x += e.vx * cfg.DT
-    e.y += e.vy * cfg.DT
+    e.x += e.vx * (cfg.DT if dt is None else dt)
+    e.y += e.vy * (cfg.DT if dt is None else dt)
 
     e.angle = math.atan2(nx, -ny)
 
 def tick_entities(state: ServerState):
+    if isinstance(state.entities, ShardedStore) and state.entities.pool is not None:
+        tick_entities_sharded(state)
+        return
+    if isinstance(state.entities, EntityStore):
+        tick_entities_soa(state)
+        return
+
     with state.world_lock:
-        for e in state.entities.values():
-            if e.hp <= 0:
+        act = state.activity
+        act.begin_tick(state)
+        if state.nav is not None:
+            state.nav.next_tick()
+        views = state.sched.views
+        for eid in sorted(act.awake):
+            e = state.entities.get(eid)
+            if e is None or e.hp <= 0:
                 continue
+            dt = None
+            if views is not None:
+                dt = half_rate_step(e, views, state.sched.phase)
+                if dt == 0.0:
+                    continue
 
             if e.type == "fighter":
-                move_toward(e, speed=260.0)
+                move_toward(e, speed=260.0, state=state, dt=dt)
                 e.x, e.y, hit = resolve_circle_vs_asteroids(state, e.x, e.y, radius=10.0)
-                if hit:
+                if hit and e.nav_goal is None:
                     e.tx = None
                     e.ty = None
 
             elif e.type == "station":
-                move_toward(e, speed=60.0)
+                move_toward(e, speed=60.0, dt=dt)
                 e.x, e.y, hit = resolve_circle_vs_asteroids(state, e.x, e.y, radius=95.0)
                 if hit:
                     e.tx = None
@@ -57,9 +88,9 @@ def tick_entities(state: ServerState):
 
             elif e.type == "miner":
                 if e.miner_state == "to_asteroid":
-                    move_toward(e, speed=180.0)
+                    move_toward(e, speed=180.0, state=state, dt=dt)
                     e.x, e.y, hit = resolve_circle_vs_asteroids(state, e.x, e.y, radius=10.0)
-                    if hit:
+                    if hit and e.nav_goal is None:
                         e.tx = None
                         e.ty = None
                     if e.tx is None and e.ty is None:
@@ -67,9 +98,7 @@ def tick_entities(state: ServerState):
                         e.mine_timer = cfg.MINING_TIME
 
                 elif e.miner_state == "mining":
-                    e.mine_timer -= cfg.DT
-                    e.angle += 0.6 * cfg.DT
-                    if e.mine_timer <= 0:
+                    if e.mine_timer <= 0:      # woken by the timer wheel
                         e.cargo = cfg.MINING_REWARD
                         e.miner_state = "returning"
 
@@ -77,17 +106,19 @@ def tick_entities(state: ServerState):
                         if st and st.type == "station":
                             e.tx = st.x
                             e.ty = st.y - 110.0
+                            e.nav_goal = nav_goal(state, e.type, e.tx, e.ty)
                         else:
                             e.miner_state = "idle"
                             e.mine_asteroid_id = None
                             e.cargo = 0
                             e.tx = None
                             e.ty = None
+                            e.nav_goal = None
 
                 elif e.miner_state == "returning":
-                    move_toward(e, speed=180.0)
+                    move_toward(e, speed=180.0, state=state, dt=dt)
                     e.x, e.y, hit = resolve_circle_vs_asteroids(state, e.x, e.y, radius=10.0)
-                    if hit:
+                    if hit and e.nav_goal is None:
                         e.tx = None
                         e.ty = None
 
@@ -109,36 +140,68 @@ def tick_entities(state: ServerState):
                             land_y = a.y + ny * (a.r + 10.0)
                             e.tx = land_x
                             e.ty = land_y
+                            e.nav_goal = nav_goal(state, e.type, a.x, a.y)
                             e.miner_state = "to_asteroid"
                             e.mine_timer = 0.0
                         else:
                             e.miner_state = "idle"
 
                 else:
-                    move_toward(e, speed=180.0)
+                    move_toward(e, speed=180.0, state=state, dt=dt)
                     e.x, e.y, hit = resolve_circle_vs_asteroids(state, e.x, e.y, radius=10.0)
-                    if hit:
+                    if hit and e.nav_goal is None:
                         e.tx = None
                         e.ty = None
 
             e.x = max(0, min(cfg.MAP_W, e.x))
             e.y = max(0, min(cfg.MAP_H, e.y))
 
-def sim_loop(state: ServerState):
-    tick = 0
-    next_time = time.perf_counter()
+        act.settle(state)
+        separate(state)
+
+def run_tick(state: ServerState, tick: int, late: float):
+    """
+    Advance the world to `tick` and send its snapshot. late is how far behind
+    schedule the tick started; both go to state.metrics with the phase timings.
+    """
+    t0 = time.perf_counter()
+    sched = state.sched
+    sched.views = visible_rects(state) if sched.half_rate else None
+    if state.recorder is not None:
+        state.recorder.begin_tick(state, tick)
+    apply_commands(state)
+    t1 = time.perf_counter()
+    tick_entities(state)
+    t2 = time.perf_counter()
+    if state.recorder is not None:
+        state.recorder.end_tick(state, tick)
+    if state.checkpointer is not None:
+        state.checkpointer.maybe_capture(state, tick)
+    publish_frame(state, tick)
+    t3 = t4 = t5 = time.perf_counter()
+
+    if tick % sched.snap_every == 0:
+        snap = build_snapshot(state, tick)
+        t4 = time.perf_counter()
+        broadcast_snapshot(state, snap)
+        t5 = time.perf_counter()
+
+    state.metrics.record_tick(late, (t0, t1, t2, t3, t4, t5))
+    sched.finish(t5 - t0)
+
+def sim_loop(state: ServerState, tick: int = 0):
+    """
+    Tick at TICK_HZ from tick + 1 (a restored checkpoint's tick); state.sched caps
+    catch-up after a stall and picks the load-shedding level.
+    """
+    sched = state.sched
+    sched.next_time = time.perf_counter()
 
     while state.running:
         now = time.perf_counter()
-        if now < next_time:
-            time.sleep(max(0.0, next_time - now))
+        if now < sched.next_time:
+            time.sleep(max(0.0, sched.next_time - now))
             continue
 
-        apply_commands(state)
-        tick_entities(state)
         tick += 1
-
-        if tick % cfg.SNAP_EVERY_TICKS == 0:
-            broadcast(state, build_snapshot(state, tick))
-
-        next_time += cfg.DT
+        run_tick(state, tick, sched.start(now))
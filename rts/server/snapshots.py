@@ -1,35 +1,133 @@
-from .state import ServerState
+from typing import Dict, List, Tuple
 
-def build_map_init(state: ServerState, player_id: int) -> dict:
+from .state import ServerState, WorldFrame
+from .spatial import PointGrid
+from .soa import EntityStore
+
+def build_map_init(state: ServerState, player_id: int, asteroids: bool = True) -> dict:
+    """asteroids=False leaves the list empty, for a client that has the map cached."""
     from . import config as cfg
-    with state.world_lock:
-        ast_list = [{"id": a.id, "x": a.x, "y": a.y, "r": a.r} for a in state.asteroids.values()]
+    ast_list = []
+    if asteroids:
+        frame = state.frame
+        if frame is not None:
+            asts = frame.asteroids
+        else:
+            with state.world_lock:
+                asts = tuple(state.asteroids.values())
+        ast_list = [{"id": a.id, "x": a.x, "y": a.y, "r": a.r} for a in asts]
     return {
         "type": "map_init",
         "player_id": player_id,
         "map_w": cfg.MAP_W,
         "map_h": cfg.MAP_H,
         "map_seed": cfg.MAP_SEED,
+        "map_hash": state.map_hash,
         "asteroids": ast_list,
     }
 
+def publish_frame(state: ServerState, tick: int):
+    """
+    Sim thread only, after the tick: copy the world into a new WorldFrame and swap it
+    in. No lock needed since the sim thread is the only writer.
+    """
+    if isinstance(state.entities, EntityStore):
+        ents = tuple(state.entities.snapshot_dicts())
+    else:
+        ents = tuple([entity_record(e) for e in state.entities.values() if e.hp > 0])
+    state.frame = WorldFrame(tick, ents, dict(state.credits), tuple(state.asteroids.values()))
+
 def build_snapshot(state: ServerState, tick: int) -> dict:
+    """Snapshot from the published frame; falls back to the live world under world_lock."""
+    frame = state.frame
+    if frame is not None and frame.tick == tick:
+        return {"type": "snapshot", "tick": tick, "entities": list(frame.entities), "credits": dict(frame.credits)}
+
     with state.world_lock:
-        ents = []
-        for e in state.entities.values():
-            if e.hp <= 0:
-                continue
-            ents.append({
-                "id": e.id,
-                "type": e.type,
-                "owner": e.owner,
-                "x": e.x,
-                "y": e.y,
-                "angle": e.angle,
-                "hp": e.hp,
-                "hp_max": e.hp_max,
-                "miner_state": e.miner_state if e.type == "miner" else None,
-                "mine_asteroid_id": e.mine_asteroid_id if e.type == "miner" else None,
-            })
+        if isinstance(state.entities, EntityStore):
+            ents = state.entities.snapshot_dicts()
+        else:
+            ents = [entity_record(e) for e in state.entities.values() if e.hp > 0]
         credits = dict(state.credits)
     return {"type": "snapshot", "tick": tick, "entities": ents, "credits": credits}
+
+def entity_record(e) -> dict:
+    return {
+        "id": e.id,
+        "type": e.type,
+        "owner": e.owner,
+        "x": e.x,
+        "y": e.y,
+        "angle": e.angle,
+        "hp": e.hp,
+        "hp_max": e.hp_max,
+        "miner_state": e.miner_state if e.type == "miner" else None,
+        "mine_asteroid_id": e.mine_asteroid_id if e.type == "miner" else None,
+    }
+
+def build_snapshot_delta(snap: dict, base_tick: int, base: Dict[int, dict], cur: Dict[int, dict]) -> dict:
+    """
+    Changes from the base snapshot to snap. Changed entities carry only their id and
+    the fields that differ; created entities are sent in full.
+    """
+    created = []
+    changed = []
+    for eid, rec in cur.items():
+        old = base.get(eid)
+        if old is None:
+            created.append(rec)
+        elif old != rec:
+            diff = {k: v for k, v in rec.items() if old.get(k) != v}
+            diff["id"] = eid
+            changed.append(diff)
+    removed = [eid for eid in base if eid not in cur]
+    return {
+        "type": "snapshot_delta",
+        "tick": snap["tick"],
+        "base": base_tick,
+        "created": created,
+        "changed": changed,
+        "removed": removed,
+        "credits": snap["credits"],
+    }
+
+def build_entity_grid(ents: List[dict]) -> Tuple[PointGrid, Dict[int, List[dict]]]:
+    """Bucket snapshot records for viewport queries; also each owner's stations."""
+    from . import config as cfg
+    grid = PointGrid(cfg.INTEREST_CELL)
+    stations: Dict[int, List[dict]] = {}
+    for rec in ents:
+        grid.insert(rec["x"], rec["y"], rec)
+        if rec["type"] == "station":
+            stations.setdefault(rec["owner"], []).append(rec)
+    return grid, stations
+
+def build_interest_view(grid: PointGrid, stations: Dict[int, List[dict]], player_id: int,
+                        viewport: Tuple[float, float, float, float]) -> Dict[int, dict]:
+    """
+    Records a client gets in full: everything in its viewport plus INTEREST_HALO,
+    and its own stations wherever they are (the HUD needs them off-screen too).
+    """
+    from . import config as cfg
+    vx, vy, vw, vh = viewport
+    halo = cfg.INTEREST_HALO
+    x0 = max(0.0, vx - halo)
+    y0 = max(0.0, vy - halo)
+    x1 = min(float(cfg.MAP_W), vx + vw + halo)
+    y1 = min(float(cfg.MAP_H), vy + vh + halo)
+
+    view = {rec["id"]: rec for rec in grid.query_rect(x0, y0, x1, y1)}
+    for rec in stations.get(player_id, ()):
+        view[rec["id"]] = rec
+    return view
+
+def summary_rows(snap: dict) -> List[list]:
+    return [[e["id"], e["owner"], e["x"], e["y"]] for e in snap["entities"]]
+
+def build_summary(snap: dict, rows: List[list], view: Dict[int, dict]) -> dict:
+    """Minimap rows for the entities the client isn't getting in full (not in view)."""
+    return {
+        "type": "snapshot_summary",
+        "tick": snap["tick"],
+        "entities": [r for r in rows if r[0] not in view],
+    }
@@ -0,0 +1,659 @@
+"""
+Optional structure-of-arrays entity store (needs numpy).
+
+EntityStore keeps every entity field in a NumPy column with an id -> row map, and
+behaves like the Dict[int, Entity] it replaces: command handlers and snapshot
+building read and write through EntityView accessors. tick_entities_soa moves all
+units in one batch and advances miner timers in bulk; per-entity Python only runs
+for the few rows that change miner state or touch an asteroid this tick.
+"""
+import math
+from typing import Dict, Iterator, List, Optional
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency
+    np = None
+
+from .state import ServerState, Entity
+from .worldgen import resolve_circle_vs_asteroids
+from .pathing import nav_goal
+from .separation import FORWARD, AROUND, stacked_direction
+from . import config as cfg
+
+TYPE_CODES = {"station": 0, "fighter": 1, "miner": 2}
+TYPE_NAMES = {v: k for k, v in TYPE_CODES.items()}
+
+MINER_STATE_CODES = {"idle": 0, "to_asteroid": 1, "mining": 2, "returning": 3}
+MINER_STATE_NAMES = {v: k for k, v in MINER_STATE_CODES.items()}
+
+T_STATION, T_FIGHTER, T_MINER = 0, 1, 2
+M_IDLE, M_TO_ASTEROID, M_MINING, M_RETURNING = 0, 1, 2, 3
+
+# Indexed by type code.
+SPEEDS = (60.0, 260.0, 180.0)
+RADII = (95.0, 10.0, 10.0)
+
+NO_ID = -1
+
+_FLOAT_COLS = ("x", "y", "vx", "vy", "angle", "hp", "hp_max", "tx", "ty", "mine_timer")
+_INT_COLS = ("id", "owner", "cargo", "mine_asteroid_id", "home_station_id", "nav_goal")
+_CODE_COLS = ("type", "miner_state")
+
+class EntityView:
+    """Attribute access to one row of an EntityStore, shaped like Entity."""
+    __slots__ = ("_store", "_id")
+
+    def __init__(self, store: "EntityStore", eid: int):
+        self._store = store
+        self._id = eid
+
+    def _row(self) -> int:
+        return self._store.rows[self._id]
+
+def _float_prop(name: str):
+    def get(v: EntityView):
+        return float(v._store.cols[name][v._row()])
+    def set_(v: EntityView, value):
+        v._store.cols[name][v._row()] = value
+    return property(get, set_)
+
+def _opt_float_prop(name: str):
+    def get(v: EntityView):
+        val = v._store.cols[name][v._row()]
+        return None if math.isnan(val) else float(val)
+    def set_(v: EntityView, value):
+        v._store.cols[name][v._row()] = math.nan if value is None else value
+    return property(get, set_)
+
+def _int_prop(name: str):
+    def get(v: EntityView):
+        return int(v._store.cols[name][v._row()])
+    def set_(v: EntityView, value):
+        v._store.cols[name][v._row()] = value
+    return property(get, set_)
+
+def _opt_int_prop(name: str):
+    def get(v: EntityView):
+        val = int(v._store.cols[name][v._row()])
+        return None if val == NO_ID else val
+    def set_(v: EntityView, value):
+        v._store.cols[name][v._row()] = NO_ID if value is None else value
+    return property(get, set_)
+
+def _code_prop(name: str, codes: Dict[str, int], names: Dict[int, str]):
+    def get(v: EntityView):
+        return names[int(v._store.cols[name][v._row()])]
+    def set_(v: EntityView, value):
+        v._store.cols[name][v._row()] = codes[value]
+    return property(get, set_)
+
+for _n in ("x", "y", "vx", "vy", "angle", "hp", "hp_max", "mine_timer"):
+    setattr(EntityView, _n, _float_prop(_n))
+for _n in ("tx", "ty"):
+    setattr(EntityView, _n, _opt_float_prop(_n))
+for _n in ("owner", "cargo"):
+    setattr(EntityView, _n, _int_prop(_n))
+for _n in ("mine_asteroid_id", "home_station_id", "nav_goal"):
+    setattr(EntityView, _n, _opt_int_prop(_n))
+EntityView.id = property(lambda v: v._id)
+EntityView.type = _code_prop("type", TYPE_CODES, TYPE_NAMES)
+EntityView.miner_state = _code_prop("miner_state", MINER_STATE_CODES, MINER_STATE_NAMES)
+
+class EntityStore:
+    """
+    Columnar replacement for ServerState.entities. Rows [0, n) are live; removal
+    swaps the last row into the hole so columns stay dense. Iteration order is
+    row order, which is insertion order until something is removed.
+    """
+    def __init__(self, capacity: int = 1024):
+        if np is None:
+            raise RuntimeError("ENTITY_STORE='numpy' requires numpy (pip install numpy)")
+        self.n = 0
+        self.rows: Dict[int, int] = {}  # entity id -> row
+        self._ast_table = None  # (key, _AsteroidTable), built on first tick
+        self.cols: Dict[str, "np.ndarray"] = {}
+        for name in _FLOAT_COLS:
+            self.cols[name] = np.zeros(capacity, dtype=np.float64)
+        for name in _INT_COLS:
+            self.cols[name] = np.zeros(capacity, dtype=np.int64)
+        for name in _CODE_COLS:
+            self.cols[name] = np.zeros(capacity, dtype=np.int8)
+        self.cols["awake"] = np.zeros(capacity, dtype=bool)    # activity.py; not saved in checkpoints
+
+    def col(self, name: str) -> "np.ndarray":
+        """View of the live part of a column."""
+        return self.cols[name][:self.n]
+
+    def _grow(self):
+        cap = max(16, len(self.cols["x"]) * 2)
+        for name, arr in self.cols.items():
+            bigger = np.zeros(cap, dtype=arr.dtype)
+            bigger[:self.n] = arr[:self.n]
+            self.cols[name] = bigger
+
+    # --- mapping interface (what Dict[int, Entity] callers use) ---
+
+    def __len__(self) -> int:
+        return self.n
+
+    def __contains__(self, eid) -> bool:
+        return eid in self.rows
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.keys())
+
+    def __getitem__(self, eid: int) -> EntityView:
+        if eid not in self.rows:
+            raise KeyError(eid)
+        return EntityView(self, eid)
+
+    def get(self, eid: int, default=None) -> Optional[EntityView]:
+        if eid not in self.rows:
+            return default
+        return EntityView(self, eid)
+
+    def __setitem__(self, eid: int, e: Entity):
+        row = self.rows.get(eid)
+        if row is None:
+            if self.n == len(self.cols["x"]):
+                self._grow()
+            row = self.n
+            self.n += 1
+            self.rows[eid] = row
+        c = self.cols
+        c["id"][row] = eid
+        c["type"][row] = TYPE_CODES[e.type]
+        c["owner"][row] = e.owner
+        c["x"][row] = e.x
+        c["y"][row] = e.y
+        c["vx"][row] = e.vx
+        c["vy"][row] = e.vy
+        c["angle"][row] = e.angle
+        c["hp"][row] = e.hp
+        c["hp_max"][row] = e.hp_max
+        c["tx"][row] = math.nan if e.tx is None else e.tx
+        c["ty"][row] = math.nan if e.ty is None else e.ty
+        c["miner_state"][row] = MINER_STATE_CODES[e.miner_state]
+        c["mine_asteroid_id"][row] = NO_ID if e.mine_asteroid_id is None else e.mine_asteroid_id
+        c["mine_timer"][row] = e.mine_timer
+        c["cargo"][row] = e.cargo
+        c["home_station_id"][row] = NO_ID if e.home_station_id is None else e.home_station_id
+        c["nav_goal"][row] = NO_ID if e.nav_goal is None else e.nav_goal
+
+    def __delitem__(self, eid: int):
+        row = self.rows.pop(eid)
+        last = self.n - 1
+        if row != last:
+            for arr in self.cols.values():
+                arr[row] = arr[last]
+            self.rows[int(self.cols["id"][row])] = row
+        self.n = last
+
+    def load(self, cols: Dict[str, "np.ndarray"], n: int):
+        """Bulk-fill an empty store with n rows of every column (checkpoint restore)."""
+        while len(self.cols["x"]) < n:
+            self._grow()
+        for name in _FLOAT_COLS + _INT_COLS + _CODE_COLS:
+            self.cols[name][:n] = cols[name]
+        self.n = n
+        self.rows = {eid: row for row, eid in enumerate(self.cols["id"][:n].tolist())}
+
+    def pop(self, eid: int, default=None):
+        if eid not in self.rows:
+            return default
+        e = self.to_entity(eid)
+        del self[eid]
+        return e
+
+    def keys(self) -> List[int]:
+        return self.col("id").tolist()
+
+    def values(self) -> List[EntityView]:
+        return [EntityView(self, eid) for eid in self.keys()]
+
+    def items(self) -> List[tuple]:
+        return [(eid, EntityView(self, eid)) for eid in self.keys()]
+
+    def to_entity(self, eid: int) -> Entity:
+        """Detached Entity copy of one row."""
+        v = self[eid]
+        return Entity(
+            id=eid, type=v.type, owner=v.owner, x=v.x, y=v.y, vx=v.vx, vy=v.vy,
+            angle=v.angle, hp=v.hp, hp_max=v.hp_max, tx=v.tx, ty=v.ty,
+            miner_state=v.miner_state, mine_asteroid_id=v.mine_asteroid_id,
+            mine_timer=v.mine_timer, cargo=v.cargo, home_station_id=v.home_station_id,
+            nav_goal=v.nav_goal,
+        )
+
+    def snapshot_dicts(self) -> List[dict]:
+        """build_snapshot entity records for all live (hp > 0) rows, built column-wise."""
+        live = self.col("hp") > 0
+        ids = self.col("id")[live].tolist()
+        types = self.col("type")[live].tolist()
+        owners = self.col("owner")[live].tolist()
+        xs = self.col("x")[live].tolist()
+        ys = self.col("y")[live].tolist()
+        angles = self.col("angle")[live].tolist()
+        hps = self.col("hp")[live].tolist()
+        hp_maxs = self.col("hp_max")[live].tolist()
+        mstates = self.col("miner_state")[live].tolist()
+        masts = self.col("mine_asteroid_id")[live].tolist()
+
+        out = []
+        for i in range(len(ids)):
+            is_miner = types[i] == T_MINER
+            out.append({
+                "id": ids[i],
+                "type": TYPE_NAMES[types[i]],
+                "owner": owners[i],
+                "x": xs[i],
+                "y": ys[i],
+                "angle": angles[i],
+                "hp": hps[i],
+                "hp_max": hp_maxs[i],
+                "miner_state": MINER_STATE_NAMES[mstates[i]] if is_miner else None,
+                "mine_asteroid_id": (masts[i] if masts[i] != NO_ID else None) if is_miner else None,
+            })
+        return out
+
+class _AsteroidTable:
+    """
+    Dense per-cell candidate table for vectorized overlap tests. Each asteroid is
+    listed in every cell its box, grown by the largest unit radius, touches, so a
+    point only needs its own cell. Empty slots point at a far-away sentinel.
+    """
+    def __init__(self, state: ServerState, cell: float):
+        asts = list(state.asteroids.values())
+        reach = max(RADII)
+        self.cell = cell
+        self.nx = max(1, int(math.ceil(cfg.MAP_W / cell)))
+        self.ny = max(1, int(math.ceil(cfg.MAP_H / cell)))
+
+        buckets: List[List[int]] = [[] for _ in range(self.nx * self.ny)]
+        for i, a in enumerate(asts):
+            cx0 = min(self.nx - 1, max(0, int((a.x - a.r - reach) // cell)))
+            cx1 = min(self.nx - 1, max(0, int((a.x + a.r + reach) // cell)))
+            cy0 = min(self.ny - 1, max(0, int((a.y - a.r - reach) // cell)))
+            cy1 = min(self.ny - 1, max(0, int((a.y + a.r + reach) // cell)))
+            for cx in range(cx0, cx1 + 1):
+                for cy in range(cy0, cy1 + 1):
+                    buckets[cy * self.nx + cx].append(i)
+
+        sentinel = len(asts)
+        k = max(1, max((len(b) for b in buckets), default=1))
+        self.table = np.full((len(buckets), k), sentinel, dtype=np.int64)
+        for ci, b in enumerate(buckets):
+            self.table[ci, :len(b)] = b
+
+        self.ax = np.array([a.x for a in asts] + [1e18])
+        self.ay = np.array([a.y for a in asts] + [1e18])
+        self.ar = np.array([a.r for a in asts] + [0.0])
+
+    def maybe_overlapping(self, x: "np.ndarray", y: "np.ndarray", radius: "np.ndarray") -> "np.ndarray":
+        cx = np.clip((x // self.cell).astype(np.int64), 0, self.nx - 1)
+        cy = np.clip((y // self.cell).astype(np.int64), 0, self.ny - 1)
+        cand = self.table[cy * self.nx + cx]                 # (n, k)
+        dx = x[:, None] - self.ax[cand]
+        dy = y[:, None] - self.ay[cand]
+        lim = radius[:, None] + self.ar[cand]
+        return np.any(dx * dx + dy * dy < lim * lim, axis=1)
+
+def _asteroid_table(state: ServerState) -> _AsteroidTable:
+    store = state.entities
+    key = (id(state.asteroid_grid), len(state.asteroids))
+    cached = store._ast_table
+    if cached is None or cached[0] != key:
+        cell = cfg.ASTEROID_GRID_CELL if cfg.ASTEROID_GRID_CELL > 0 else 512
+        cached = (key, _AsteroidTable(state, cell))
+        store._ast_table = cached
+    return cached[1]
+
+def tick_entities_soa(state: ServerState):
+    """
+    Batch equivalent of tick_entities for an EntityStore. Positions are all updated
+    before miner transitions read station positions, so a returning miner aims at
+    where its station is after this tick rather than partway through it.
+    """
+    with state.world_lock:
+        s: EntityStore = state.entities
+        if s.n == 0:
+            return
+        state.activity.begin_tick(state)
+        table = _asteroid_table(state) if state.asteroids else None
+        awake = s.col("awake")
+        if state.sched.views is not None:
+            step = half_rate_steps(s.cols, s.n, state.sched.views, state.sched.phase)
+            done_mining, home = tick_rows(state, s.cols, s.n, table, awake & (step > 0), step)
+        else:
+            done_mining, home = tick_rows(state, s.cols, s.n, table, awake)
+        finish_tick(state, s, done_mining, home)
+
+def half_rate_steps(cols: Dict[str, "np.ndarray"], n: int, views: list, phase: int) -> "np.ndarray":
+    """Per-row step for a half-rate tick; scheduler.half_rate_step over columns."""
+    x, y = cols["x"][:n], cols["y"][:n]
+    background = np.isnan(cols["tx"][:n])
+    if views:
+        seen = np.zeros(n, dtype=bool)
+        for x0, y0, x1, y1 in views:
+            seen |= (x >= x0) & (x <= x1) & (y >= y0) & (y <= y1)
+        background |= ~seen
+    turn = (cols["id"][:n] + phase) & 1 == 0
+    step = np.full(n, cfg.DT)
+    step[background & turn] = 2 * cfg.DT
+    step[background & ~turn] = 0.0
+    return step
+
+def tick_rows(state: ServerState, cols: Dict[str, "np.ndarray"], n: int, table: Optional[_AsteroidTable],
+              select: Optional["np.ndarray"] = None, step: Optional["np.ndarray"] = None):
+    """
+    The row-local part of a tick over columns [0, n): movement, asteroid push-out,
+    miners the timer wheel woke and miners landing on their asteroid. select (a
+    bool mask: the awake rows, or a worker's share of them) limits it to some
+    rows; step (per row) replaces DT on half-rate ticks. state only supplies the
+    asteroids to resolve against.
+    Returns the rows that finished mining and the rows that got home, which need
+    the whole world (stations, credits) and are handled by finish_tick.
+    """
+    x, y = cols["x"][:n], cols["y"][:n]
+    vx, vy = cols["vx"][:n], cols["vy"][:n]
+    tx, ty = cols["tx"][:n], cols["ty"][:n]
+    angle = cols["angle"][:n]
+    nav = cols["nav_goal"][:n]
+    typ = cols["type"][:n]
+    mstate = cols["miner_state"][:n]
+    timer = cols["mine_timer"][:n]
+
+    live = cols["hp"][:n] > 0
+    if select is not None:
+        live &= select
+    is_miner = typ == T_MINER
+    mining = live & is_miner & (mstate == M_MINING)
+    active = live & ~mining
+
+    # Bulk movement for everything with a target.
+    moving = np.flatnonzero(active & ~np.isnan(tx) & ~np.isnan(ty))
+    if len(moving):
+        mx, my = x[moving], y[moving]
+        dx = tx[moving] - mx
+        dy = ty[moving] - my
+        dist = np.hypot(dx, dy)
+        # The arrival radius grows with the step, so a double step cannot hop over it forever.
+        arrived = dist < (6.0 if step is None else 6.0 / cfg.DT * step[moving])
+        going = ~arrived
+
+        arr = moving[arrived]
+        x[arr] = tx[arr]
+        y[arr] = ty[arr]
+        tx[arr] = np.nan
+        ty[arr] = np.nan
+        vx[arr] = 0.0
+        vy[arr] = 0.0
+        nav[arr] = NO_ID
+
+        go = moving[going]
+        nx = dx[going] / dist[going]
+        ny = dy[going] / dist[going]
+        if state.nav is not None:
+            state.nav.next_tick()
+            _steer_rows(state, go, x, y, nav, nx, ny)
+        speed = np.asarray(SPEEDS)[typ[go]]
+        vx[go] = nx * speed
+        vy[go] = ny * speed
+        dt = cfg.DT if step is None else step[go]
+        x[go] += vx[go] * dt
+        y[go] += vy[go] * dt
+        angle[go] = np.arctan2(nx, -ny)
+
+    # Asteroid push-out: vectorized broadphase, exact scalar resolve for the hits.
+    act = np.flatnonzero(active)
+    if len(act) and table is not None:
+        radius = np.asarray(RADII)[typ[act]]
+        hits = act[table.maybe_overlapping(x[act], y[act], radius)]
+        for row in hits.tolist():
+            nxp, nyp, hit = resolve_circle_vs_asteroids(state, float(x[row]), float(y[row]), RADII[typ[row]])
+            x[row] = nxp
+            y[row] = nyp
+            if hit and nav[row] == NO_ID:
+                tx[row] = np.nan
+                ty[row] = np.nan
+
+    no_target = np.isnan(tx) & np.isnan(ty)
+    done_mining = np.flatnonzero(mining & (timer <= 0))
+    landed = np.flatnonzero(active & is_miner & (mstate == M_TO_ASTEROID) & no_target)
+    home = np.flatnonzero(active & is_miner & (mstate == M_RETURNING) & no_target)
+
+    mstate[landed] = M_MINING
+    timer[landed] = cfg.MINING_TIME
+    return done_mining, home
+
+def _steer_rows(state: ServerState, go, x, y, nav, nx, ny):
+    """Flow-field headings for the moving rows `go` that have a nav goal (nx/ny in place)."""
+    sel = np.flatnonzero(nav[go] != NO_ID)
+    if not len(sel):
+        return
+    rows = go[sel]
+    grid = state.nav
+    cx = np.clip((x[rows] // grid.cell).astype(np.int64), 0, grid.nx - 1)
+    cy = np.clip((y[rows] // grid.cell).astype(np.int64), 0, grid.ny - 1)
+    ncells = grid.nx * grid.ny
+    # one field lookup per distinct (goal, cell), not per unit
+    keys, inverse = np.unique(nav[rows] * ncells + cy * grid.nx + cx, return_inverse=True)
+    hx = np.zeros(len(keys))
+    hy = np.zeros(len(keys))
+    steering = np.zeros(len(keys), dtype=bool)
+    for i, key in enumerate(keys.tolist()):
+        heading = grid.field(key // ncells).heading(key % ncells)
+        if heading is not None:
+            hx[i], hy[i] = heading
+            steering[i] = True
+    on = steering[inverse]
+    nav[rows[~on]] = NO_ID
+    # (0, 0) around a blocked goal keeps the straight heading (see pathing.steer)
+    field = on & ((hx[inverse] != 0.0) | (hy[inverse] != 0.0))
+    nx[sel[field]] = hx[inverse[field]]
+    ny[sel[field]] = hy[inverse[field]]
+    cells = (cy * grid.nx + cx).tolist()
+    for i in np.flatnonzero(on).tolist():
+        if cells[i] in grid.touch:
+            j = sel[i]
+            nx[j], ny[j] = grid.slide(cells[i], float(x[rows[i]]), float(y[rows[i]]), float(nx[j]), float(ny[j]))
+
+def finish_tick(state: ServerState, s: EntityStore, done_mining, home):
+    """Miner transitions that read other entities or credits, clamp to the map, sleep, then separation."""
+    for row in done_mining.tolist():
+        _finish_mining(state, s, row)
+
+    for row in home.tolist():
+        _arrive_home(state, s, row)
+
+    _clamp(s, np.flatnonzero(s.col("awake") & (s.col("hp") > 0)))
+    settle_rows(state, s)
+    if cfg.SEPARATION_CELL > 0:
+        separate_rows(state, s)
+
+def _clamp(s: EntityStore, rows: "np.ndarray"):
+    x, y = s.col("x"), s.col("y")
+    x[rows] = np.clip(x[rows], 0, cfg.MAP_W)
+    y[rows] = np.clip(y[rows], 0, cfg.MAP_H)
+
+def settle_rows(state: ServerState, s: EntityStore):
+    """Activity.settle over columns: awake rows without a target fall asleep, landed miners go on the wheel."""
+    act = state.activity
+    awake = s.col("awake")
+    live = s.col("hp") > 0
+    timer = s.col("mine_timer")
+    mining = live & (s.col("type") == T_MINER) & (s.col("miner_state") == M_MINING)
+    ids = s.col("id")
+    for row in np.flatnonzero(awake & mining & (timer > 0)).tolist():
+        eid = int(ids[row])
+        if eid not in act.due:
+            act.schedule(eid, float(timer[row]))
+    awake &= live & (~np.isnan(s.col("tx")) | (mining & (timer <= 0)))
+
+def separate_rows(state: ServerState, s: EntityStore):
+    """
+    Vectorized separation.separate: the same pairs (at least one unit awake), found
+    by sorting cell keys: the awake units against the forward cells of the awake
+    ones, and the nine cells around the awake or the sleeping units, whichever
+    are fewer, against the others. Pushed rows are clamped to the
+    map and woken.
+    """
+    cell = float(cfg.SEPARATION_CELL)
+    spec = [cfg.SEPARATION.get(TYPE_NAMES[code], (0.0, 0.0)) for code in range(len(TYPE_NAMES))]
+    radius_of = np.array([r for r, _ in spec])
+    give_of = np.array([g for _, g in spec])
+    typ = s.col("type")
+    rows = np.flatnonzero((s.col("hp") > 0) & (radius_of[typ] > 0))
+    if len(rows) < 2:
+        return
+    x, y = s.col("x")[rows], s.col("y")[rows]
+    r = radius_of[typ[rows]]
+    give = give_of[typ[rows]]
+    ids = s.col("id")[rows]
+    awake = s.col("awake")[rows]
+    if not awake.any():
+        return
+
+    firsts, seconds = [np.zeros(0, dtype=np.int64)], [np.zeros(0, dtype=np.int64)]
+    small = np.flatnonzero(2 * r <= cell)
+    if len(small):
+        cx = (x[small] // cell).astype(np.int64)
+        cy = (y[small] // cell).astype(np.int64)
+        cx -= cx.min() - 1      # leave room for the -1 offsets
+        cy -= cy.min() - 1
+        height = int(cy.max()) + 2
+        key = cx * height + cy
+        order = np.argsort(key, kind="stable")
+        key = key[order]
+        units = small[order]
+        woke = awake[units]
+        # Awake pairs: the forward half of the neighbourhood among the awake units, as before.
+        akey, aunits = key[woke], units[woke]
+        pos = np.arange(len(akey))
+        later = np.searchsorted(akey, akey, "right") - pos - 1
+        firsts.append(aunits[np.repeat(pos, later)])
+        seconds.append(aunits[_ramp(pos + 1, later)])
+        for ox, oy in FORWARD:
+            near = akey + ox * height + oy
+            lo = np.searchsorted(akey, near, "left")
+            count = np.searchsorted(akey, near, "right") - lo
+            firsts.append(aunits[np.repeat(pos, count)])
+            seconds.append(aunits[_ramp(lo, count)])
+        # Awake with sleeping: all nine cells around each unit of whichever side is smaller.
+        skey, sunits = key[~woke], units[~woke]
+        if len(skey) < len(akey):
+            akey, aunits, skey, sunits = skey, sunits, akey, aunits
+        pos = np.arange(len(akey))
+        for ox, oy in AROUND:
+            near = akey + ox * height + oy
+            lo = np.searchsorted(skey, near, "left")
+            count = np.searchsorted(skey, near, "right") - lo
+            firsts.append(aunits[np.repeat(pos, count)])
+            seconds.append(sunits[_ramp(lo, count)])
+        small_r = float(r[small].max())
+    else:
+        small_r = 0.0
+    wide = np.flatnonzero(2 * r > cell).tolist()
+    for i, w in enumerate(wide):
+        reach = r[w] + small_r
+        cand = small[(np.abs(x[small] - x[w]) < reach) & (np.abs(y[small] - y[w]) < reach)]
+        others = np.concatenate([np.array(wide[i + 1:], dtype=np.int64), cand])
+        if not awake[w]:
+            others = others[awake[others]]
+        firsts.append(np.full(len(others), w, dtype=np.int64))
+        seconds.append(others)
+    a = np.concatenate(firsts)
+    b = np.concatenate(seconds)
+
+    dx = x[b] - x[a]
+    dy = y[b] - y[a]
+    lim = r[a] + r[b]
+    close = (dx * dx + dy * dy < lim * lim) & ((give[a] > 0) | (give[b] > 0))
+    if not close.any():
+        return
+    a, b = a[close], b[close]
+    lo = np.where(ids[a] < ids[b], a, b)
+    hi = np.where(ids[a] < ids[b], b, a)
+    dx = x[hi] - x[lo]
+    dy = y[hi] - y[lo]
+    dist = np.hypot(dx, dy)
+    overlap = r[lo] + r[hi] - dist
+    keep = overlap > 0
+    lo, hi, dx, dy, dist, overlap = lo[keep], hi[keep], dx[keep], dy[keep], dist[keep], overlap[keep]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        nx = dx / dist
+        ny = dy / dist
+    for i in np.flatnonzero(dist == 0).tolist():
+        nx[i], ny[i] = stacked_direction(int(ids[lo[i]]), int(ids[hi[i]]))
+    share_lo = overlap * give[lo] * np.where(give[hi] > 0, 0.5, 1.0)
+    share_hi = overlap * give[hi] * np.where(give[lo] > 0, 0.5, 1.0)
+
+    px = np.zeros(len(rows))
+    py = np.zeros(len(rows))
+    np.add.at(px, lo, -nx * share_lo)
+    np.add.at(py, lo, -ny * share_lo)
+    np.add.at(px, hi, nx * share_hi)
+    np.add.at(py, hi, ny * share_hi)
+    moved = np.flatnonzero((px != 0) | (py != 0))
+    rows = rows[moved]
+    x, y = s.col("x"), s.col("y")
+    x[rows] += px[moved]
+    y[rows] += py[moved]
+
+    table = _asteroid_table(state) if state.asteroids else None
+    if table is not None and len(rows):
+        radius = np.asarray(RADII)[typ[rows]]
+        for row in rows[table.maybe_overlapping(x[rows], y[rows], radius)].tolist():
+            x[row], y[row], _ = resolve_circle_vs_asteroids(state, float(x[row]), float(y[row]), RADII[typ[row]])
+    _clamp(s, rows)
+    s.col("awake")[rows] = True
+
+def _ramp(start: "np.ndarray", count: "np.ndarray") -> "np.ndarray":
+    """start[i], start[i] + 1, ..., start[i] + count[i] - 1 for every i, concatenated."""
+    total = int(count.sum())
+    return np.repeat(start, count) + np.arange(total) - np.repeat(np.cumsum(count) - count, count)
+
+def _finish_mining(state: ServerState, s: EntityStore, row: int):
+    c = s.cols
+    c["cargo"][row] = cfg.MINING_REWARD
+    c["miner_state"][row] = M_RETURNING
+    st_row = s.rows.get(int(c["home_station_id"][row]))
+    if st_row is not None and c["type"][st_row] == T_STATION:
+        c["tx"][row] = c["x"][st_row]
+        c["ty"][row] = c["y"][st_row] - 110.0
+        goal = nav_goal(state, "miner", float(c["tx"][row]), float(c["ty"][row]))
+        c["nav_goal"][row] = NO_ID if goal is None else goal
+    else:
+        c["miner_state"][row] = M_IDLE
+        c["mine_asteroid_id"][row] = NO_ID
+        c["cargo"][row] = 0
+        c["tx"][row] = math.nan
+        c["ty"][row] = math.nan
+        c["nav_goal"][row] = NO_ID
+
+def _arrive_home(state: ServerState, s: EntityStore, row: int):
+    c = s.cols
+    cargo = int(c["cargo"][row])
+    if cargo > 0:
+        owner = int(c["owner"][row])
+        state.credits[owner] = state.credits.get(owner, 0) + cargo
+    c["cargo"][row] = 0
+
+    a = state.asteroids.get(int(c["mine_asteroid_id"][row]))
+    if a is None:
+        c["miner_state"][row] = M_IDLE
+        return
+    dx = c["x"][row] - a.x
+    dy = c["y"][row] - a.y
+    dist = math.hypot(dx, dy)
+    if dist > 0:
+        nx, ny = dx / dist, dy / dist
+    else:
+        nx, ny = 1.0, 0.0
+    c["tx"][row] = a.x + nx * (a.r + 10.0)
+    c["ty"][row] = a.y + ny * (a.r + 10.0)
+    goal = nav_goal(state, "miner", a.x, a.y)
+    c["nav_goal"][row] = NO_ID if goal is None else goal
+    c["miner_state"][row] = M_TO_ASTEROID
+    c["mine_timer"][row] = 0.0
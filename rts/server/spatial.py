@@ -0,0 +1,77 @@
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from .state import Asteroid
+
+class AsteroidGrid:
+    """
+    Static broadphase for asteroids. Built once after worldgen; asteroids never move.
+    Each asteroid is registered in every cell its bounding box touches, so a query box
+    only has to look at the cells it covers. Indices follow the order asteroids were
+    given in, which keeps resolve order identical to iterating state.asteroids.
+    """
+    def __init__(self, asteroids: Iterable[Asteroid], cell: float):
+        self.cell = float(cell)
+        self.items: List[Asteroid] = list(asteroids)
+        self.cells: Dict[Tuple[int, int], List[int]] = {}
+
+        inv = 1.0 / self.cell
+        for i, a in enumerate(self.items):
+            cx0 = int((a.x - a.r) * inv // 1)
+            cx1 = int((a.x + a.r) * inv // 1)
+            cy0 = int((a.y - a.r) * inv // 1)
+            cy1 = int((a.y + a.r) * inv // 1)
+            for cx in range(cx0, cx1 + 1):
+                for cy in range(cy0, cy1 + 1):
+                    self.cells.setdefault((cx, cy), []).append(i)
+
+    def query(self, x: float, y: float, reach: float) -> Sequence[int]:
+        """Sorted indices of asteroids whose bounding box may touch the box x/y +- reach."""
+        inv = 1.0 / self.cell
+        cx0 = int((x - reach) * inv // 1)
+        cx1 = int((x + reach) * inv // 1)
+        cy0 = int((y - reach) * inv // 1)
+        cy1 = int((y + reach) * inv // 1)
+
+        cells = self.cells
+        if cx0 == cx1 and cy0 == cy1:
+            return cells.get((cx0, cy0), ())
+
+        found = set()
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                bucket = cells.get((cx, cy))
+                if bucket:
+                    found.update(bucket)
+        return sorted(found)
+
+class PointGrid:
+    """
+    Uniform bucket grid of (x, y, item) points, rebuilt per use. Rect queries touch
+    only the covered cells, so cost tracks the result size rather than the total.
+    """
+    def __init__(self, cell: float):
+        self.cell = float(cell)
+        self.cells: Dict[Tuple[int, int], List[tuple]] = {}
+
+    def insert(self, x: float, y: float, item):
+        key = (int(x // self.cell), int(y // self.cell))
+        bucket = self.cells.get(key)
+        if bucket is None:
+            self.cells[key] = [(x, y, item)]
+        else:
+            bucket.append((x, y, item))
+
+    def query_rect(self, x0: float, y0: float, x1: float, y1: float) -> List:
+        """Items with x0 <= x <= x1 and y0 <= y <= y1."""
+        c = self.cell
+        out = []
+        cells = self.cells
+        for cx in range(int(x0 // c), int(x1 // c) + 1):
+            for cy in range(int(y0 // c), int(y1 // c) + 1):
+                bucket = cells.get((cx, cy))
+                if not bucket:
+                    continue
+                for x, y, item in bucket:
+                    if x0 <= x <= x1 and y0 <= y <= y1:
+                        out.append(item)
+        return out
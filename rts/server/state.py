@@ -1,8 +1,16 @@
 import socket
 import threading
-import queue
-from dataclasses import dataclass
-from typing import Dict, Optional
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, Optional, Tuple
+
+from .outbox import Outbox
+from .inbox import CommandInbox
+from .metrics import TickMetrics
+from .scheduler import TickScheduler
+from .activity import Activity
+from .index import EntityIndex
+from . import config as cfg
 
 @dataclass
 class Asteroid:
@@ -35,6 +43,33 @@ class Entity:
     cargo: int = 0
     home_station_id: Optional[int] = None
 
+    nav_goal: Optional[int] = None    # NavGrid cell whose flow field this unit follows
+
+@dataclass
+class ClientInfo:
+    player_id: int
+    delta: bool = False         # client asked for snapshot_delta in hello
+    acked_tick: int = -1        # last snapshot tick the client confirmed
+    binary: bool = False        # negotiated rts.net.codec instead of JSON
+    viewport: Optional[Tuple[float, float, float, float]] = None  # x, y, w, h once reported
+    # this client's own filtered snapshots, delta baselines while it has a viewport
+    view_history: Deque[Tuple[int, Dict[int, dict]]] = field(default_factory=deque)
+    views_sent: int = 0         # viewport snapshots queued; paces snapshot_summary
+    outbox: Outbox = field(default_factory=Outbox)  # drained by this client's writer
+    inbox: CommandInbox = field(default_factory=CommandInbox)  # validated commands for the sim thread
+
+@dataclass(frozen=True)
+class WorldFrame:
+    """
+    Read-only copy of the world published by the sim thread after each tick.
+    Readers take state.frame once and use it without world_lock; the records
+    are shared with every reader, so never modify them.
+    """
+    tick: int
+    entities: Tuple[dict, ...]      # snapshot records of live entities
+    credits: Dict[int, int]
+    asteroids: Tuple[Asteroid, ...]
+
 class ServerState:
     def __init__(self):
         self.running = True
@@ -44,17 +79,45 @@ class ServerState:
         self.next_asteroid_id = 1
 
         self.clients_lock = threading.Lock()
-        self.clients: Dict[socket.socket, int] = {}  # conn -> player_id
+        self.clients: Dict[socket.socket, ClientInfo] = {}
 
         self.world_lock = threading.Lock()
         self.entities: Dict[int, Entity] = {}
+        self.index = EntityIndex()  # ids by owner/type; kept by add_entity/remove_entity
         self.asteroids: Dict[int, Asteroid] = {}
+        self.asteroid_grid = None  # AsteroidGrid, rebuilt whenever asteroids are replaced
+        self.nav = None            # pathing.NavGrid (obstacle grid + flow-field cache), rebuilt with it
+        self.map_hash = ""        # worldgen.map_hash of the asteroids, set with them; clients cache maps by it
 
         self.credits: Dict[int, int] = {}
 
-        self.command_q: "queue.Queue[tuple[int, dict]]" = queue.Queue()
+        # Latest published WorldFrame; replaced wholesale (atomic) by the sim thread
+        self.frame: Optional[WorldFrame] = None
+
+        # recent snapshots as (tick, {entity_id: record}), baselines for snapshot_delta
+        self.snapshot_history: Deque[Tuple[int, Dict[int, dict]]] = deque()
+
+        self.metrics = TickMetrics(cfg.METRICS_WINDOW)
+        self.sched = TickScheduler()   # tick pacing and load-shedding level, owned by the ticking thread
+        self.activity = Activity()     # awake units and the mining timer wheel, under world_lock
+        self.recorder = None           # replay.Recorder while RECORD_FILE is set
+        self.checkpointer = None       # checkpoint.Checkpointer while CHECKPOINT_FILE is set
+
+        # player_id -> CommandInbox, drained by apply_commands; guarded by clients_lock
+        self.inboxes: Dict[int, CommandInbox] = {}
 
 def alloc_entity_id(state: ServerState) -> int:
     eid = state.next_entity_id
     state.next_entity_id += 1
     return eid
+
+def add_entity(state: ServerState, e: Entity):
+    """Insert a new entity and index it; call with world_lock held."""
+    state.entities[e.id] = e
+    state.index.add(e)
+
+def remove_entity(state: ServerState, eid: int):
+    """Remove an entity from the world, its index entries and the sleep bookkeeping; world_lock held."""
+    del state.entities[eid]
+    state.index.remove(eid)
+    state.activity.forget(eid)
@@ -0,0 +1,184 @@
+"""
+UDP clients (UDP = True): one datagram socket on PORT next to the TCP listener,
+one rts.net.udp.Channel per client address. Snapshot deltas go out as unreliable
+datagrams, everything else (map_init, map_chunks, full snapshots, errors) over
+the channel's reliable stream; commands come in the same way. TCP keeps working,
+so clients that can't get through fall back to it.
+
+UdpServer.run's thread receives for every client, answers CONNECTs with a
+cookie (rts/net/udp.py) and only makes a peer for an address that echoes a valid
+one, runs the handshake for its HELLO and polls the channels (resends, acks,
+timeouts). Cookies are an HMAC of the address and a COOKIE_LIFETIME_S time
+bucket under a per-process secret, so nothing is kept for unverified addresses. Each joined
+client gets a writer thread like TCP clients, draining its Outbox into the
+channel. A UdpPeer stands in for the socket in state.clients.
+"""
+import hashlib
+import hmac
+import os
+import socket
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from rts.net import protocol as P
+from rts.net import udp
+from rts.net.transport import HEADER, SharedMsg, decode_payload, encode_payload
+from .state import ServerState, ClientInfo
+from .netserver import join_player, client_map_init, handle_client_msg, add_client, remove_client, frame_for
+from .matches import MatchManager, MatchFull
+from . import config as cfg
+
+COOKIE_LIFETIME_S = 10.0    # a cookie is accepted for one to two of these
+
+class UdpPeer:
+    """One UDP client. close() may be called from any thread (remove_client, lagging-client drops)."""
+    def __init__(self, server: "UdpServer", addr: Tuple[str, int]):
+        self.server = server
+        self.addr = addr
+        self.chan = udp.Channel(lambda d: server.sock.sendto(d, addr))
+        self.world: Optional[ServerState] = None
+        self.info: Optional[ClientInfo] = None
+        self.match = None
+        self.closed = False
+
+    def close(self):
+        with self.server.lock:
+            if self.closed:
+                return
+            self.closed = True
+            self.server.peers.pop(self.addr, None)
+        self.chan.close()
+        if self.match is not None:
+            self.server.matches.leave(self.match)
+
+class UdpServer:
+    def __init__(self, state: ServerState, host: str, port: int, matches: Optional[MatchManager] = None):
+        self.state = state
+        self.matches = matches
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((host, port))
+        self.sock.settimeout(udp.POLL_S)
+        self.lock = threading.Lock()
+        self.peers: Dict[Tuple[str, int], UdpPeer] = {}
+        self.secret = os.urandom(32)
+
+    def run(self):
+        """Receive loop; also polls every channel each POLL_S."""
+        next_poll = time.monotonic()
+        while self.state.running:
+            try:
+                dgram, addr = self.sock.recvfrom(65536)
+            except socket.timeout:
+                dgram = None
+            except OSError:
+                # e.g. an ICMP port unreachable from a client that went away
+                dgram = None
+            if dgram:
+                self._on_datagram(dgram, addr)
+            now = time.monotonic()
+            if now >= next_poll:
+                next_poll = now + udp.POLL_S
+                with self.lock:
+                    peers = list(self.peers.values())
+                for peer in peers:
+                    if not peer.chan.poll():
+                        print(f"[-] udp client {peer.addr} closed or timed out")
+                        self._drop(peer)
+
+    def _cookie(self, addr, bucket: int) -> bytes:
+        key = f"{addr[0]}|{addr[1]}|{bucket}".encode()
+        return hmac.new(self.secret, key, hashlib.blake2s).digest()[:udp.COOKIE_BYTES]
+
+    def _on_connect(self, dgram: bytes, addr):
+        """CONNECT from an address without a peer: a cookie, or a peer once it echoes one back."""
+        cookie = udp.handshake_cookie(dgram)
+        if cookie is None or dgram[0] != udp.CONNECT or len(dgram) < udp.CONNECT_MIN_BYTES:
+            return
+        bucket = int(time.time() // COOKIE_LIFETIME_S)
+        if not any(hmac.compare_digest(cookie, self._cookie(addr, b)) for b in (bucket, bucket - 1)):
+            try:
+                self.sock.sendto(udp.cookie_datagram(self._cookie(addr, bucket)), addr)
+            except OSError:
+                pass
+            return
+        with self.lock:
+            if addr in self.peers:
+                return
+            if sum(1 for p in self.peers.values() if p.info is None) >= cfg.UDP_MAX_PENDING:
+                return      # the client resends; it gets in once others have joined or timed out
+            self.peers[addr] = UdpPeer(self, addr)
+
+    def _on_datagram(self, dgram: bytes, addr):
+        with self.lock:
+            peer = self.peers.get(addr)
+        if peer is None:
+            if dgram and dgram[0] == udp.CONNECT:
+                self._on_connect(dgram, addr)
+            return      # strays, unverified addresses, or a closed client's last datagrams
+        for payload in peer.chan.receive(dgram):
+            try:
+                msg = decode_payload(payload)
+                if peer.info is None:
+                    self._handshake(peer, msg)
+                else:
+                    handle_client_msg(peer.world, peer.info, msg)
+            except MatchFull as e:
+                print(f"[-] udp client {addr} refused: {e}")
+                peer.chan.send_reliable(encode_payload({"type": P.ERROR, "reason": str(e)}))
+            except Exception as e:
+                print(f"[-] udp client {addr} disconnected: {e}")
+                self._drop(peer)
+                return
+
+    def _handshake(self, peer: UdpPeer, hello: dict):
+        world = self.state
+        if self.matches is not None:
+            peer.match = self.matches.join(hello)
+            world = peer.match.state
+        info = join_player(world, hello)
+        print(f"[+] udp {peer.addr} => player_id={info.player_id}"
+              + (f" match={peer.match.name!r}" if peer.match else ""))
+        init = client_map_init(world, info, hello)
+        if peer.match is not None:
+            init[0]["match"] = peer.match.name
+        for msg in init:
+            peer.chan.send_reliable(encode_payload(msg, info.binary))
+        peer.world, peer.info = world, info
+        add_client(world, peer, info)
+        threading.Thread(target=run_udp_writer, args=(world, peer, info), daemon=True).start()
+
+    def _drop(self, peer: UdpPeer):
+        if peer.world is not None:
+            remove_client(peer.world, peer)
+        else:
+            peer.close()
+
+def run_udp_writer(state: ServerState, peer: UdpPeer, info: ClientInfo):
+    """
+    Writer thread for one UDP client: deltas unreliably, the rest reliably. It waits
+    while a window's worth of reliable fragments is unacked, so snapshots keep
+    coalescing in the Outbox (and CLIENT_MAX_LAG applies) instead of piling up in
+    the channel.
+    """
+    try:
+        while not peer.closed:
+            while peer.chan.pending() >= udp.WINDOW and not peer.closed:
+                time.sleep(udp.POLL_S)
+            item = info.outbox.wait_pop()
+            if item is None:
+                break
+            msg = item.msg if isinstance(item, SharedMsg) else item
+            payload = memoryview(frame_for(item, info.binary))[HEADER.size:]
+            peer.chan.send(payload, msg.get("type"))
+            info.outbox.bytes_sent += len(payload)
+    except Exception:
+        pass
+    finally:
+        remove_client(state, peer)
+
+def serve_udp(state: ServerState, host: str, port: int, matches: Optional[MatchManager] = None) -> UdpServer:
+    """Bind and start the receive thread."""
+    server = UdpServer(state, host, port, matches)
+    threading.Thread(target=server.run, daemon=True).start()
+    return server
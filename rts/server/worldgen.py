@@ -1,8 +1,12 @@
+import hashlib
 import math
 import random
-from typing import List, Tuple
+import struct
+from typing import List, Optional, Tuple
 
 from .state import ServerState, Asteroid
+from .spatial import AsteroidGrid
+from .pathing import NavGrid
 from . import config as cfg
 
 def generate_asteroids(state: ServerState, seed: int):
@@ -33,11 +37,71 @@ def generate_asteroids(state: ServerState, seed: int):
 
     with state.world_lock:
         state.asteroids = {a.id: a for a in placed}
+        build_asteroid_grid(state)
+
+def map_hash(asteroids) -> str:
+    """
+    Content hash of the map a client sees: MAP_SEED, the worldgen config and the
+    asteroid list. Clients key their map cache by it (16 hex digits).
+    """
+    h = hashlib.blake2b(digest_size=8)
+    h.update(struct.pack("<qiiiiiii", cfg.MAP_SEED, cfg.MAP_W, cfg.MAP_H, cfg.ASTEROID_COUNT,
+                         cfg.ASTEROID_GAP, cfg.AST_MIN_R, cfg.AST_MAX_R, cfg.AST_EDGE_PAD))
+    for a in sorted(asteroids, key=lambda a: a.id):
+        h.update(struct.pack("<qddd", a.id, a.x, a.y, a.r))
+    return h.hexdigest()
+
+def build_asteroid_grid(state: ServerState):
+    """(Re)build the static asteroid broadphase, nav grid and map hash. Call with world_lock held."""
+    state.map_hash = map_hash(state.asteroids.values())
+    if cfg.ASTEROID_GRID_CELL > 0:
+        state.asteroid_grid = AsteroidGrid(state.asteroids.values(), cfg.ASTEROID_GRID_CELL)
+    else:
+        state.asteroid_grid = None
+    state.nav = build_nav_grid(state.asteroids.values())
+
+def build_nav_grid(asteroids) -> Optional[NavGrid]:
+    if cfg.NAV_CELL <= 0:
+        return None
+    return NavGrid(asteroids, cfg.MAP_W, cfg.MAP_H, cfg.NAV_CELL, cfg.NAV_CLEARANCE, cfg.NAV_CACHE_FIELDS)
 
 def resolve_circle_vs_asteroids(state: ServerState, x: float, y: float, radius: float) -> Tuple[float, float, bool]:
     """
     Push the circle out of asteroids if overlapping. This is a cheap collision rule (not pathfinding).
+    Uses state.asteroid_grid when present; results match the full scan exactly.
     """
+    grid = state.asteroid_grid
+    if grid is None:
+        return _resolve_all(state, x, y, radius)
+
+    items = grid.items
+    did = False
+    cands = grid.query(x, y, radius)
+    i = 0
+    while i < len(cands):
+        idx = cands[i]
+        a = items[idx]
+        dx = x - a.x
+        dy = y - a.y
+        dist = math.hypot(dx, dy)
+        min_dist = radius + a.r
+        if dist == 0:
+            x += min_dist
+        elif dist < min_dist:
+            nx = dx / dist
+            ny = dy / dist
+            x = a.x + nx * min_dist
+            y = a.y + ny * min_dist
+        else:
+            i += 1
+            continue
+        # The push moved us; pick up any later asteroid we may now overlap, in scan order.
+        did = True
+        cands = [j for j in grid.query(x, y, radius) if j > idx]
+        i = 0
+    return x, y, did
+
+def _resolve_all(state: ServerState, x: float, y: float, radius: float) -> Tuple[float, float, bool]:
     did = False
     for a in state.asteroids.values():
         dx = x - a.x
@@ -0,0 +1,41 @@
+from rts.client.model import ClientModel
+from rts.net import protocol as P
+
+def _ent(eid: int, x: float) -> dict:
+    return {"id": eid, "type": "fighter", "owner": 1, "x": x, "y": 0.0}
+
+def _full(tick: int, x: float) -> dict:
+    return {"type": P.SNAPSHOT, "tick": tick, "entities": [_ent(1, x)], "credits": {"1": 100}}
+
+def _delta(tick: int, base: int, x: float) -> dict:
+    return {"type": P.SNAPSHOT_DELTA, "tick": tick, "base": base, "created": [],
+            "changed": [{"id": 1, "x": x}], "removed": [], "credits": {"1": 100}}
+
+def test_late_full_snapshot_does_not_roll_back():
+    m = ClientModel()
+    m.apply_snapshot(_full(10, 1.0))
+    m.apply_snapshot(_delta(12, 10, 3.0))
+    m.apply_snapshot(_full(11, 2.0))     # resent reliably, arrives after the newer delta
+    assert m.tick == 12
+    assert m.entities[1]["x"] == 3.0
+    m.apply_snapshot(_delta(13, 12, 4.0))
+    assert m.tick == 13
+    assert not m.need_full
+
+def test_stale_delta_is_ignored():
+    m = ClientModel()
+    m.apply_snapshot(_full(10, 1.0))
+    m.apply_snapshot(_delta(13, 10, 4.0))
+    m.apply_snapshot(_delta(12, 10, 3.0))
+    assert m.tick == 13
+    assert m.entities[1]["x"] == 4.0
+
+def test_need_full_accepts_an_older_full_snapshot():
+    m = ClientModel()
+    m.apply_snapshot(_full(10, 1.0))
+    m.apply_snapshot(_delta(20, 5, 9.0))  # base we never had
+    assert m.need_full
+    m.apply_snapshot(_full(9, 0.5))
+    assert not m.need_full
+    assert m.tick == 9
+    assert m.entities[1]["x"] == 0.5